@@ -11,6 +11,9 @@ def create_app():
                 static_folder=os.path.join(root_dir, 'static'))
     app.config['SECRET_KEY'] = FLASK_SECRET_KEY
 
+    from app.database import init_app
+    init_app(app)
+
     # Register blueprints
     from app.routes import main
     app.register_blueprint(main)
@@ -0,0 +1,251 @@
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+import arxiv
+from app.config import (
+    ARXIV_BACKEND, ARXIV_FIXTURES_DIR, FAKE_SEED, ARXIV_FAKE_PAPERS_PER_DAY, ARXIV_FAKE_ALIGNMENT_RATE,
+    ARXIV_FAKE_LATENCY_SECONDS, ARXIV_FAKE_ERROR_RATE, ALIGNMENT_KEYWORDS
+)
+from app import fixtures
+
+# Stand-ins for arxiv.Client, implementing the results(search) call that
+# app/fetcher.py makes.
+
+PAGE_SIZE = 100
+MAX_FAKE_DAYS = 365  # How far back an unlimited fake search goes
+
+OTHER_TOPICS = [
+    'graph neural networks', 'protein structure prediction', 'neural rendering', 'speech recognition',
+    'combinatorial optimization', 'time series forecasting', 'federated learning', 'program synthesis',
+    'autonomous driving', 'recommender systems', 'knowledge graphs', 'diffusion models'
+]
+TITLE_OPENERS = ['Towards', 'Revisiting', 'Scaling', 'On the Limits of', 'Understanding', 'Benchmarking', 'Learning']
+TITLE_SUFFIXES = [
+    'in Large Language Models', 'for Autonomous Agents', 'with Synthetic Data', 'at Scale',
+    'via Sparse Autoencoders', 'under Distribution Shift', 'in Multi-Agent Systems'
+]
+ABSTRACT_SENTENCES = [
+    'We study {topic} in modern machine learning systems.',
+    'Existing approaches to {topic} rely on assumptions that rarely hold in practice.',
+    'We introduce a method that improves {topic} while keeping training cost fixed.',
+    'Experiments on {count} benchmarks show consistent gains over strong baselines.',
+    'Our analysis identifies when and why prior methods fail.',
+    'We release code and data to support further work.'
+]
+FIRST_NAMES = ['Alice', 'Wei', 'Priya', 'Jonas', 'Maria', 'Kenji', 'Fatima', 'Lucas', 'Sofia', 'Omar', 'Elena', 'David']
+LAST_NAMES = ['Chen', 'Smith', 'Garcia', 'Kumar', 'Müller', 'Tanaka', 'Okafor', 'Rossi', 'Novak', 'Kim', 'Silva', 'Cohen']
+AFFILIATIONS = [
+    'OpenAI', 'Anthropic', 'Google DeepMind', 'Meta AI', 'Microsoft Research', 'Stanford', 'MIT',
+    'UC Berkeley', 'Oxford', 'Carnegie Mellon', 'Mila', 'Redwood Research', 'University of Edinburgh',
+    'TU Munich', 'University of Tokyo', 'KAIST'
+]
+
+def _search_description(search):
+    return {
+        'query': search.query,
+        'id_list': list(search.id_list),
+        'max_results': search.max_results,
+        'sort_by': search.sort_by.value,
+        'sort_order': search.sort_order.value
+    }
+
+def _result(arxiv_id, title, authors, abstract, published, updated=None, categories=None):
+    """Build an arxiv.Result as the arxiv library would from a feed entry."""
+    return arxiv.Result(
+        entry_id=f"http://arxiv.org/abs/{arxiv_id}",
+        updated=updated or published,
+        published=published,
+        title=title,
+        authors=authors,
+        summary=abstract,
+        primary_category=(categories or ['cs.AI'])[0],
+        categories=categories or ['cs.AI'],
+        links=[
+            arxiv.Result.Link(f"https://arxiv.org/abs/{arxiv_id}", rel='alternate', content_type='text/html'),
+            arxiv.Result.Link(f"https://arxiv.org/pdf/{arxiv_id}", title='pdf', rel='related', content_type='application/pdf')
+        ]
+    )
+
+def _author(name, affiliation=None):
+    author = arxiv.Result.Author(name)
+    if affiliation:
+        author.affiliation = affiliation
+    return author
+
+class FakeArxivClient:
+    """
+    Deterministic offline stand-in for arxiv.Client.
+
+    Every day has papers_per_day cs.AI papers with IDs YYMM.DDNNN, paper NNN of
+    day DD being published later the lower NNN is. A paper's content depends
+    only on the seed and its ID, so searches, ID lookups and repeated runs all
+    agree. Papers appear as their publication time passes, so a long-running
+    instance keeps finding new ones.
+    """
+
+    def __init__(self, papers_per_day=ARXIV_FAKE_PAPERS_PER_DAY, alignment_rate=ARXIV_FAKE_ALIGNMENT_RATE,
+                 latency=ARXIV_FAKE_LATENCY_SECONDS, error_rate=ARXIV_FAKE_ERROR_RATE, seed=FAKE_SEED):
+        self.papers_per_day = max(1, min(papers_per_day, 1000))
+        self.alignment_rate = alignment_rate
+        self.latency = latency
+        self.seed = seed
+        self.injector = fixtures.ErrorInjector(seed, error_rate)
+
+    def _published(self, day, index):
+        spacing = 86400 // self.papers_per_day
+        return datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(
+            seconds=86399 - index * spacing
+        )
+
+    def _paper(self, arxiv_id, published):
+        rng = random.Random(f"{self.seed}:{arxiv_id}")
+        topic = rng.choice(ALIGNMENT_KEYWORDS if rng.random() < self.alignment_rate else OTHER_TOPICS)
+
+        heading = ' '.join(word.upper() if word in ('ai', 'rlhf') else word.capitalize() for word in topic.split())
+        title = f"{rng.choice(TITLE_OPENERS)} {heading} {rng.choice(TITLE_SUFFIXES)}"
+        abstract = ' '.join(
+            sentence.format(topic=topic, count=rng.randint(3, 12))
+            for sentence in rng.sample(ABSTRACT_SENTENCES, rng.randint(3, len(ABSTRACT_SENTENCES)))
+        )
+        authors = [
+            _author(
+                f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                rng.choice(AFFILIATIONS) if rng.random() < 0.4 else None
+            )
+            for _ in range(rng.randint(1, 8))
+        ]
+
+        return _result(f"{arxiv_id}v1", title, authors, abstract, published)
+
+    def _paper_by_id(self, arxiv_id):
+        arxiv_id = re.sub(r'v\d+$', '', arxiv_id.split('/abs/')[-1])
+        match = re.fullmatch(r'(\d{2})(\d{2})\.(\d{5})', arxiv_id)
+
+        try:
+            day = datetime(2000 + int(match.group(1)), int(match.group(2)), int(match.group(3)) // 1000)
+            published = self._published(day, int(match.group(3)) % 1000)
+        except (AttributeError, ValueError):
+            published = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+        return self._paper(arxiv_id, published)
+
+    def _newest_first(self):
+        now = datetime.now(timezone.utc)
+        for days_ago in range(MAX_FAKE_DAYS):
+            day = now - timedelta(days=days_ago)
+            for index in range(self.papers_per_day):
+                published = self._published(day, index)
+                if published <= now:
+                    yield self._paper(f"{day:%y%m}.{day.day * 1000 + index:05d}", published)
+
+    def _page(self, search, offset):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.injector.next_attempt(fixtures.request_key([_search_description(search), offset])):
+            raise arxiv.HTTPError(f"https://export.arxiv.org/api/query?search_query={search.query}&start={offset}", 3, 503)
+
+    def results(self, search, offset=0):
+        """
+        Yield the results of a search, newest first.
+
+        The query itself is ignored: every fake paper is in cs.AI.
+
+        Raises:
+            arxiv.HTTPError: For injected failures, one chance per page
+        """
+        if search.id_list:
+            self._page(search, 0)
+            for arxiv_id in search.id_list:
+                yield self._paper_by_id(arxiv_id)
+            return
+
+        for position, result in enumerate(self._newest_first()):
+            if search.max_results is not None and position >= search.max_results:
+                return
+            if position >= offset:
+                if (position - offset) % PAGE_SIZE == 0:
+                    self._page(search, position)
+                yield result
+
+def _serialize(result):
+    return {
+        'id': result.get_short_id(),
+        'title': result.title,
+        'authors': [author.name for author in result.authors],
+        'abstract': result.summary,
+        'published': result.published.isoformat(),
+        'updated': result.updated.isoformat(),
+        'categories': result.categories
+    }
+
+class RecordingArxivClient:
+    """Wraps an arxiv.Client, saving the results of each search as a fixture."""
+
+    def __init__(self, real, directory=ARXIV_FIXTURES_DIR):
+        self.real = real
+        self.directory = directory
+
+    def results(self, search, offset=0):
+        results = list(self.real.results(search, offset))
+
+        description = {**_search_description(search), 'offset': offset}
+        fixtures.save(self.directory, fixtures.request_key(description), {
+            'request': description,
+            'results': [_serialize(result) for result in results],
+            'recorded_date': datetime.now(timezone.utc).isoformat()
+        })
+
+        yield from results
+
+class ReplayArxivClient:
+    """
+    Answers only searches saved by RecordingArxivClient.
+
+    Query searches come back with publication dates moved forward by the
+    fixture's age, so date windows such as "the last 7 days" still select the
+    papers they did when recorded.
+    """
+
+    def __init__(self, directory=ARXIV_FIXTURES_DIR):
+        self.directory = directory
+
+    def results(self, search, offset=0):
+        description = {**_search_description(search), 'offset': offset}
+        fixture = fixtures.load(self.directory, fixtures.request_key(description), f"arXiv search {description}")
+
+        shift = timedelta(0)
+        if not search.id_list:
+            shift = datetime.now(timezone.utc) - datetime.fromisoformat(fixture['recorded_date'])
+
+        for entry in fixture['results']:
+            yield _result(
+                entry['id'],
+                entry['title'],
+                [_author(name) for name in entry['authors']],
+                entry['abstract'],
+                datetime.fromisoformat(entry['published']) + shift,
+                datetime.fromisoformat(entry['updated']) + shift,
+                entry['categories']
+            )
+
+def create_client():
+    """
+    Create an arXiv client for ARXIV_BACKEND.
+
+    Returns:
+        arxiv.Client, or a stand-in with the same results() method
+
+    Raises:
+        ValueError: If ARXIV_BACKEND is not a known backend
+    """
+    if ARXIV_BACKEND == 'fake':
+        return FakeArxivClient()
+    if ARXIV_BACKEND == 'replay':
+        return ReplayArxivClient()
+    if ARXIV_BACKEND == 'record':
+        return RecordingArxivClient(arxiv.Client())
+    if ARXIV_BACKEND == 'arxiv':
+        return arxiv.Client()
+
+    raise ValueError(f"Unknown ARXIV_BACKEND: {ARXIV_BACKEND}")
@@ -4,9 +4,160 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
+ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL')  # e.g. a local stand-in server for offline testing
 FLASK_SECRET_KEY = os.getenv('FLASK_SECRET_KEY', 'dev-secret-key')
 CHECK_INTERVAL_HOURS = int(os.getenv('CHECK_INTERVAL_HOURS', 24))
-DATABASE_PATH = 'papers.db'
+DATABASE_PATH = os.getenv('DATABASE_PATH', 'papers.db')  # Journal, embeddings, PDFs and lock files sit next to it
+
+# Claude calls (all go through app/llm.py)
+CLAUDE_MODEL = os.getenv('CLAUDE_MODEL', 'claude-3-5-sonnet-20241022')
+SUMMARY_MAX_TOKENS = int(os.getenv('SUMMARY_MAX_TOKENS', 1024))
+HIGHLIGHTS_MAX_TOKENS = int(os.getenv('HIGHLIGHTS_MAX_TOKENS', 2048))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', 60))
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))  # Simultaneous calls per process
+CLAUDE_FAST_MODEL = os.getenv('CLAUDE_FAST_MODEL', 'claude-3-5-haiku-20241022')
+
+# Model, output budget and timeout per kind of call. Routes are named like
+# the metrics labels: 'summary:<type>' for each summary type, and
+# 'highlights'. A call that times out is retried once on its fallback model.
+# Labels without an entry use CLAUDE_MODEL, SUMMARY_MAX_TOKENS and
+# LLM_TIMEOUT_SECONDS with no fallback.
+LLM_ROUTES = {
+    'summary:general': {'model': CLAUDE_MODEL, 'max_tokens': SUMMARY_MAX_TOKENS, 'timeout': LLM_TIMEOUT_SECONDS, 'fallback_model': CLAUDE_FAST_MODEL},
+    'summary:technical': {'model': CLAUDE_MODEL, 'max_tokens': 1536, 'timeout': 90, 'fallback_model': CLAUDE_FAST_MODEL},
+    'summary:mathematical': {'model': CLAUDE_MODEL, 'max_tokens': 2048, 'timeout': 120, 'fallback_model': CLAUDE_FAST_MODEL},
+    'summary:takeaway': {'model': CLAUDE_FAST_MODEL, 'max_tokens': 512, 'timeout': 30, 'fallback_model': None},
+    'summary:novelty': {'model': CLAUDE_MODEL, 'max_tokens': SUMMARY_MAX_TOKENS, 'timeout': LLM_TIMEOUT_SECONDS, 'fallback_model': CLAUDE_FAST_MODEL},
+    'summary:practical': {'model': CLAUDE_MODEL, 'max_tokens': SUMMARY_MAX_TOKENS, 'timeout': LLM_TIMEOUT_SECONDS, 'fallback_model': CLAUDE_FAST_MODEL},
+    'highlights': {'model': CLAUDE_MODEL, 'max_tokens': HIGHLIGHTS_MAX_TOKENS, 'timeout': 90, 'fallback_model': CLAUDE_FAST_MODEL},
+    'highlights:merge': {'model': CLAUDE_MODEL, 'max_tokens': HIGHLIGHTS_MAX_TOKENS, 'timeout': 90, 'fallback_model': CLAUDE_FAST_MODEL},
+    'deep:chunk': {'model': CLAUDE_FAST_MODEL, 'max_tokens': 768, 'timeout': LLM_TIMEOUT_SECONDS, 'fallback_model': None},
+}
+# The final call of a deep summary is labeled 'deep:summary:<type>' and uses
+# the settings of the type's own route
+LLM_ROUTES.update({f'deep:{label}': dict(route) for label, route in list(LLM_ROUTES.items()) if label.startswith('summary:')})
+
+# USD per million tokens: (input, output). Cache writes cost 1.25x input and
+# cache reads 0.1x input. Used for per-route cost in /api/llm-metrics.
+MODEL_PRICES = {
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'claude-3-5-sonnet-20240620': (3.00, 15.00),
+    'claude-3-5-haiku-20241022': (0.80, 4.00),
+    'claude-3-haiku-20240307': (0.25, 1.25),
+    'claude-3-opus-20240229': (15.00, 75.00),
+}
+
+# Offline backends for load tests and benchmarks. LLM_BACKEND and
+# ARXIV_BACKEND are each one of:
+#   'anthropic' / 'arxiv' - the real service (default)
+#   'fake'    - deterministic local stand-in, no key or network needed
+#   'record'  - the real service, saving every response under the fixtures dir
+#   'replay'  - only responses saved by 'record'; unknown requests fail
+LLM_BACKEND = os.getenv('LLM_BACKEND', 'anthropic').lower()
+ARXIV_BACKEND = os.getenv('ARXIV_BACKEND', 'arxiv').lower()
+LLM_FIXTURES_DIR = os.getenv('LLM_FIXTURES_DIR', os.path.join(os.path.splitext(DATABASE_PATH)[0] + '.fixtures', 'llm'))
+ARXIV_FIXTURES_DIR = os.getenv('ARXIV_FIXTURES_DIR', os.path.join(os.path.splitext(DATABASE_PATH)[0] + '.fixtures', 'arxiv'))
+FAKE_SEED = os.getenv('FAKE_SEED', '0')  # Same seed, same fake papers, replies and injected errors
+
+# Fake Claude: replies of about LLM_FAKE_OUTPUT_TOKENS words (per paper for
+# packed prompts), arriving after LLM_FAKE_LATENCY_SECONDS and then at
+# LLM_FAKE_TOKENS_PER_SECOND. LLM_FAKE_ERROR_RATE of attempts fail with one of
+# LLM_FAKE_ERRORS ('rate_limit', 'overloaded', 'timeout'), and calls beyond
+# LLM_FAKE_MAX_CONCURRENCY at once get a 429 (0 = no limit).
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv('LLM_FAKE_LATENCY_SECONDS', 0.5))
+LLM_FAKE_TOKENS_PER_SECOND = float(os.getenv('LLM_FAKE_TOKENS_PER_SECOND', 0))  # 0 = whole reply at once
+LLM_FAKE_OUTPUT_TOKENS = int(os.getenv('LLM_FAKE_OUTPUT_TOKENS', 200))
+LLM_FAKE_ERROR_RATE = float(os.getenv('LLM_FAKE_ERROR_RATE', 0))
+LLM_FAKE_ERRORS = [e.strip() for e in os.getenv('LLM_FAKE_ERRORS', 'rate_limit,overloaded,timeout').split(',') if e.strip()]
+LLM_FAKE_MAX_CONCURRENCY = int(os.getenv('LLM_FAKE_MAX_CONCURRENCY', 0))
+
+# Fake arXiv: ARXIV_FAKE_PAPERS_PER_DAY cs.AI papers a day, the given share of
+# them alignment-related. Each page of 100 results takes
+# ARXIV_FAKE_LATENCY_SECONDS and fails with probability ARXIV_FAKE_ERROR_RATE.
+ARXIV_FAKE_PAPERS_PER_DAY = int(os.getenv('ARXIV_FAKE_PAPERS_PER_DAY', 40))
+ARXIV_FAKE_ALIGNMENT_RATE = float(os.getenv('ARXIV_FAKE_ALIGNMENT_RATE', 0.5))
+ARXIV_FAKE_LATENCY_SECONDS = float(os.getenv('ARXIV_FAKE_LATENCY_SECONDS', 0.2))
+ARXIV_FAKE_ERROR_RATE = float(os.getenv('ARXIV_FAKE_ERROR_RATE', 0))
+
+# Claude summarization throughput
+# Summary worker threads per process. Every Claude call, summary or not, is
+# also capped by LLM_MAX_CONCURRENCY (and the adaptive limiter below it), so
+# the lower of the two wins for summaries; workers beyond that limit wait.
+SUMMARY_CONCURRENCY = int(os.getenv('SUMMARY_CONCURRENCY', LLM_MAX_CONCURRENCY))
+SUMMARY_QUEUE_AGING_SECONDS = int(os.getenv('SUMMARY_QUEUE_AGING_SECONDS', 300))  # Queued work moves up a priority level this often
+SUMMARY_BATCH_LIMIT = int(os.getenv('SUMMARY_BATCH_LIMIT', 100))  # Papers per scheduled summarization run
+
+# Short summary types can be generated several papers per request. Types
+# listed in PRECOMPUTE_SUMMARY_TYPES (comma-separated, e.g. 'takeaway') are
+# generated this way for the backlog after each scheduled run.
+SUMMARY_PACK_SIZE = int(os.getenv('SUMMARY_PACK_SIZE', 8))  # Papers per packed request
+PRECOMPUTE_SUMMARY_TYPES = [t.strip() for t in os.getenv('PRECOMPUTE_SUMMARY_TYPES', '').split(',') if t.strip()]
+
+# Every generated summary is fsynced here before its database write and
+# replayed at the start of the next run, so a crash never loses paid output.
+SUMMARY_JOURNAL_PATH = os.path.splitext(DATABASE_PATH)[0] + '.summaries.journal'
+SUMMARY_RUN_STALE_MINUTES = int(os.getenv('SUMMARY_RUN_STALE_MINUTES', 30))  # Silent this long = interrupted
+
+# Concurrent requests for the same summary share one Claude call. Across
+# processes the generating caller holds a row in summary_leases; others wait
+# for it to finish, or take over once it is this old.
+SUMMARY_LEASE_SECONDS = int(os.getenv('SUMMARY_LEASE_SECONDS', 300))
+
+# Deep summaries: the paper PDF is downloaded and cached here, its text split
+# into chunks of about DEEP_CHUNK_TOKENS, each chunk summarized, and the type's
+# summary written from those. Very long papers get larger chunks rather than
+# more than DEEP_MAX_CHUNKS of them.
+PDF_CACHE_DIR = os.path.splitext(DATABASE_PATH)[0] + '.pdfs'
+PDF_DOWNLOAD_TIMEOUT_SECONDS = int(os.getenv('PDF_DOWNLOAD_TIMEOUT_SECONDS', 60))
+PDF_EXTRACT_WORKERS = int(os.getenv('PDF_EXTRACT_WORKERS', 2))  # Processes extracting PDF text
+DEEP_CHUNK_TOKENS = int(os.getenv('DEEP_CHUNK_TOKENS', 3000))
+DEEP_MAX_CHUNKS = int(os.getenv('DEEP_MAX_CHUNKS', 24))
+
+# Highlight summaries are cached per highlight set. When highlights were only
+# added, the new passages are merged into the previous summary, up to this many
+# times in a row before the summary is regenerated from all highlights.
+HIGHLIGHTS_MAX_MERGES = int(os.getenv('HIGHLIGHTS_MAX_MERGES', 5))
+HIGHLIGHTS_HISTORY = 10  # Cached highlight summaries kept per paper
+
+# Failed summaries are retried with exponential backoff (base * 2^(attempt-1), capped at a day)
+SUMMARY_MAX_ATTEMPTS = int(os.getenv('SUMMARY_MAX_ATTEMPTS', 6))
+SUMMARY_RETRY_BASE_MINUTES = int(os.getenv('SUMMARY_RETRY_BASE_MINUTES', 5))
+SUMMARY_RETRY_POLL_MINUTES = int(os.getenv('SUMMARY_RETRY_POLL_MINUTES', 15))
+SUMMARY_RETRY_LIMIT = int(os.getenv('SUMMARY_RETRY_LIMIT', 20))  # Papers per retry pass
+SUMMARY_RETRY_CONCURRENCY = int(os.getenv('SUMMARY_RETRY_CONCURRENCY', 2))
+
+# Bulk mode: summarize the backlog through the Message Batches API instead
+USE_BATCH_SUMMARIES = os.getenv('USE_BATCH_SUMMARIES', 'false').lower() == 'true'
+BATCH_SUMMARY_LIMIT = int(os.getenv('BATCH_SUMMARY_LIMIT', 1000))  # Papers per submitted batch
+BATCH_POLL_MINUTES = int(os.getenv('BATCH_POLL_MINUTES', 10))
+
+# SQLite connection tuning
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 10000))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', 65536))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # 256 MB
+SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 10))
+
+# Local embedding index for "similar papers" (float32 matrix stored next to the database)
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', 256))
+EMBEDDINGS_PATH = os.path.splitext(DATABASE_PATH)[0] + '.embeddings.f32'
+
+# Set USE_WORKER_PROCESS=true when running worker.py alongside the web
+# server: the web process then queues fetch/summarize/re-rank work in the
+# database instead of running it, and does not start its own scheduler.
+USE_WORKER_PROCESS = os.getenv('USE_WORKER_PROCESS', 'false').lower() == 'true'
+WORKER_POLL_SECONDS = int(os.getenv('WORKER_POLL_SECONDS', 5))
+
+# Only the process holding this lock runs the background scheduler
+SCHEDULER_LOCK_PATH = os.path.splitext(DATABASE_PATH)[0] + '.scheduler.lock'
+LEADER_RETRY_SECONDS = int(os.getenv('LEADER_RETRY_SECONDS', 30))
+
+# Near-duplicate detection: papers whose estimated Jaccard similarity of
+# title+abstract shingles reaches this threshold are linked as duplicates
+DUPLICATE_THRESHOLD = float(os.getenv('DUPLICATE_THRESHOLD', 0.8))
+
+# Papers at or above this rank score count as "high impact" in stats
+HIGH_RANK_THRESHOLD = 7
 
 # High-impact organizations and research groups for ranking
 PROMINENT_AFFILIATIONS = {
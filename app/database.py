@@ -1,8 +1,15 @@
-from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, Float, Boolean
+import re
+from contextlib import contextmanager
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event, text, Column, String, Integer, Text, DateTime, Float, Boolean, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.exc import OperationalError
 from datetime import datetime
-from app.config import DATABASE_PATH
+from app.config import (
+    DATABASE_PATH, HIGH_RANK_THRESHOLD, SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE, SQLITE_POOL_SIZE
+)
 
 Base = declarative_base()
 
@@ -80,9 +87,412 @@ class PaperHighlight(Base):
     def __repr__(self):
         return f"<PaperHighlight(paper_id='{self.paper_id}', page={self.page_number})>"
 
-engine = create_engine(f'sqlite:///{DATABASE_PATH}')
+class BackgroundJob(Base):
+    __tablename__ = 'background_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job_type = Column(String, nullable=False)  # 'fetch', 'summarize', 'rerank'
+    params = Column(Text)  # JSON keyword arguments for the job
+    status = Column(String, nullable=False, default='pending')  # 'pending', 'running', 'done', 'failed'
+    result = Column(Text)  # JSON result on success
+    error = Column(Text)  # Error message on failure
+    created_date = Column(DateTime, default=datetime.utcnow)
+    started_date = Column(DateTime)
+    finished_date = Column(DateTime)
+
+    def __repr__(self):
+        return f"<BackgroundJob(id={self.id}, type='{self.job_type}', status='{self.status}')>"
+
+class SummaryBatch(Base):
+    __tablename__ = 'summary_batches'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(String, unique=True)  # Message Batches API ID, set once the batch is created
+    summary_type = Column(String, nullable=False, default='general')
+    request_map = Column(Text, nullable=False)  # JSON {custom_id: [paper_id, prompt_hash, content_hash]}
+    status = Column(String, nullable=False, default='submitting')  # 'submitting', 'in_progress', 'applied', 'failed'
+    summarized_count = Column(Integer)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    applied_date = Column(DateTime)
+
+    def __repr__(self):
+        return f"<SummaryBatch(batch_id='{self.batch_id}', status='{self.status}')>"
+
+class SummaryRun(Base):
+    __tablename__ = 'summary_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    paper_ids = Column(Text, nullable=False)  # JSON list of papers planned for this run
+    completed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False, default='running')  # 'running', 'done', 'resumed'
+    started_date = Column(DateTime, default=datetime.utcnow)
+    updated_date = Column(DateTime, default=datetime.utcnow)  # Heartbeat, bumped per result
+
+    def __repr__(self):
+        return f"<SummaryRun(id={self.id}, status='{self.status}', completed={self.completed})>"
+
+class HighlightSummary(Base):
+    __tablename__ = 'highlight_summaries'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    highlights_hash = Column(String, primary_key=True)  # Hash of the highlights, in the order they were made
+    prompt_hash = Column(String, nullable=False)  # Hash of model, token limit and instructions
+    highlight_count = Column(Integer, nullable=False)
+    merges = Column(Integer, nullable=False, default=0)  # Incremental updates since the last full generation
+    summary = Column(Text, nullable=False)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<HighlightSummary(paper_id='{self.paper_id}', highlight_count={self.highlight_count})>"
+
+class ChunkSummary(Base):
+    __tablename__ = 'chunk_summaries'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    chunk_hash = Column(String, primary_key=True)  # Hash of the chunk of extracted PDF text
+    prompt_hash = Column(String, primary_key=True)  # Hash of model, token limit and chunk instructions
+    summary = Column(Text, nullable=False)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ChunkSummary(paper_id='{self.paper_id}', chunk_hash='{self.chunk_hash}')>"
+
+class SummaryLease(Base):
+    __tablename__ = 'summary_leases'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    summary_type = Column(String, primary_key=True)  # Key of SUMMARY_TYPES
+    prompt_hash = Column(String, primary_key=True)  # Same as paper_summaries.prompt_hash
+    owner = Column(String, nullable=False)  # Process generating the summary
+    expires_date = Column(DateTime, nullable=False)  # Taken over by the next caller once passed
+
+    def __repr__(self):
+        return f"<SummaryLease(paper_id='{self.paper_id}', summary_type='{self.summary_type}', owner='{self.owner}')>"
+
+class SummaryAttempt(Base):
+    __tablename__ = 'summary_attempts'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    summary_type = Column(String, primary_key=True, default='general')  # Key of SUMMARY_TYPES
+    attempts = Column(Integer, nullable=False, default=0)
+    error_class = Column(String)  # e.g. 'RateLimitError', 'BadRequestError'
+    last_error = Column(Text)
+    status = Column(String, nullable=False, default='retrying')  # 'retrying', 'failed' (permanent or out of attempts)
+    next_retry_date = Column(DateTime)
+    updated_date = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<SummaryAttempt(paper_id='{self.paper_id}', summary_type='{self.summary_type}', attempts={self.attempts}, status='{self.status}')>"
+
+class PaperStat(Base):
+    __tablename__ = 'paper_stats'
+
+    name = Column(String, primary_key=True)  # 'total', 'summarized', 'high_rank', 'version', 'feedback_version'
+    value = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<PaperStat(name='{self.name}', value={self.value})>"
+
+class DailyIngestStat(Base):
+    __tablename__ = 'paper_ingest_daily'
+
+    day = Column(String, primary_key=True)  # YYYY-MM-DD of fetched_date
+    count = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyIngestStat(day='{self.day}', count={self.count})>"
+
+class PaperEmbedding(Base):
+    __tablename__ = 'paper_embeddings'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    row = Column(Integer, nullable=False, unique=True)  # Row in the embeddings matrix file
+
+    def __repr__(self):
+        return f"<PaperEmbedding(paper_id='{self.paper_id}', row={self.row})>"
+
+class PaperMinHash(Base):
+    __tablename__ = 'paper_minhashes'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    signature = Column(LargeBinary, nullable=False)  # MinHash signature, packed uint32 array
+
+    def __repr__(self):
+        return f"<PaperMinHash(paper_id='{self.paper_id}')>"
+
+class PaperLSHBucket(Base):
+    __tablename__ = 'paper_lsh_buckets'
+
+    band = Column(Integer, primary_key=True)  # LSH band number
+    bucket = Column(Integer, primary_key=True)  # Hash of the signature rows in this band
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+
+    def __repr__(self):
+        return f"<PaperLSHBucket(band={self.band}, paper_id='{self.paper_id}')>"
+
+class PaperDuplicate(Base):
+    __tablename__ = 'paper_duplicates'
+
+    paper_id = Column(String, primary_key=True)  # Suspected duplicate (arXiv ID)
+    canonical_id = Column(String, nullable=False)  # Paper it duplicates
+    similarity = Column(Float, nullable=False)  # Estimated Jaccard similarity
+    detected_date = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PaperDuplicate(paper_id='{self.paper_id}', canonical_id='{self.canonical_id}')>"
+
+class PaperSummary(Base):
+    __tablename__ = 'paper_summaries'
+
+    paper_id = Column(String, primary_key=True)  # arXiv ID
+    summary_type = Column(String, primary_key=True)  # Key of SUMMARY_TYPES
+    prompt_hash = Column(String, primary_key=True)  # Hash of model, token limit and instruction prefix
+    content_hash = Column(String, primary_key=True)  # Hash of the paper text the summary was made from
+    summary = Column(Text, nullable=False)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<PaperSummary(paper_id='{self.paper_id}', summary_type='{self.summary_type}')>"
+
+# Counters in paper_stats are maintained by these triggers so that /api/stats
+# never has to scan the papers table. 'version' is bumped on every change and
+# doubles as the ETag for the stats endpoint.
+STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS papers_stats_insert AFTER INSERT ON papers
+    BEGIN
+        UPDATE paper_stats SET value = value + 1 WHERE name IN ('total', 'version');
+        UPDATE paper_stats SET value = value + (NEW.summary IS NOT NULL) WHERE name = 'summarized';
+        UPDATE paper_stats SET value = value + (IFNULL(NEW.rank_score, 0) >= {HIGH_RANK_THRESHOLD}) WHERE name = 'high_rank';
+        INSERT OR IGNORE INTO paper_ingest_daily (day, count) VALUES (date(NEW.fetched_date), 0);
+        UPDATE paper_ingest_daily SET count = count + 1 WHERE day = date(NEW.fetched_date);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS papers_stats_delete AFTER DELETE ON papers
+    BEGIN
+        UPDATE paper_stats SET value = value - 1 WHERE name = 'total';
+        UPDATE paper_stats SET value = value + 1 WHERE name = 'version';
+        UPDATE paper_stats SET value = value - (OLD.summary IS NOT NULL) WHERE name = 'summarized';
+        UPDATE paper_stats SET value = value - (IFNULL(OLD.rank_score, 0) >= {HIGH_RANK_THRESHOLD}) WHERE name = 'high_rank';
+        UPDATE paper_ingest_daily SET count = count - 1 WHERE day = date(OLD.fetched_date);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS papers_stats_update AFTER UPDATE OF summary, rank_score ON papers
+    BEGIN
+        UPDATE paper_stats SET value = value + 1 WHERE name = 'version';
+        UPDATE paper_stats
+            SET value = value + (NEW.summary IS NOT NULL) - (OLD.summary IS NOT NULL)
+            WHERE name = 'summarized';
+        UPDATE paper_stats
+            SET value = value + (IFNULL(NEW.rank_score, 0) >= {HIGH_RANK_THRESHOLD})
+                              - (IFNULL(OLD.rank_score, 0) >= {HIGH_RANK_THRESHOLD})
+            WHERE name = 'high_rank';
+    END
+    """,
+]
+
+STAT_NAMES = ('total', 'summarized', 'high_rank', 'version', 'feedback_version')
+
+# Full-text index over papers and their highlights. papers has a string primary
+# key, so papers_fts_docs hands out stable integer rowids for the FTS table
+# (implicit rowids on papers are not stable across VACUUM).
+SEARCH_INDEX_SQL = """
+    INSERT INTO papers_fts (rowid, paper_id, title, abstract, summary, authors, highlights)
+    SELECT d.rowid, p.id, p.title, p.abstract, p.summary, p.authors,
+           (SELECT group_concat(h.highlight_text, ' ') FROM paper_highlights h WHERE h.paper_id = p.id)
+    FROM papers p JOIN papers_fts_docs d ON d.paper_id = p.id
+"""
+
+SEARCH_DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS papers_fts_docs (
+        rowid INTEGER PRIMARY KEY,
+        paper_id VARCHAR NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+        paper_id UNINDEXED, title, abstract, summary, authors, highlights,
+        tokenize = 'porter unicode61'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS papers_fts_insert AFTER INSERT ON papers
+    BEGIN
+        INSERT OR IGNORE INTO papers_fts_docs (paper_id) VALUES (NEW.id);
+        {SEARCH_INDEX_SQL} WHERE p.id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS papers_fts_update AFTER UPDATE OF title, abstract, summary, authors ON papers
+    BEGIN
+        DELETE FROM papers_fts WHERE rowid = (SELECT rowid FROM papers_fts_docs WHERE paper_id = OLD.id);
+        {SEARCH_INDEX_SQL} WHERE p.id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers
+    BEGIN
+        DELETE FROM papers_fts WHERE rowid = (SELECT rowid FROM papers_fts_docs WHERE paper_id = OLD.id);
+        DELETE FROM papers_fts_docs WHERE paper_id = OLD.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS highlights_fts_insert AFTER INSERT ON paper_highlights
+    BEGIN
+        DELETE FROM papers_fts WHERE rowid = (SELECT rowid FROM papers_fts_docs WHERE paper_id = NEW.paper_id);
+        {SEARCH_INDEX_SQL} WHERE p.id = NEW.paper_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS highlights_fts_update AFTER UPDATE OF highlight_text ON paper_highlights
+    BEGIN
+        DELETE FROM papers_fts WHERE rowid = (SELECT rowid FROM papers_fts_docs WHERE paper_id = NEW.paper_id);
+        {SEARCH_INDEX_SQL} WHERE p.id = NEW.paper_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS highlights_fts_delete AFTER DELETE ON paper_highlights
+    BEGIN
+        DELETE FROM papers_fts WHERE rowid = (SELECT rowid FROM papers_fts_docs WHERE paper_id = OLD.paper_id);
+        {SEARCH_INDEX_SQL} WHERE p.id = OLD.paper_id;
+    END
+    """,
+]
+
+# Indexes for the feedback analytics in app/learning.py. Declared as DDL
+# (rather than on the models) so existing databases get them on startup.
+LEARNING_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_user_feedback_type_date ON user_feedback (feedback_type, created_date)",
+    "CREATE INDEX IF NOT EXISTS ix_papers_summary_rating ON papers (summary_rating)",
+    "CREATE INDEX IF NOT EXISTS ix_papers_user_rank_override ON papers (user_rank_override)",
+]
+
+def _normalize_ddl(sql):
+    # sqlite_master keeps the statement text without IF NOT EXISTS
+    return ' '.join(sql.replace('IF NOT EXISTS ', '').split())
+
+def _replace_stale_triggers(conn, ddls):
+    """
+    Drop triggers whose stored definition differs from the current one, e.g.
+    after HIGH_RANK_THRESHOLD changed, so CREATE ... IF NOT EXISTS recreates them.
+
+    Returns:
+        bool: Whether any trigger was dropped
+    """
+    installed = dict(conn.execute(text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger'")).all())
+    stale = False
+
+    for ddl in ddls:
+        name = re.search(r'CREATE TRIGGER IF NOT EXISTS (\w+)', ddl).group(1)
+        if name in installed and _normalize_ddl(installed[name]) != _normalize_ddl(ddl):
+            conn.execute(text(f"DROP TRIGGER {name}"))
+            stale = True
+
+    return stale
+
+def _install_triggers(engine):
+    """Create derived-data triggers and seed their tables on a fresh or existing database."""
+    with engine.begin() as conn:
+        seeded = conn.execute(text("SELECT COUNT(*) FROM paper_stats")).scalar() > 0
+        for name in STAT_NAMES:
+            conn.execute(text("INSERT OR IGNORE INTO paper_stats (name, value) VALUES (:name, 0)"), {'name': name})
+        stats_changed = _replace_stale_triggers(conn, STATS_TRIGGERS)
+        for ddl in STATS_TRIGGERS + LEARNING_INDEXES:
+            conn.execute(text(ddl))
+
+        has_search_index = conn.execute(
+            text("SELECT COUNT(*) FROM sqlite_master WHERE name = 'papers_fts'")
+        ).scalar() > 0
+        try:
+            for ddl in SEARCH_DDL:
+                conn.execute(text(ddl))
+        except OperationalError as e:
+            # Python builds without FTS5 simply run without search
+            print(f"Full-text search unavailable: {e}")
+            has_search_index = True
+
+    # Databases created before the counters existed, or whose counters were
+    # kept by an older definition, need one full recount
+    if not seeded or stats_changed:
+        from app.stats import reconcile_stats
+        reconcile_stats()
+
+    if not has_search_index:
+        from app.search import rebuild_search_index
+        rebuild_search_index()
+
+engine = create_engine(
+    f'sqlite:///{DATABASE_PATH}',
+    # Sessions are handed between request threads and the scheduler, so the
+    # pool (not sqlite3's same-thread check) is what keeps connections exclusive.
+    connect_args={'check_same_thread': False},
+    pool_size=SQLITE_POOL_SIZE,
+    max_overflow=SQLITE_POOL_SIZE * 2,
+    pool_timeout=30
+)
+
+@event.listens_for(engine, 'connect')
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection.
+
+    WAL lets readers proceed while the scheduler writes a batch, and NORMAL
+    sync is durable across application crashes in WAL mode. busy_timeout makes
+    concurrent writers wait for the lock instead of failing immediately.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 Base.metadata.create_all(engine)
 Session = sessionmaker(bind=engine)
 
+# One session per Flask app context (i.e. per request), removed on teardown
+db_session = scoped_session(Session, scopefunc=lambda: id(app_ctx._get_current_object()))
+
 def get_session():
+    """Return a new independent session. The caller is responsible for closing it."""
     return Session()
+
+def get_request_session():
+    """
+    Return the session for the current request.
+
+    It is shared by everything in the request and closed automatically when
+    the app context tears down, even if the view raises.
+    """
+    return db_session()
+
+@contextmanager
+def session_scope():
+    """
+    Provide a transactional session for the scheduler and command-line scripts.
+
+    Commits on success, rolls back on error, and always closes the session.
+    """
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def init_app(app):
+    """Register request-session teardown on a Flask app."""
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        db_session.remove()
+
+_install_triggers(engine)
@@ -0,0 +1,179 @@
+import hashlib
+import re
+import zlib
+import numpy as np
+from sqlalchemy import or_, and_
+from app.database import session_scope, Paper, PaperMinHash, PaperLSHBucket, PaperDuplicate
+from app.config import DUPLICATE_THRESHOLD
+
+# 16 bands of 8 rows puts the LSH candidate threshold around 0.7 Jaccard,
+# comfortably below DUPLICATE_THRESHOLD so true duplicates are rarely missed.
+NUM_PERMUTATIONS = 128
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // NUM_BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Fixed seed: signatures must be comparable across processes and restarts
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_PERM_B = _rng.randint(0, 1 << 32, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+def shingles(title, abstract):
+    """
+    Get the set of word 3-gram shingles for a paper.
+
+    Args:
+        title: Paper title
+        abstract: Paper abstract
+
+    Returns:
+        set: Shingle strings
+    """
+    words = re.findall(r'[a-z0-9]+', f'{title} {abstract}'.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+def minhash_signature(title, abstract):
+    """
+    Compute the MinHash signature of a paper's title and abstract.
+
+    Returns:
+        numpy.ndarray: uint32 array of length NUM_PERMUTATIONS
+    """
+    shingle_set = shingles(title, abstract)
+    if not shingle_set:
+        return np.full(NUM_PERMUTATIONS, _MAX_HASH, dtype=np.uint32)
+
+    hashes = np.array([zlib.crc32(s.encode('utf-8')) for s in shingle_set], dtype=np.uint64)
+
+    # (a * x + b) mod p for every permutation/shingle pair; a and x are both
+    # below 2**32, so the product cannot overflow uint64.
+    permuted = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+def band_buckets(signature):
+    """
+    Split a signature into LSH bands and hash each band to a bucket key.
+
+    Returns:
+        List of (band, bucket) tuples
+    """
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes()
+        digest = hashlib.blake2b(rows, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'big', signed=True)))
+    return buckets
+
+def estimated_similarity(signature_a, signature_b):
+    """Estimate the Jaccard similarity of two papers from their signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+def find_duplicate(session, paper_id, signature):
+    """
+    Look up the best existing near-duplicate for a signature.
+
+    Only papers sharing at least one LSH bucket are compared, so the cost
+    depends on the number of candidates, not the size of the corpus.
+
+    Args:
+        session: Database session
+        paper_id: ID of the paper being checked (excluded from matches)
+        signature: Its MinHash signature
+
+    Returns:
+        tuple: (canonical paper ID, similarity), or (None, 0.0)
+    """
+    conditions = [
+        and_(PaperLSHBucket.band == band, PaperLSHBucket.bucket == bucket)
+        for band, bucket in band_buckets(signature)
+    ]
+    candidate_ids = {
+        pid for (pid,) in session.query(PaperLSHBucket.paper_id).filter(or_(*conditions)).distinct()
+        if pid != paper_id
+    }
+
+    if not candidate_ids:
+        return None, 0.0
+
+    best_id, best_similarity = None, 0.0
+    for candidate in session.query(PaperMinHash).filter(PaperMinHash.paper_id.in_(candidate_ids)):
+        similarity = estimated_similarity(signature, np.frombuffer(candidate.signature, dtype=np.uint32))
+        if similarity > best_similarity:
+            best_id, best_similarity = candidate.paper_id, similarity
+
+    if best_similarity < DUPLICATE_THRESHOLD:
+        return None, best_similarity
+
+    # Always link to the root of a duplicate chain
+    link = session.get(PaperDuplicate, best_id)
+    if link:
+        best_id = link.canonical_id
+
+    return best_id, best_similarity
+
+def register_paper(session, paper_id, title, abstract):
+    """
+    Store a paper's MinHash signature and LSH buckets, linking it to a
+    canonical paper if it is a near-duplicate of one already stored.
+
+    Adds rows to the given session; the caller commits.
+
+    Args:
+        session: Database session
+        paper_id: arXiv ID of the new paper
+        title: Paper title
+        abstract: Paper abstract
+
+    Returns:
+        str: Canonical paper ID if the paper is a suspected duplicate, else None
+    """
+    if session.get(PaperMinHash, paper_id):
+        return None
+
+    signature = minhash_signature(title, abstract)
+    canonical_id, similarity = find_duplicate(session, paper_id, signature)
+
+    session.add(PaperMinHash(paper_id=paper_id, signature=signature.tobytes()))
+    for band, bucket in band_buckets(signature):
+        session.add(PaperLSHBucket(band=band, bucket=bucket, paper_id=paper_id))
+
+    if canonical_id:
+        session.add(PaperDuplicate(paper_id=paper_id, canonical_id=canonical_id, similarity=similarity))
+        print(f"  Suspected duplicate of {canonical_id} (similarity {similarity:.2f})")
+
+    return canonical_id
+
+def duplicate_paper_ids(session):
+    """Subquery of paper IDs linked as duplicates, for excluding them from queues."""
+    return session.query(PaperDuplicate.paper_id)
+
+def build_duplicate_index(batch_size=500):
+    """
+    Compute signatures for papers that don't have one yet, oldest first so the
+    earliest copy of a paper becomes the canonical one.
+
+    Returns:
+        int: Number of duplicates found
+    """
+    with session_scope() as session:
+        signed = {pid for (pid,) in session.query(PaperMinHash.paper_id).all()}
+        papers = [
+            p for p in session.query(Paper.id, Paper.title, Paper.abstract).order_by(Paper.fetched_date, Paper.published_date)
+            if p.id not in signed
+        ]
+
+        duplicates = 0
+        for i, paper in enumerate(papers, 1):
+            if register_paper(session, paper.id, paper.title, paper.abstract):
+                duplicates += 1
+            if i % batch_size == 0:
+                session.commit()
+
+    print(f"Checked {len(papers)} papers, found {duplicates} suspected duplicates.")
+    return duplicates
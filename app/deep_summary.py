@@ -0,0 +1,270 @@
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import threading
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from http.client import HTTPException
+from pypdf.errors import PyPdfError
+from app.config import (
+    PDF_CACHE_DIR, PDF_DOWNLOAD_TIMEOUT_SECONDS, PDF_EXTRACT_WORKERS, DEEP_CHUNK_TOKENS, DEEP_MAX_CHUNKS
+)
+from app.database import session_scope, ChunkSummary
+from app.pdf_text import extract_pages
+from app.work_queue import summary_queue, PRIORITY_INTERACTIVE
+from app import llm, singleflight
+
+# Rough conversion used to size chunks without a tokenizer
+CHARS_PER_TOKEN = 4
+
+CHUNK_SYSTEM = """You will be given one section of an AI alignment research paper. Summarize it in a few dense paragraphs for a reader who will combine the summaries of every section into an overall summary.
+
+Keep the specific claims, methods, results, numbers and definitions; skip citations and boilerplate. Use LaTeX notation for mathematical expressions ($...$ inline, $$...$$ display)."""
+
+class PdfUnavailableError(Exception):
+    """Raised when a paper's PDF can't be downloaded from arXiv."""
+
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def _get_extract_pool():
+    # Spawned rather than forked: the web server and scheduler are threaded
+    global _extract_pool
+
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=max(1, PDF_EXTRACT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _extract_pool
+
+def _pdf_path(paper_id):
+    # Old-style arXiv IDs contain a slash
+    return os.path.join(PDF_CACHE_DIR, paper_id.replace('/', '_') + '.pdf')
+
+def download_pdf(paper_id, pdf_url):
+    """
+    Download a paper's PDF into the cache, unless it is already there.
+
+    Returns:
+        str: Path to the cached PDF
+
+    Raises:
+        PdfUnavailableError: If the download fails or times out
+    """
+    path = _pdf_path(paper_id)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+
+    try:
+        with urllib.request.urlopen(pdf_url, timeout=PDF_DOWNLOAD_TIMEOUT_SECONDS) as response, open(partial, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        os.replace(partial, path)
+    except (urllib.error.URLError, HTTPException, TimeoutError, ConnectionError) as e:
+        raise PdfUnavailableError(f"Could not download the PDF of {paper_id}: {e}") from e
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+    return path
+
+def get_paper_pages(paper_id, pdf_url):
+    """
+    Get the text of each page of a paper, extracting it on first use.
+
+    Extraction runs in a separate process so parsing a large PDF doesn't hold
+    the GIL in the serving process. The result is cached next to the PDF.
+
+    Returns:
+        list: Text of each page
+
+    Raises:
+        ValueError: If the paper has no PDF URL or the PDF can't be parsed
+        PdfUnavailableError: If the PDF can't be downloaded
+    """
+    text_path = _pdf_path(paper_id) + '.json'
+    if os.path.exists(text_path):
+        with open(text_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    if not pdf_url:
+        raise ValueError(f"No PDF available for {paper_id}")
+
+    path = download_pdf(paper_id, pdf_url)
+    try:
+        pages = _get_extract_pool().submit(extract_pages, path).result()
+    except PyPdfError as e:
+        # Likely an error page saved in place of the PDF; fetch it again next time
+        os.remove(path)
+        raise ValueError(f"The PDF of {paper_id} could not be read: {e}") from e
+
+    partial = f"{text_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(pages, f)
+    os.replace(partial, text_path)
+
+    return pages
+
+def chunk_pages(pages, chunk_tokens=DEEP_CHUNK_TOKENS, max_chunks=DEEP_MAX_CHUNKS):
+    """
+    Split extracted text into chunks of roughly chunk_tokens tokens.
+
+    Lines are kept whole and each chunk is labeled with its page range. The
+    reference list is dropped. Papers that would need more than max_chunks
+    chunks get proportionally larger ones.
+
+    Returns:
+        list: Chunk texts
+    """
+    lines = [
+        (page_number, line.strip())
+        for page_number, text in enumerate(pages, 1)
+        for line in text.splitlines()
+        if line.strip()
+    ]
+
+    # The last "References" heading in the second half of the paper
+    for i in range(len(lines) - 1, len(lines) // 2, -1):
+        if re.fullmatch(r'(\d+\.?\s*)?(references|bibliography)', lines[i][1], re.IGNORECASE):
+            lines = lines[:i]
+            break
+
+    total = sum(len(line) + 1 for _, line in lines)
+    budget = max(chunk_tokens * CHARS_PER_TOKEN, math.ceil(total / max(1, max_chunks)))
+
+    chunks = []
+    current, size, first_page = [], 0, None
+
+    def flush(last_page):
+        chunks.append(f"[Pages {first_page}-{last_page}]\n" + '\n'.join(current))
+
+    last_page = None
+    for page_number, line in lines:
+        # A line longer than the budget is split rather than overflowing a chunk
+        for start in range(0, len(line), budget):
+            piece = line[start:start + budget]
+            if current and size + len(piece) > budget:
+                flush(last_page)
+                current, size = [], 0
+            if not current:
+                first_page = page_number
+            current.append(piece)
+            size += len(piece) + 1
+            last_page = page_number
+
+    if current:
+        flush(last_page)
+
+    return chunks
+
+def _hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+def _chunk_prompt_hash():
+    route = llm.route_settings('deep:chunk')
+    return _hash(f"{route['model']}\n{route['max_tokens']}\n{CHUNK_SYSTEM}")
+
+def _stored_chunk_summaries(paper_id, prompt_hash, chunk_hashes):
+    with session_scope() as session:
+        rows = session.query(ChunkSummary.chunk_hash, ChunkSummary.summary).filter(
+            ChunkSummary.paper_id == paper_id,
+            ChunkSummary.prompt_hash == prompt_hash,
+            ChunkSummary.chunk_hash.in_(chunk_hashes)
+        )
+        return dict(rows.all())
+
+def _summarize_chunks(paper_id, title, chunks, prompt_hash, chunk_hashes, priority):
+    done = _stored_chunk_summaries(paper_id, prompt_hash, chunk_hashes)
+
+    futures = {
+        summary_queue.submit(
+            llm.complete, f"Paper Title: {title}\n\n{chunk}", label='deep:chunk', system=CHUNK_SYSTEM,
+            priority=priority
+        ): chunk_hash
+        for chunk_hash, chunk in zip(chunk_hashes, chunks)
+        if chunk_hash not in done
+    }
+    if futures:
+        print(f"Summarizing {len(futures)} of {len(chunks)} chunks of {paper_id}...")
+
+    # Saved as they arrive, so a failure only costs the chunks still missing
+    error = None
+    for future in as_completed(futures):
+        chunk_hash = futures[future]
+        try:
+            summary = future.result()
+        except Exception as e:
+            error = error or e
+            continue
+
+        with session_scope() as session:
+            session.merge(ChunkSummary(
+                paper_id=paper_id, chunk_hash=chunk_hash, prompt_hash=prompt_hash, summary=summary
+            ))
+        done[chunk_hash] = summary
+
+    if error is not None:
+        raise error
+
+    return [done[chunk_hash] for chunk_hash in chunk_hashes]
+
+def check_full_text(paper_id, pdf_url):
+    """
+    Download and extract a paper's text ahead of a deep summary, so a missing
+    or unreadable PDF is reported before any Claude calls are queued.
+
+    Raises:
+        ValueError: If the paper has no PDF, or no text can be extracted from it
+        PdfUnavailableError: If the PDF can't be downloaded
+    """
+    if not chunk_pages(get_paper_pages(paper_id, pdf_url)):
+        raise ValueError(f"No text could be extracted from the PDF of {paper_id}")
+
+def summarize_full_text(paper_id, pdf_url, title, priority=PRIORITY_INTERACTIVE):
+    """
+    Map phase of a deep summary: summarize each chunk of the paper's full text.
+
+    Chunk summaries are stored in chunk_summaries, so producing a second
+    summary type (or regenerating one) only repeats the final reduce call.
+    Concurrent requests for the same paper share one map phase.
+
+    Args:
+        paper_id: arXiv ID
+        pdf_url: URL of the paper's PDF
+        title: Paper title
+        priority: Summary queue priority for the chunk calls
+
+    Returns:
+        list: Summary of each chunk, in document order
+
+    Raises:
+        ValueError: If the paper has no PDF or no extractable text
+        PdfUnavailableError: If the PDF can't be downloaded
+        anthropic.APIError: If a chunk's Claude call fails
+    """
+    chunks = chunk_pages(get_paper_pages(paper_id, pdf_url))
+    if not chunks:
+        raise ValueError(f"No text could be extracted from the PDF of {paper_id}")
+
+    prompt_hash = _chunk_prompt_hash()
+    chunk_hashes = [_hash(chunk) for chunk in chunks]
+
+    def lookup():
+        stored = _stored_chunk_summaries(paper_id, prompt_hash, chunk_hashes)
+        return [stored[chunk_hash] for chunk_hash in chunk_hashes] if len(stored) == len(set(chunk_hashes)) else None
+
+    summaries, _ = singleflight.run(
+        (paper_id, 'deep:chunks', prompt_hash),
+        lambda: _summarize_chunks(paper_id, title, chunks, prompt_hash, chunk_hashes, priority),
+        lookup
+    )
+    return summaries
@@ -0,0 +1,316 @@
+import os
+import re
+import threading
+import zlib
+import numpy as np
+from sqlalchemy import func
+from app.database import get_session, Paper, PaperEmbedding
+from app.config import EMBEDDING_DIM, EMBEDDINGS_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to the in-process lock only
+    fcntl = None
+
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'for', 'from', 'has', 'have',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'our', 'that', 'the', 'their', 'these',
+    'this', 'to', 'we', 'which', 'with', 'while', 'show', 'paper', 'propose', 'approach',
+    'results', 'using', 'based', 'also', 'such', 'than', 'into', 'both', 'how', 'not'
+}
+
+def embed_text(title, abstract=''):
+    """
+    Embed a paper as a hashed, sublinear-TF bag of unigrams and bigrams.
+
+    Entirely local and deterministic: no model download, no network. Title
+    words are counted twice since they carry more of the topic.
+
+    Args:
+        title: Paper title (or a free-text query)
+        abstract: Paper abstract
+
+    Returns:
+        numpy.ndarray: L2-normalized float32 vector of length EMBEDDING_DIM
+    """
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+
+    title_tokens = [t for t in re.findall(r'[a-z0-9]+', title.lower()) if t not in STOPWORDS and len(t) > 1]
+    abstract_tokens = [t for t in re.findall(r'[a-z0-9]+', abstract.lower()) if t not in STOPWORDS and len(t) > 1]
+
+    features = {}
+    for tokens, weight in ((title_tokens, 2.0), (abstract_tokens, 1.0)):
+        grams = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+        for gram in grams:
+            features[gram] = features.get(gram, 0.0) + weight
+
+    for gram, count in features.items():
+        # crc32 is stable across processes, unlike hash()
+        h = zlib.crc32(gram.encode('utf-8'))
+        sign = 1.0 if (h >> 31) & 1 else -1.0
+        vector[h % EMBEDDING_DIM] += sign * (1.0 + np.log(count))
+
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+
+    return vector
+
+class EmbeddingIndex:
+    """
+    Memory-mapped float32 matrix of paper embeddings, one row per paper.
+
+    The matrix lives in EMBEDDINGS_PATH and only ever grows by appending rows;
+    the paper_embeddings table maps paper IDs to rows. Readers notice appends
+    from other processes by the file size and remap lazily.
+    """
+
+    def __init__(self, path=EMBEDDINGS_PATH, dim=EMBEDDING_DIM):
+        self.path = path
+        self.dim = dim
+        self.lock = threading.Lock()
+        self.matrix = None
+        self.paper_ids = []
+        self.rows = {}
+        self.loaded_version = None
+
+    def _row_bytes(self):
+        return self.dim * 4
+
+    def _refresh(self):
+        """Remap the matrix and reload the ID mapping if another writer has appended."""
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+        session = get_session()
+        # The mapping rows are committed just after the file write, so check both
+        last_row = session.query(func.max(PaperEmbedding.row)).scalar()
+        if (size, last_row) == self.loaded_version:
+            session.close()
+            return
+
+        mapping = session.query(PaperEmbedding.paper_id, PaperEmbedding.row).order_by(PaperEmbedding.row).all()
+        session.close()
+
+        n_rows = size // self._row_bytes()
+        paper_ids = [None] * n_rows
+        for paper_id, row in mapping:
+            if row < n_rows:
+                paper_ids[row] = paper_id
+
+        self.matrix = np.memmap(self.path, dtype=np.float32, mode='r', shape=(n_rows, self.dim)) if n_rows else None
+        self.paper_ids = paper_ids
+        self.rows = {paper_id: row for row, paper_id in enumerate(paper_ids) if paper_id is not None}
+        self.loaded_version = (size, last_row)
+
+    def add(self, papers):
+        """
+        Append embeddings for papers that are not indexed yet.
+
+        Args:
+            papers: Iterable of (paper_id, title, abstract) tuples
+
+        Returns:
+            int: Number of papers added
+        """
+        with self.lock:
+            papers = list(papers)
+            existing = self._indexed([p[0] for p in papers])
+            pending = [p for p in papers if p[0] not in existing]
+            if not pending:
+                return 0
+
+            # Embedding is the slow part, so it happens before taking the file lock
+            vectors = {paper_id: embed_text(title, abstract) for paper_id, title, abstract in pending}
+
+            with open(self.path, 'ab') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                session = get_session()
+                try:
+                    # Another process may have indexed some of these while we
+                    # were embedding; check again now that the file is ours
+                    existing = self._indexed(list(vectors), session)
+                    pending = [paper_id for paper_id in vectors if paper_id not in existing]
+                    if not pending:
+                        return 0
+
+                    # Rows are assigned from the file size, so vectors written by a
+                    # crashed run without a mapping row are simply skipped over.
+                    f.seek(0, os.SEEK_END)
+                    first_row = f.tell() // self._row_bytes()
+                    f.write(np.vstack([vectors[paper_id] for paper_id in pending]).astype(np.float32).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                    for offset, paper_id in enumerate(pending):
+                        session.add(PaperEmbedding(paper_id=paper_id, row=first_row + offset))
+                    session.commit()
+                finally:
+                    session.close()
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+            return len(pending)
+
+    @staticmethod
+    def _indexed(paper_ids, session=None):
+        """Return the subset of paper_ids that already have an embedding row."""
+        own_session = session is None
+        session = session or get_session()
+        try:
+            return {
+                pid for (pid,) in session.query(PaperEmbedding.paper_id)
+                .filter(PaperEmbedding.paper_id.in_(paper_ids)).all()
+            }
+        finally:
+            if own_session:
+                session.close()
+
+    def _snapshot(self):
+        """Refresh if needed and return a consistent (matrix, paper_ids, rows) view."""
+        with self.lock:
+            self._refresh()
+            return self.matrix, self.paper_ids, self.rows
+
+    @staticmethod
+    def _top_k(matrix, paper_ids, query_vector, k, exclude_row=None):
+        scores = matrix @ query_vector
+        if exclude_row is not None:
+            scores[exclude_row] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            (paper_ids[row], float(scores[row]))
+            for row in top
+            if paper_ids[row] is not None and np.isfinite(scores[row])
+        ]
+
+    def similar_to(self, paper_id, k=10):
+        """
+        Find papers most similar to an indexed paper by cosine similarity.
+
+        Args:
+            paper_id: Paper to find neighbours for
+            k: Number of results
+
+        Returns:
+            List of (paper_id, score) tuples, or None if the paper isn't indexed
+        """
+        matrix, paper_ids, rows = self._snapshot()
+        row = rows.get(paper_id)
+        if row is None or matrix is None:
+            return None
+        return self._top_k(matrix, paper_ids, np.array(matrix[row]), k, exclude_row=row)
+
+    def search(self, query, k=10):
+        """
+        Find papers most similar to free text.
+
+        Args:
+            query: Search text
+            k: Number of results
+
+        Returns:
+            List of (paper_id, score) tuples
+        """
+        query_vector = embed_text(query)
+        if not query_vector.any():
+            return []
+
+        matrix, paper_ids, _ = self._snapshot()
+        if matrix is None:
+            return []
+        return self._top_k(matrix, paper_ids, query_vector, k)
+
+_index = EmbeddingIndex()
+
+def get_embedding_index():
+    """Return the process-wide embedding index."""
+    return _index
+
+def _with_paper_details(matches):
+    """Attach title and rank to (paper_id, score) matches."""
+    if not matches:
+        return []
+
+    session = get_session()
+    papers = {
+        p.id: p for p in session.query(Paper.id, Paper.title, Paper.published_date, Paper.rank_score)
+        .filter(Paper.id.in_([pid for pid, _ in matches])).all()
+    }
+    session.close()
+
+    return [{
+        'id': pid,
+        'title': papers[pid].title,
+        'published_date': papers[pid].published_date.strftime('%Y-%m-%d'),
+        'rank_score': papers[pid].rank_score,
+        'similarity': round(score, 4)
+    } for pid, score in matches if pid in papers]
+
+def find_similar_papers(paper_id, limit=10):
+    """
+    Get papers similar to the given paper.
+
+    Returns:
+        List of result dicts, or None if the paper has no embedding
+    """
+    matches = _index.similar_to(paper_id, k=limit)
+    if matches is None:
+        return None
+    return _with_paper_details(matches)
+
+def semantic_search(query, limit=10):
+    """
+    Get papers semantically closest to a free-text query.
+
+    Returns:
+        List of result dicts
+    """
+    return _with_paper_details(_index.search(query, k=limit))
+
+def index_papers(papers):
+    """
+    Add new papers to the embedding index. Failures are logged, never raised,
+    so indexing problems can't break ingestion.
+
+    Args:
+        papers: Iterable of (paper_id, title, abstract) tuples
+
+    Returns:
+        int: Number of papers indexed
+    """
+    try:
+        return _index.add(papers)
+    except Exception as e:
+        print(f"Error updating embedding index: {e}")
+        return 0
+
+def build_embedding_index(batch_size=1000):
+    """
+    Embed every paper that isn't in the index yet (for existing databases).
+
+    Returns:
+        int: Number of papers indexed
+    """
+    session = get_session()
+    indexed = {pid for (pid,) in session.query(PaperEmbedding.paper_id).all()}
+    papers = [
+        (p.id, p.title, p.abstract)
+        for p in session.query(Paper.id, Paper.title, Paper.abstract).order_by(Paper.fetched_date).all()
+        if p.id not in indexed
+    ]
+    session.close()
+
+    added = 0
+    for start in range(0, len(papers), batch_size):
+        added += _index.add(papers[start:start + batch_size])
+
+    print(f"Indexed {added} papers for similarity search.")
+    return added
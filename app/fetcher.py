@@ -2,9 +2,12 @@ import arxiv
 import json
 import re
 from datetime import datetime, timedelta
-from app.database import get_session, Paper
+from app.database import get_session, session_scope, Paper
 from app.config import ALIGNMENT_KEYWORDS
 from app.ranker import calculate_rank_score, extract_affiliations_from_authors
+from app.embeddings import index_papers
+from app.dedup import register_paper, duplicate_paper_ids
+from app import arxiv_backends
 
 def is_alignment_paper(title, abstract):
     """
@@ -36,8 +39,7 @@ def fetch_recent_papers(days_back=7, max_results=100):
     Returns:
         int: Number of new papers added
     """
-    session = get_session()
-    new_papers_count = 0
+    new_papers = []
 
     # Calculate date range
     end_date = datetime.now()
@@ -46,8 +48,8 @@ def fetch_recent_papers(days_back=7, max_results=100):
     # Build arXiv query for AI papers
     query = 'cat:cs.AI'
 
-    # Create arXiv client and search
-    client = arxiv.Client()
+    # Create arXiv client (or ARXIV_BACKEND's stand-in) and search
+    client = arxiv_backends.create_client()
     search = arxiv.Search(
         query=query,
         max_results=max_results,
@@ -57,48 +59,51 @@ def fetch_recent_papers(days_back=7, max_results=100):
 
     print(f"Fetching papers from arXiv (last {days_back} days)...")
 
-    for result in client.results(search):
-        # Check if paper is within date range
-        if result.published.replace(tzinfo=None) < start_date:
-            continue
+    # Finish the (slow, paginated) arXiv download before opening a write
+    # transaction, so the database lock is only held for the inserts.
+    candidates = [
+        result for result in client.results(search)
+        if result.published.replace(tzinfo=None) >= start_date
+        and is_alignment_paper(result.title, result.summary)
+    ]
 
-        # Check if paper is alignment-related
-        if not is_alignment_paper(result.title, result.summary):
-            continue
+    with session_scope() as session:
+        for result in candidates:
+            # Check if paper already exists in database
+            existing_paper = session.query(Paper).filter_by(id=result.entry_id).first()
+            if existing_paper:
+                continue
 
-        # Check if paper already exists in database
-        existing_paper = session.query(Paper).filter_by(id=result.entry_id).first()
-        if existing_paper:
-            continue
+            # Extract author information
+            authors_list = [author.name for author in result.authors]
+            affiliations = extract_affiliations_from_authors(result.authors)
 
-        # Extract author information
-        authors_list = [author.name for author in result.authors]
-        affiliations = extract_affiliations_from_authors(result.authors)
+            # Calculate rank score
+            rank_score = calculate_rank_score(authors_list, affiliations)
 
-        # Calculate rank score
-        rank_score = calculate_rank_score(authors_list, affiliations)
+            # Create new paper entry
+            paper = Paper(
+                id=result.entry_id,
+                title=result.title,
+                authors=json.dumps(authors_list),
+                affiliations=json.dumps(affiliations) if affiliations else None,
+                abstract=result.summary,
+                published_date=result.published.replace(tzinfo=None),
+                arxiv_url=result.entry_id,
+                pdf_url=result.pdf_url,
+                rank_score=rank_score,
+                summary=None  # Will be generated separately
+            )
 
-        # Create new paper entry
-        paper = Paper(
-            id=result.entry_id,
-            title=result.title,
-            authors=json.dumps(authors_list),
-            affiliations=json.dumps(affiliations) if affiliations else None,
-            abstract=result.summary,
-            published_date=result.published.replace(tzinfo=None),
-            arxiv_url=result.entry_id,
-            pdf_url=result.pdf_url,
-            rank_score=rank_score,
-            summary=None  # Will be generated separately
-        )
+            session.add(paper)
+            register_paper(session, paper.id, paper.title, paper.abstract)
+            new_papers.append((paper.id, paper.title, paper.abstract))
 
-        session.add(paper)
-        new_papers_count += 1
+            print(f"  Added: {result.title[:60]}... (rank: {rank_score})")
 
-        print(f"  Added: {result.title[:60]}... (rank: {rank_score})")
+    new_papers_count = len(new_papers)
 
-    session.commit()
-    session.close()
+    index_papers(new_papers)
 
     print(f"Fetched {new_papers_count} new alignment papers.")
     return new_papers_count
@@ -114,7 +119,10 @@ def get_papers_needing_summaries(limit=10):
         List of Paper objects
     """
     session = get_session()
-    papers = session.query(Paper).filter(Paper.summary.is_(None)).order_by(Paper.rank_score.desc()).limit(limit).all()
+    papers = session.query(Paper).filter(
+        Paper.summary.is_(None),
+        Paper.id.notin_(duplicate_paper_ids(session))
+    ).order_by(Paper.rank_score.desc()).limit(limit).all()
     session.close()
     return papers
 
@@ -166,12 +174,11 @@ def fetch_paper_by_id(arxiv_id):
     Returns:
         dict: Result with success status and message
     """
-    session = get_session()
-
     # Check if paper already exists
-    existing = session.query(Paper).filter_by(id__contains=arxiv_id).first()
+    with session_scope() as session:
+        existing = session.query(Paper.id).filter(Paper.id.contains(arxiv_id)).first()
+
     if existing:
-        session.close()
         return {
             'success': False,
             'message': 'Paper already exists in database',
@@ -180,13 +187,12 @@ def fetch_paper_by_id(arxiv_id):
 
     try:
         # Search arXiv
-        client = arxiv.Client()
+        client = arxiv_backends.create_client()
         search = arxiv.Search(id_list=[arxiv_id])
 
         results = list(client.results(search))
 
         if not results:
-            session.close()
             return {
                 'success': False,
                 'message': f'Paper not found on arXiv: {arxiv_id}'
@@ -214,22 +220,23 @@ def fetch_paper_by_id(arxiv_id):
             rank_score=rank_score,
             summary=None
         )
+        paper_id = paper.id
 
-        session.add(paper)
-        session.commit()
+        with session_scope() as session:
+            session.add(paper)
+            canonical_id = register_paper(session, paper_id, result.title, result.summary)
 
-        paper_id = paper.id
-        session.close()
+        index_papers([(paper_id, result.title, result.summary)])
 
         return {
             'success': True,
             'message': 'Paper added successfully',
             'paper_id': paper_id,
-            'title': result.title
+            'title': result.title,
+            'duplicate_of': canonical_id
         }
 
     except Exception as e:
-        session.close()
         return {
             'success': False,
             'message': f'Error fetching paper: {str(e)}'
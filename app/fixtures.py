@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import random
+import threading
+
+# On-disk fixtures for the 'record' and 'replay' backends, plus the seeded
+# coin flips the fake backends use for error injection.
+
+class FixtureMissingError(Exception):
+    """Raised in replay mode for a request that was never recorded."""
+
+def request_key(request):
+    """
+    Hash a JSON-serializable description of a request.
+
+    Returns:
+        str: Key naming the request's fixture file
+    """
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode('utf-8')).hexdigest()[:24]
+
+def _fixture_path(directory, key):
+    return os.path.join(directory, f"{key}.json")
+
+def save(directory, key, fixture):
+    """Write a fixture (a JSON-serializable dict), replacing any earlier recording."""
+    os.makedirs(directory, exist_ok=True)
+    path = _fixture_path(directory, key)
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(fixture, f, indent=1)
+    os.replace(partial, path)
+
+def load(directory, key, description):
+    """
+    Read a recorded fixture.
+
+    Args:
+        directory: Fixtures directory
+        key: Key from request_key()
+        description: What was requested, for the error message
+
+    Returns:
+        dict: The fixture
+
+    Raises:
+        FixtureMissingError: If the request was never recorded
+    """
+    path = _fixture_path(directory, key)
+    if not os.path.exists(path):
+        raise FixtureMissingError(f"No recorded response for {description} ({path})")
+
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+class ErrorInjector:
+    """
+    Decides which attempts of a fake request fail.
+
+    The n-th attempt of a given request fails or not depending only on the
+    seed, the request and n, so runs are repeatable however their calls
+    interleave across threads.
+    """
+
+    def __init__(self, seed, rate):
+        self.seed = seed
+        self.rate = rate
+        self.attempts = {}
+        self.lock = threading.Lock()
+
+    def next_attempt(self, key, choices=None):
+        """
+        Count an attempt of the request and decide its fate.
+
+        Args:
+            key: Request key
+            choices: Error kinds to pick from
+
+        Returns:
+            The chosen error kind (True if no choices were given), or None
+            if this attempt succeeds
+        """
+        if self.rate <= 0:
+            return None
+
+        with self.lock:
+            attempt = self.attempts[key] = self.attempts.get(key, 0) + 1
+
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        if rng.random() >= self.rate:
+            return None
+        return rng.choice(choices) if choices else True
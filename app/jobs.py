@@ -0,0 +1,153 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from app.database import session_scope, BackgroundJob
+from app.fetcher import fetch_recent_papers
+from app.summarizer import summarize_papers, summarize_packed, generate_deep_summary
+from app.ranker import recalculate_paper_ranks
+
+# Work that the web process can hand to worker.py through the database
+JOB_HANDLERS = {
+    'fetch': fetch_recent_papers,
+    'summarize': summarize_papers,
+    'summarize_packed': summarize_packed,
+    'rerank': recalculate_paper_ranks,
+    'deep_summary': generate_deep_summary,
+}
+
+def enqueue_job(job_type, **params):
+    """
+    Queue a job for the worker process.
+
+    A 'rerank' is coalesced with one that is already pending, since running
+    it once picks up every preference change made before it starts.
+
+    Args:
+        job_type: One of JOB_HANDLERS
+        **params: Keyword arguments for the job handler
+
+    Returns:
+        int: Job ID
+    """
+    if job_type not in JOB_HANDLERS:
+        raise ValueError(f"Unknown job type: {job_type}")
+
+    with session_scope() as session:
+        if job_type == 'rerank':
+            pending = session.query(BackgroundJob).filter_by(job_type='rerank', status='pending').first()
+            if pending:
+                return pending.id
+
+        job = BackgroundJob(job_type=job_type, params=json.dumps(params))
+        session.add(job)
+        session.flush()
+        return job.id
+
+def get_job(job_id):
+    """
+    Get the status of a queued job.
+
+    Returns:
+        dict: Job details, or None if not found
+    """
+    with session_scope() as session:
+        job = session.get(BackgroundJob, job_id)
+        if not job:
+            return None
+
+        return {
+            'id': job.id,
+            'job_type': job.job_type,
+            'status': job.status,
+            'result': json.loads(job.result) if job.result else None,
+            'error': job.error,
+            'created_date': job.created_date.isoformat() if job.created_date else None,
+            'finished_date': job.finished_date.isoformat() if job.finished_date else None
+        }
+
+def _claim(session, job):
+    # Conditional update so two workers can never claim the same job
+    return session.query(BackgroundJob).filter_by(id=job.id, status='pending').update(
+        {'status': 'running', 'started_date': datetime.utcnow()}
+    )
+
+def claim_next_job():
+    """
+    Atomically mark the oldest pending job as running.
+
+    Returns:
+        tuple: (job ID, job type, params dict), or None if the queue is empty
+    """
+    with session_scope() as session:
+        while True:
+            job = session.query(BackgroundJob).filter_by(status='pending').order_by(BackgroundJob.id).first()
+            if not job:
+                return None
+
+            if _claim(session, job):
+                return job.id, job.job_type, json.loads(job.params or '{}')
+
+def _finish_job(job_id, result=None, error=None):
+    with session_scope() as session:
+        job = session.get(BackgroundJob, job_id)
+        job.status = 'failed' if error else 'done'
+        job.result = json.dumps(result) if result is not None else None
+        job.error = error
+        job.finished_date = datetime.utcnow()
+
+def process_pending_jobs(max_jobs=10):
+    """
+    Run queued jobs until the queue is empty or max_jobs have run.
+
+    Returns:
+        int: Number of jobs run
+    """
+    processed = 0
+
+    while processed < max_jobs:
+        claimed = claim_next_job()
+        if not claimed:
+            break
+
+        _run_job(*claimed)
+        processed += 1
+
+    return processed
+
+def _run_job(job_id, job_type, params):
+    print(f"Running job {job_id} ({job_type})...")
+
+    try:
+        result = JOB_HANDLERS[job_type](**params)
+        _finish_job(job_id, result=result)
+    except Exception as e:
+        print(f"Job {job_id} failed: {e}")
+        _finish_job(job_id, error=str(e))
+
+def start_job(job_id):
+    """
+    Run a queued job on a background thread of this process, for work that
+    needs the job API's polling but has no worker process to run it.
+    """
+    with session_scope() as session:
+        job = session.get(BackgroundJob, job_id)
+        if not job or not _claim(session, job):
+            return
+        job_type, params = job.job_type, json.loads(job.params or '{}')
+
+    threading.Thread(target=_run_job, args=(job_id, job_type, params), name=f'job-{job_id}', daemon=True).start()
+
+def requeue_stale_jobs(older_than_hours=2):
+    """
+    Put jobs left 'running' by a worker that died back in the queue.
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+
+    with session_scope() as session:
+        return session.query(BackgroundJob).filter(
+            BackgroundJob.status == 'running',
+            BackgroundJob.started_date < cutoff
+        ).update({'status': 'pending', 'started_date': None})
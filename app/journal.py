@@ -0,0 +1,76 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from app.config import SUMMARY_JOURNAL_PATH
+
+try:
+    import fcntl
+except ImportError:  # Windows: the thread lock still covers a single process
+    fcntl = None
+
+_lock = threading.Lock()
+
+@contextmanager
+def _locked(path):
+    """Hold the journal exclusively across threads and processes."""
+    with _lock, open(path, 'a+', encoding='utf-8') as journal:
+        if fcntl:
+            fcntl.flock(journal, fcntl.LOCK_EX)
+        try:
+            yield journal
+        finally:
+            if fcntl:
+                fcntl.flock(journal, fcntl.LOCK_UN)
+
+def append(entry, path=SUMMARY_JOURNAL_PATH):
+    """
+    Durably append one entry (a JSON-serializable dict) to the journal.
+
+    Returns only after the entry has been fsynced, so it survives a crash
+    that happens before the database write that follows it.
+    """
+    extend([entry], path)
+
+def extend(entries, path=SUMMARY_JOURNAL_PATH):
+    """Durably append several entries with a single fsync, as append() does for one."""
+    with _locked(path) as journal:
+        journal.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+        journal.flush()
+        os.fsync(journal.fileno())
+
+def replay(apply, path=SUMMARY_JOURNAL_PATH):
+    """
+    Apply every journaled entry, then empty the journal.
+
+    Entries are left in place if apply raises, to be retried next time.
+    apply must be idempotent: entries whose database write succeeded are
+    replayed too.
+
+    Args:
+        apply: Callable taking the list of entry dicts
+        path: Journal file
+
+    Returns:
+        int: Number of entries replayed
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return 0
+
+    with _locked(path) as journal:
+        journal.seek(0)
+        entries = []
+        for line in journal:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue  # torn final line from a crash mid-write
+
+        if entries:
+            apply(entries)
+
+        journal.truncate(0)
+        journal.flush()
+        os.fsync(journal.fileno())
+
+    return len(entries)
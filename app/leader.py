@@ -0,0 +1,100 @@
+import os
+import threading
+import logging
+from app.config import SCHEDULER_LOCK_PATH, LEADER_RETRY_SECONDS
+
+try:
+    import fcntl
+except ImportError:  # Windows has no flock; every process leads (single-process use only)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class LeaderElection:
+    """
+    Elect a single process (among web workers on one host) to run background jobs.
+
+    Leadership is an exclusive flock on a lock file next to the database. The
+    OS drops the lock when the holding process exits or crashes, so a follower
+    polling every LEADER_RETRY_SECONDS takes over without any cleanup.
+    """
+
+    def __init__(self, on_elected, lock_path=SCHEDULER_LOCK_PATH, retry_seconds=LEADER_RETRY_SECONDS):
+        self.on_elected = on_elected
+        self.lock_path = lock_path
+        self.retry_seconds = retry_seconds
+        self.is_leader = False
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def try_acquire(self):
+        """
+        Try once to become leader without blocking.
+
+        Returns:
+            bool: True if this process holds the lock
+        """
+        if self.is_leader:
+            return True
+
+        if fcntl is None:
+            self.is_leader = True
+            return True
+
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        # Record the holder for anyone inspecting the lock file
+        lock_file.seek(0)
+        lock_file.truncate()
+        lock_file.write(f"{os.getpid()}\n")
+        lock_file.flush()
+
+        # Keep the file open for the life of the process; closing it releases the lock
+        self._lock_file = lock_file
+        self.is_leader = True
+        return True
+
+    def _become_leader(self):
+        logger.info(f"Process {os.getpid()} elected scheduler leader")
+        try:
+            self.on_elected()
+        except Exception as e:
+            logger.error(f"Error starting leader duties: {e}")
+
+    def _watch(self):
+        while not self._stop.wait(self.retry_seconds):
+            if self.try_acquire():
+                self._become_leader()
+                return
+
+    def start(self):
+        """
+        Become leader now if possible, otherwise keep retrying in a daemon thread.
+
+        Returns:
+            bool: True if this process became leader immediately
+        """
+        if self.try_acquire():
+            self._become_leader()
+            return True
+
+        logger.info(f"Process {os.getpid()} is a scheduler follower; retrying every {self.retry_seconds}s")
+        self._thread = threading.Thread(target=self._watch, name='leader-election', daemon=True)
+        self._thread.start()
+        return False
+
+    def stop(self):
+        """Stop retrying and give up leadership if held."""
+        self._stop.set()
+        if self._lock_file:
+            if fcntl:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        self.is_leader = False
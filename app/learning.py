@@ -1,63 +1,110 @@
-import json
-from app.database import get_session, Paper, UserFeedback
-from sqlalchemy import func
+import threading
+from sqlalchemy import text
+from app.database import engine, get_session, PaperStat
 
-def get_feedback_insights():
-    """
-    Analyze user feedback to extract insights for improving summaries.
+# Prompt enhancements only change when feedback does, so they are computed
+# once per value of the 'feedback_version' counter and reused until it moves.
+_enhancements_cache = {'version': None, 'text': ''}
+_enhancements_lock = threading.Lock()
 
-    Returns:
-        dict: Insights about user preferences
+def bump_feedback_version(session):
     """
-    session = get_session()
-
-    # Get summary ratings
-    rated_papers = session.query(Paper).filter(Paper.summary_rating.isnot(None)).all()
-
-    # Get rank adjustments
-    rank_feedback = session.query(UserFeedback).filter_by(feedback_type='rank_adjustment').all()
+    Record that summary ratings or rank adjustments changed, invalidating the
+    memoized prompt enhancements in every process. The caller commits.
+    """
+    session.query(PaperStat).filter_by(name='feedback_version').update(
+        {PaperStat.value: PaperStat.value + 1}, synchronize_session=False
+    )
 
+def get_feedback_version():
+    """Return the current feedback counter."""
+    session = get_session()
+    stat = session.get(PaperStat, 'feedback_version')
     session.close()
 
-    insights = {
+    return stat.value if stat else 0
+
+def _feedback_insights(conn):
+    # Both aggregates are answered from indexes (papers.summary_rating and
+    # user_feedback(feedback_type, created_date)), never touching summary text.
+    ratings = conn.execute(text("""
+        SELECT COUNT(summary_rating) AS count,
+               COALESCE(AVG(summary_rating), 0) AS average,
+               COALESCE(SUM(summary_rating >= 4), 0) AS high_rated,
+               COALESCE(SUM(summary_rating <= 2), 0) AS low_rated
+        FROM papers
+        WHERE summary_rating IS NOT NULL
+    """)).mappings().one()
+
+    adjustments = conn.execute(text("""
+        SELECT COUNT(*) AS count,
+               COALESCE(SUM(new_rank > old_rank), 0) AS boosted,
+               COALESCE(SUM(new_rank < old_rank), 0) AS lowered
+        FROM (
+            SELECT CASE WHEN json_valid(feedback_value)
+                        THEN json_extract(feedback_value, '$.new_rank') END AS new_rank,
+                   CASE WHEN json_valid(feedback_value)
+                        THEN COALESCE(json_extract(feedback_value, '$.old_rank'), 0) END AS old_rank
+            FROM user_feedback
+            WHERE feedback_type = 'rank_adjustment'
+        )
+    """)).mappings().one()
+
+    return {
         'summary_ratings': {
-            'count': len(rated_papers),
-            'average': sum(p.summary_rating for p in rated_papers) / len(rated_papers) if rated_papers else 0,
-            'high_rated': [p for p in rated_papers if p.summary_rating >= 4],
-            'low_rated': [p for p in rated_papers if p.summary_rating <= 2]
+            'count': ratings['count'],
+            'average': ratings['average'],
+            'high_rated': ratings['high_rated'],
+            'low_rated': ratings['low_rated']
         },
         'rank_adjustments': {
-            'count': len(rank_feedback),
-            'papers_boosted': [],
-            'papers_lowered': []
+            'count': adjustments['count'],
+            'papers_boosted': adjustments['boosted'],
+            'papers_lowered': adjustments['lowered']
         }
     }
 
-    # Analyze rank adjustments
-    for feedback in rank_feedback:
-        try:
-            data = json.loads(feedback.feedback_value)
-            old_rank = data.get('old_rank', 0)
-            new_rank = data.get('new_rank')
-
-            if new_rank is not None and new_rank > old_rank:
-                insights['rank_adjustments']['papers_boosted'].append(feedback.paper_id)
-            elif new_rank is not None and new_rank < old_rank:
-                insights['rank_adjustments']['papers_lowered'].append(feedback.paper_id)
-        except:
-            continue
+def get_feedback_insights():
+    """
+    Analyze user feedback to extract insights for improving summaries.
 
-    return insights
+    Returns:
+        dict: Rating count, average and high/low-rated counts, and rank
+              adjustment count with the number that boosted or lowered a paper
+    """
+    with engine.connect() as conn:
+        return _feedback_insights(conn)
 
 def generate_summary_prompt_enhancements():
     """
     Generate prompt enhancements based on user feedback.
 
+    The text is memoized per feedback version, so a bulk summarization run
+    analyzes the feedback once rather than once per paper.
+
     Returns:
         str: Additional instructions for the summarization prompt
     """
-    insights = get_feedback_insights()
+    version = get_feedback_version()
 
+    with _enhancements_lock:
+        if _enhancements_cache['version'] == version:
+            return _enhancements_cache['text']
+
+        enhancements = _build_summary_prompt_enhancements(get_feedback_insights())
+        _enhancements_cache.update(version=version, text=enhancements)
+        return enhancements
+
+def _build_summary_prompt_enhancements(insights):
+    """
+    Turn feedback insights into extra summarization instructions.
+
+    Args:
+        insights: Dict from get_feedback_insights()
+
+    Returns:
+        str: Instructions separated by blank lines, or "" if there are none
+    """
     enhancements = []
 
     # Analyze high-rated vs low-rated summaries
@@ -74,7 +121,7 @@ def generate_summary_prompt_enhancements():
         )
 
     # Add preferences based on rank adjustments
-    if len(insights['rank_adjustments']['papers_boosted']) > 0:
+    if insights['rank_adjustments']['papers_boosted'] > 0:
         enhancements.append(
             "The user has shown interest in papers that directly tackle concrete AI safety challenges. "
             "Emphasize practical applications and novel approaches."
@@ -82,6 +129,28 @@ def generate_summary_prompt_enhancements():
 
     return "\n\n".join(enhancements) if enhancements else ""
 
+def _ranking_insights(conn):
+    total_overrides = conn.execute(text(
+        "SELECT COUNT(*) FROM papers WHERE user_rank_override IS NOT NULL"
+    )).scalar()
+
+    # Affiliations of papers the user moved up or down, expanded in SQL
+    rows = conn.execute(text("""
+        SELECT DISTINCT
+               CASE WHEN p.user_rank_override > p.rank_score THEN 'boosted' ELSE 'lowered' END AS direction,
+               a.value AS affiliation
+        FROM papers p,
+             json_each(CASE WHEN json_valid(p.affiliations) THEN p.affiliations ELSE '[]' END) a
+        WHERE p.user_rank_override IS NOT NULL
+          AND p.user_rank_override != p.rank_score
+    """)).all()
+
+    return {
+        'boosted_affiliations': [affiliation for direction, affiliation in rows if direction == 'boosted'],
+        'lowered_affiliations': [affiliation for direction, affiliation in rows if direction == 'lowered'],
+        'total_overrides': total_overrides
+    }
+
 def get_personalized_ranking_insights():
     """
     Get insights about user's ranking preferences.
@@ -89,51 +158,23 @@ def get_personalized_ranking_insights():
     Returns:
         dict: Information about which affiliations/topics the user values
     """
-    session = get_session()
-
-    # Get papers with user rank overrides
-    overridden_papers = session.query(Paper).filter(Paper.user_rank_override.isnot(None)).all()
-
-    # Analyze patterns
-    boosted_affiliations = []
-    lowered_affiliations = []
-
-    for paper in overridden_papers:
-        if paper.user_rank_override > paper.rank_score:
-            # User boosted this paper
-            if paper.affiliations:
-                try:
-                    affs = json.loads(paper.affiliations)
-                    boosted_affiliations.extend(affs)
-                except:
-                    pass
-        elif paper.user_rank_override < paper.rank_score:
-            # User lowered this paper
-            if paper.affiliations:
-                try:
-                    affs = json.loads(paper.affiliations)
-                    lowered_affiliations.extend(affs)
-                except:
-                    pass
-
-    session.close()
-
-    return {
-        'boosted_affiliations': list(set(boosted_affiliations)),
-        'lowered_affiliations': list(set(lowered_affiliations)),
-        'total_overrides': len(overridden_papers)
-    }
+    with engine.connect() as conn:
+        return _ranking_insights(conn)
 
 def get_learning_report():
     """
     Generate a comprehensive report about what the system has learned from user feedback.
 
+    All figures come from a few aggregate queries on one connection, and the
+    prompt enhancements are derived from the same insights rather than
+    re-analyzing the feedback.
+
     Returns:
         dict: Complete learning report
     """
-    feedback_insights = get_feedback_insights()
-    ranking_insights = get_personalized_ranking_insights()
-    prompt_enhancements = generate_summary_prompt_enhancements()
+    with engine.connect() as conn:
+        feedback_insights = _feedback_insights(conn)
+        ranking_insights = _ranking_insights(conn)
 
     report = {
         'feedback_summary': {
@@ -143,9 +184,9 @@ def get_learning_report():
         },
         'ranking_preferences': ranking_insights,
         'summary_preferences': {
-            'high_rated_count': len(feedback_insights['summary_ratings']['high_rated']),
-            'low_rated_count': len(feedback_insights['summary_ratings']['low_rated']),
-            'prompt_enhancements': prompt_enhancements
+            'high_rated_count': feedback_insights['summary_ratings']['high_rated'],
+            'low_rated_count': feedback_insights['summary_ratings']['low_rated'],
+            'prompt_enhancements': _build_summary_prompt_enhancements(feedback_insights)
         }
     }
 
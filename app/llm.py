@@ -0,0 +1,454 @@
+import random
+import threading
+import time
+from collections import deque
+import anthropic
+from app.config import (
+    ANTHROPIC_API_KEY, ANTHROPIC_BASE_URL, CLAUDE_MODEL, SUMMARY_MAX_TOKENS,
+    LLM_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_MAX_CONCURRENCY, LLM_ROUTES, MODEL_PRICES, LLM_BACKEND
+)
+from app import llm_backends
+
+# Errors worth retrying: rate limits, overload, network trouble, server faults
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.APIConnectionError,  # includes APITimeoutError
+    anthropic.InternalServerError,
+)
+
+class LLMUnavailableError(Exception):
+    """Raised when no Claude API key is configured."""
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit for Claude calls that adapts to the API's rate-limit feedback.
+
+    Starts at max_concurrency. A 429 halves the limit and pauses new calls
+    for the retry-after period; responses whose rate-limit headers show
+    little remaining headroom lower it by one; healthy responses raise it
+    back by one at a time.
+    """
+
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait <= 0 and self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def record_headers(self, headers):
+        """Adjust the limit from anthropic-ratelimit-* response headers."""
+        remaining = []
+        for name in ('anthropic-ratelimit-requests-remaining', 'anthropic-ratelimit-tokens-remaining'):
+            try:
+                remaining.append((int(headers[name]), int(headers[name.replace('remaining', 'limit')])))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        with self.condition:
+            if any(left < max(self.limit * 2, limit * 0.1) for left, limit in remaining):
+                self.limit = max(1, self.limit - 1)
+            elif self.limit < self.max_concurrency:
+                self.limit += 1
+            self.condition.notify_all()
+
+    def record_rate_limited(self, retry_after=None):
+        """Back off after a 429."""
+        try:
+            pause = float(retry_after) if retry_after is not None else 10.0
+        except ValueError:
+            pause = 10.0
+
+        with self.condition:
+            self.limit = max(1, self.limit // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.condition.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+class LLMMetrics:
+    """Per-label call counts, latency percentiles, token usage and cost for this process."""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, label, latency, input_tokens=0, output_tokens=0, error=None, retries=0,
+               cache_read_tokens=0, cache_creation_tokens=0, first_token_latency=None, cost=None, fallback=False):
+        with self.lock:
+            route = self.routes.setdefault(label, {
+                'calls': 0,
+                'errors': 0,
+                'retries': 0,
+                'fallbacks': 0,
+                'cost_usd': 0.0,
+                'priced_calls': 0,
+                'input_tokens': 0,
+                'output_tokens': 0,
+                'cache_read_tokens': 0,
+                'cache_creation_tokens': 0,
+                'latencies': deque(maxlen=self.window),
+                'first_token_latencies': deque(maxlen=self.window)
+            })
+            route['calls'] += 1
+            route['retries'] += retries
+            route['input_tokens'] += input_tokens
+            route['output_tokens'] += output_tokens
+            route['cache_read_tokens'] += cache_read_tokens
+            route['cache_creation_tokens'] += cache_creation_tokens
+            if fallback:
+                route['fallbacks'] += 1
+            if cost is not None:
+                route['cost_usd'] += cost
+                route['priced_calls'] += 1
+            if error:
+                route['errors'] += 1
+            else:
+                route['latencies'].append(latency)
+            if first_token_latency is not None:
+                route['first_token_latencies'].append(first_token_latency)
+
+    def report(self):
+        """
+        Summarize metrics per label.
+
+        Returns:
+            dict: {label: {calls, errors, retries, fallbacks, tokens, cache usage,
+                   cost, latency percentiles}}
+        """
+        with self.lock:
+            report = {}
+            for label, route in self.routes.items():
+                latencies = sorted(route['latencies'])
+                first_token_latencies = sorted(route['first_token_latencies'])
+                prompt_tokens = route['input_tokens'] + route['cache_read_tokens'] + route['cache_creation_tokens']
+
+                def percentile(p, values=latencies):
+                    if not values:
+                        return None
+                    return round(values[min(len(values) - 1, int(p * len(values)))], 3)
+
+                report[label] = {
+                    'calls': route['calls'],
+                    'errors': route['errors'],
+                    'retries': route['retries'],
+                    'fallbacks': route['fallbacks'],
+                    'input_tokens': route['input_tokens'],
+                    'output_tokens': route['output_tokens'],
+                    'cache_read_tokens': route['cache_read_tokens'],
+                    'cache_creation_tokens': route['cache_creation_tokens'],
+                    'cache_hit_rate': round(route['cache_read_tokens'] / prompt_tokens, 3) if prompt_tokens else None,
+                    'cost_usd': round(route['cost_usd'], 6),
+                    'cost_per_call': round(route['cost_usd'] / route['priced_calls'], 6) if route['priced_calls'] else None,
+                    'latency_p50': percentile(0.50),
+                    'latency_p95': percentile(0.95),
+                    'latency_mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+                    'first_token_p50': percentile(0.50, first_token_latencies),
+                    'first_token_p95': percentile(0.95, first_token_latencies)
+                }
+            return report
+
+limiter = AdaptiveLimiter(LLM_MAX_CONCURRENCY)
+metrics = LLMMetrics()
+
+_client = None
+_client_lock = threading.Lock()
+
+def is_configured():
+    """Whether Claude calls can be made: an API key is set, or LLM_BACKEND doesn't need one."""
+    return LLM_BACKEND in ('fake', 'replay') or bool(ANTHROPIC_API_KEY)
+
+def _create_client():
+    if LLM_BACKEND == 'fake':
+        return llm_backends.FakeClient()
+    if LLM_BACKEND == 'replay':
+        return llm_backends.ReplayClient()
+    if LLM_BACKEND not in ('anthropic', 'record'):
+        raise ValueError(f"Unknown LLM_BACKEND: {LLM_BACKEND}")
+
+    client = anthropic.Anthropic(
+        api_key=ANTHROPIC_API_KEY,
+        base_url=ANTHROPIC_BASE_URL,
+        timeout=LLM_TIMEOUT_SECONDS,
+        max_retries=0
+    )
+    return llm_backends.RecordingClient(client) if LLM_BACKEND == 'record' else client
+
+def get_client():
+    """
+    Return the process-wide Anthropic client (or LLM_BACKEND's stand-in for it).
+
+    One client means one keep-alive connection pool (and TLS sessions) shared
+    by every call. Retries are handled in complete() so that backoff also
+    feeds the rate limiter, hence max_retries=0 here.
+    """
+    global _client
+
+    if not is_configured():
+        raise LLMUnavailableError("No API key configured")
+
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+def _backoff_seconds(attempt, error):
+    """Exponential backoff with jitter, honouring retry-after when the API sends it."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            return float(response.headers.get('retry-after'))
+        except (TypeError, ValueError):
+            pass
+    return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+def cached_system(system):
+    """
+    Wrap a system prompt as a single text block marked for prompt caching.
+
+    Calls that share the same system text (and model) then reuse the cached
+    prefix for five minutes instead of paying for it again. Prefixes shorter
+    than the model's minimum cacheable length are simply sent uncached.
+    """
+    return [{'type': 'text', 'text': system, 'cache_control': {'type': 'ephemeral'}}]
+
+def route_settings(label):
+    """
+    Look up the model, token budget, timeout and fallback model for a label.
+
+    Returns:
+        dict: Entry from LLM_ROUTES, or the defaults for unlisted labels
+    """
+    route = {'model': CLAUDE_MODEL, 'max_tokens': SUMMARY_MAX_TOKENS, 'timeout': LLM_TIMEOUT_SECONDS, 'fallback_model': None}
+    route.update(LLM_ROUTES.get(label, {}))
+    return route
+
+def call_cost(model, usage):
+    """
+    Price a call from its usage at MODEL_PRICES rates.
+
+    Returns:
+        float: Cost in USD, or None for models without a listed price
+    """
+    if model not in MODEL_PRICES:
+        return None
+
+    input_price, output_price = MODEL_PRICES[model]
+    cache_read = getattr(usage, 'cache_read_input_tokens', None) or 0
+    cache_creation = getattr(usage, 'cache_creation_input_tokens', None) or 0
+
+    return (
+        usage.input_tokens * input_price
+        + cache_creation * input_price * 1.25
+        + cache_read * input_price * 0.1
+        + usage.output_tokens * output_price
+    ) / 1_000_000
+
+def _message_params(prompt, max_tokens, model, timeout, system, label):
+    route = route_settings(label)
+    params = {
+        'model': model or route['model'],
+        'max_tokens': max_tokens or route['max_tokens'],
+        'messages': [{"role": "user", "content": prompt}],
+        'timeout': timeout or route['timeout']
+    }
+    if system:
+        params['system'] = cached_system(system)
+    return params
+
+def _fallback_model(label, params, error):
+    """The model to retry a timed-out call on, or None."""
+    fallback = route_settings(label)['fallback_model']
+    if isinstance(error, anthropic.APITimeoutError) and fallback and fallback != params['model']:
+        return fallback
+    return None
+
+def _record_usage(label, started, message, retries, first_token_latency=None, fallback=False):
+    # input_tokens excludes cached tokens; the cache counts arrive as extra usage fields
+    usage = message.usage
+    metrics.record(
+        label,
+        time.monotonic() - started,
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        retries=retries,
+        cache_read_tokens=getattr(usage, 'cache_read_input_tokens', None) or 0,
+        cache_creation_tokens=getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        first_token_latency=first_token_latency,
+        cost=call_cost(message.model, usage),
+        fallback=fallback
+    )
+
+def complete(prompt, max_tokens=None, model=None, label='summary', timeout=None, system=None, with_model=False):
+    """
+    Send a single-turn prompt to Claude and return the text of the reply.
+
+    Calls share one client, wait for a slot in the adaptive concurrency
+    limiter, and retry transient errors with exponential backoff. A call that
+    times out is retried straight away on the route's fallback model, if it
+    has one. Latency, token usage and cost are recorded under the label.
+
+    Args:
+        prompt: User message text
+        max_tokens: Maximum tokens to generate (defaults to the label's route)
+        model: Claude model name (defaults to the label's route)
+        label: Route and metrics label for this kind of call
+        timeout: Per-request timeout in seconds (defaults to the label's route)
+        system: Optional system prompt, sent as a cacheable prefix
+        with_model: Also return the model that answered, which is the
+                    fallback model if the call fell back
+
+    Returns:
+        str: Response text, or (text, model) with with_model
+
+    Raises:
+        LLMUnavailableError: If no API key is configured
+        anthropic.APIError: If the call fails after all retries
+    """
+    client = get_client()
+    params = _message_params(prompt, max_tokens, model, timeout, system, label)
+    attempt = 0
+    fell_back = False
+
+    while True:
+        started = time.monotonic()
+        try:
+            with limiter:
+                response = client.messages.with_raw_response.create(**params)
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, anthropic.RateLimitError):
+                limiter.record_rate_limited(e.response.headers.get('retry-after'))
+
+            if attempt >= LLM_MAX_RETRIES:
+                metrics.record(label, time.monotonic() - started, error=e, retries=attempt, fallback=fell_back)
+                raise
+
+            attempt += 1
+            fallback = _fallback_model(label, params, e)
+            if fallback:
+                params['model'], fell_back = fallback, True
+            else:
+                time.sleep(_backoff_seconds(attempt, e))
+            continue
+        except Exception as e:
+            metrics.record(label, time.monotonic() - started, error=e, retries=attempt, fallback=fell_back)
+            raise
+
+        limiter.record_headers(response.headers)
+        message = response.parse()
+        _record_usage(label, started, message, attempt, fallback=fell_back)
+
+        text = message.content[0].text
+        return (text, params['model']) if with_model else text
+
+def stream(prompt, max_tokens=None, model=None, label='summary', timeout=None, system=None):
+    """
+    Stream the reply to a single-turn prompt as it is generated.
+
+    Same client, limiter, retries and metrics as complete(), plus
+    time-to-first-token. Transient errors (and the timeout fallback) are only
+    retried before the first chunk arrives; after that the error is raised to
+    the consumer.
+
+    Args:
+        Same as complete(), without with_model
+
+    Yields:
+        str: Chunks of response text
+
+    Returns:
+        str: The model that answered (the generator's return value, for
+             callers using yield from)
+
+    Raises:
+        LLMUnavailableError: If no API key is configured
+        anthropic.APIError: If the call fails
+    """
+    client = get_client()
+    params = _message_params(prompt, max_tokens, model, timeout, system, label)
+    attempt = 0
+    fell_back = False
+
+    while True:
+        started = time.monotonic()
+        first_token_latency = None
+        try:
+            with limiter:
+                with client.messages.stream(**params) as message_stream:
+                    for text in message_stream.text_stream:
+                        if first_token_latency is None:
+                            first_token_latency = time.monotonic() - started
+                        yield text
+                    message = message_stream.get_final_message()
+                    headers = message_stream.response.headers
+        except RETRYABLE_ERRORS as e:
+            if isinstance(e, anthropic.RateLimitError):
+                limiter.record_rate_limited(e.response.headers.get('retry-after'))
+
+            if first_token_latency is not None or attempt >= LLM_MAX_RETRIES:
+                metrics.record(label, time.monotonic() - started, error=e, retries=attempt, fallback=fell_back)
+                raise
+
+            attempt += 1
+            fallback = _fallback_model(label, params, e)
+            if fallback:
+                params['model'], fell_back = fallback, True
+            else:
+                time.sleep(_backoff_seconds(attempt, e))
+            continue
+        except Exception as e:
+            metrics.record(label, time.monotonic() - started, error=e, retries=attempt, fallback=fell_back)
+            raise
+
+        limiter.record_headers(headers)
+        _record_usage(label, started, message, attempt, first_token_latency, fallback=fell_back)
+        return params['model']
+
+def collect(chunks, parts):
+    """
+    Pass through the chunks of a stream() call, appending each to parts.
+
+    Returns:
+        str: The model that answered, for callers using yield from
+    """
+    try:
+        while True:
+            try:
+                chunk = next(chunks)
+            except StopIteration as stop:
+                return stop.value
+            parts.append(chunk)
+            yield chunk
+    finally:
+        chunks.close()
+
+def get_llm_metrics():
+    """Report per-label LLM call metrics, the route table and the current concurrency limit."""
+    return {
+        'routes': metrics.report(),
+        'route_table': {label: route_settings(label) for label in LLM_ROUTES},
+        'backend': LLM_BACKEND,
+        'concurrency_limit': limiter.limit,
+        'in_flight': limiter.in_flight
+    }
@@ -0,0 +1,346 @@
+import random
+import re
+from abc import ABC, abstractmethod
+import threading
+import time
+from datetime import datetime
+import anthropic
+import httpx
+from anthropic.types import Message
+from app.config import (
+    LLM_FIXTURES_DIR, FAKE_SEED, LLM_FAKE_LATENCY_SECONDS, LLM_FAKE_TOKENS_PER_SECOND, LLM_FAKE_OUTPUT_TOKENS,
+    LLM_FAKE_ERROR_RATE, LLM_FAKE_ERRORS, LLM_FAKE_MAX_CONCURRENCY
+)
+from app import fixtures
+
+# Stand-ins for the Anthropic client used by app/llm.py. They implement only
+# what llm.py calls - messages.with_raw_response.create() and
+# messages.stream() - so the limiter, retries, fallbacks and metrics run
+# unchanged against them.
+
+# Minimum prompt length the API will cache (Sonnet's; Haiku needs more)
+MIN_CACHEABLE_TOKENS = 1024
+CACHE_TTL_SECONDS = 300
+STREAM_CHUNK_WORDS = 4
+
+FAKE_WORDS = (
+    'the model reward policy oversight evaluation agents training alignment interpretability '
+    'robustness preference feedback behaviour safety objective benchmark results show method '
+    'we propose learned values human deployment risk scalable supervision circuits features'
+).split()
+
+_FAKE_REQUEST = httpx.Request('POST', 'https://fake.invalid/v1/messages')
+
+def _request_description(params):
+    return {
+        'model': params['model'],
+        'max_tokens': params['max_tokens'],
+        'system': params.get('system'),
+        'messages': params['messages']
+    }
+
+def _system_text(params):
+    system = params.get('system') or ''
+    if isinstance(system, list):
+        return ''.join(block.get('text', '') for block in system)
+    return system
+
+def _prompt_text(params):
+    content = params['messages'][-1]['content']
+    if isinstance(content, list):
+        return ''.join(block.get('text', '') for block in content)
+    return content
+
+def _count_tokens(text):
+    # Close enough to the real tokenizer for English prose
+    return max(1, len(text) // 4)
+
+def _words(seed, count):
+    rng = random.Random(seed)
+    return [rng.choice(FAKE_WORDS) for _ in range(count)]
+
+def _message(text, model, stop_reason, usage):
+    return Message.model_validate({
+        'id': f"msg_fake_{fixtures.request_key([model, text])}",
+        'type': 'message',
+        'role': 'assistant',
+        'model': model,
+        'content': [{'type': 'text', 'text': text}],
+        'stop_reason': stop_reason,
+        'stop_sequence': None,
+        'usage': usage
+    })
+
+class _RawResponse:
+    """What messages.with_raw_response.create() returns: headers plus parse()."""
+
+    def __init__(self, message, headers):
+        self.message = message
+        self.headers = headers
+
+    def parse(self):
+        return self.message
+
+class _FakeStream:
+    """Context manager with the parts of anthropic's MessageStream that llm.stream uses."""
+
+    def __init__(self, backend, params):
+        self.backend = backend
+        self.params = params
+        self.message = None
+        self.response = None
+
+    def __enter__(self):
+        self.message, headers = self.backend.begin(self.params)
+        self.response = _RawResponse(self.message, headers)
+        return self
+
+    def __exit__(self, *exc):
+        self.backend.end()
+
+    @property
+    def text_stream(self):
+        words = self.message.content[0].text.split(' ')
+        delay = self.backend.seconds_per_token
+        for start in range(0, len(words), STREAM_CHUNK_WORDS):
+            if delay:
+                time.sleep(delay * STREAM_CHUNK_WORDS)
+            text = ' '.join(words[start:start + STREAM_CHUNK_WORDS])
+            yield text if start == 0 else ' ' + text
+
+    def get_final_message(self):
+        return self.message
+
+class _RawMessages:
+    def __init__(self, backend):
+        self.backend = backend
+
+    def create(self, **params):
+        message, headers = self.backend.begin(params)
+        try:
+            if self.backend.seconds_per_token:
+                time.sleep(self.backend.seconds_per_token * message.usage.output_tokens)
+        finally:
+            self.backend.end()
+        return _RawResponse(message, headers)
+
+class _Messages:
+    def __init__(self, backend):
+        self.with_raw_response = _RawMessages(backend)
+        self.backend = backend
+
+    def create(self, **params):
+        return self.with_raw_response.create(**params).parse()
+
+    def stream(self, **params):
+        return _FakeStream(self.backend, params)
+
+class _LocalClient(ABC):
+    """Base for clients answered in-process: begin() produces a reply, end() frees its slot."""
+
+    seconds_per_token = 0.0
+
+    def __init__(self):
+        self.messages = _Messages(self)
+
+    @property
+    def beta(self):
+        """
+        Raises:
+            LLMUnavailableError: Always; in-process clients have no Message Batches API
+        """
+        from app.llm import LLMUnavailableError  # app.llm imports this module
+
+        raise LLMUnavailableError("Message Batches need the anthropic backend or batch_stub_server.py")
+
+    @abstractmethod
+    def begin(self, params):
+        """
+        Produce the reply to one Messages request.
+
+        Args:
+            params: The keyword arguments of messages.create()
+
+        Returns:
+            tuple: (anthropic.types.Message, dict of response headers)
+        """
+
+    def end(self):
+        pass
+
+class FakeClient(_LocalClient):
+    """
+    Deterministic offline stand-in for anthropic.Anthropic.
+
+    Replies are generated from a hash of the request, so the same prompt always
+    gets the same text. Packed prompts get one well-formed block per paper.
+    Token usage, prompt caching, latency, concurrency limits and transient
+    errors are simulated according to the LLM_FAKE_* settings.
+    """
+
+    def __init__(self, latency=LLM_FAKE_LATENCY_SECONDS, tokens_per_second=LLM_FAKE_TOKENS_PER_SECOND,
+                 output_tokens=LLM_FAKE_OUTPUT_TOKENS, error_rate=LLM_FAKE_ERROR_RATE, errors=LLM_FAKE_ERRORS,
+                 max_concurrency=LLM_FAKE_MAX_CONCURRENCY, seed=FAKE_SEED):
+        super().__init__()
+        self.latency = latency
+        self.seconds_per_token = 1.0 / tokens_per_second if tokens_per_second > 0 else 0.0
+        self.output_tokens = output_tokens
+        self.errors = errors or ['overloaded']
+        self.max_concurrency = max_concurrency
+        self.seed = seed
+        self.injector = fixtures.ErrorInjector(seed, error_rate)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.cached_prefixes = {}
+
+    def _reply(self, key, params):
+        prompt = _prompt_text(params)
+        tags = re.findall(r'^=== PAPER (P\d+) ===$', prompt, re.MULTILINE)
+
+        if tags:
+            text = '\n\n'.join(
+                f"=== SUMMARY {tag} ===\n{' '.join(_words(f'{key}:{tag}', self.output_tokens))}\n=== END {tag} ==="
+                for tag in tags
+            )
+        else:
+            title = re.search(r'^Paper Title: (.*)$', prompt, re.MULTILINE)
+            words = _words(key, self.output_tokens)
+            text = (f"Summary of {title.group(1)}: " if title else '') + ' '.join(words)
+
+        words = text.split(' ')
+        if len(words) > params['max_tokens']:
+            return ' '.join(words[:params['max_tokens']]), 'max_tokens'
+        return text, 'end_turn'
+
+    def _usage(self, params, output_tokens):
+        system_tokens = _count_tokens(_system_text(params)) if params.get('system') else 0
+        usage = {
+            'input_tokens': _count_tokens(_prompt_text(params)),
+            'output_tokens': output_tokens,
+            'cache_creation_input_tokens': 0,
+            'cache_read_input_tokens': 0
+        }
+
+        cacheable = isinstance(params.get('system'), list) and system_tokens >= MIN_CACHEABLE_TOKENS
+        if not cacheable:
+            usage['input_tokens'] += system_tokens
+            return usage
+
+        prefix = fixtures.request_key([params['model'], params['system']])
+        now = time.monotonic()
+        with self.lock:
+            hit = self.cached_prefixes.get(prefix, 0) > now
+            self.cached_prefixes[prefix] = now + CACHE_TTL_SECONDS
+        usage['cache_read_input_tokens' if hit else 'cache_creation_input_tokens'] = system_tokens
+        return usage
+
+    def _raise(self, kind, params):
+        if kind == 'timeout':
+            raise anthropic.APITimeoutError(request=_FAKE_REQUEST)
+        if kind == 'rate_limit':
+            response = httpx.Response(429, headers={'retry-after': '1'}, request=_FAKE_REQUEST)
+            raise anthropic.RateLimitError("Fake rate limit", response=response, body=None)
+        response = httpx.Response(529, request=_FAKE_REQUEST)
+        raise anthropic.InternalServerError("Fake overload", response=response, body=None)
+
+    def begin(self, params):
+        with self.lock:
+            if self.max_concurrency and self.in_flight >= self.max_concurrency:
+                self._raise('rate_limit', params)
+            self.in_flight += 1
+
+        try:
+            key = fixtures.request_key([self.seed, _request_description(params)])
+            error = self.injector.next_attempt(key, self.errors)
+
+            if self.latency:
+                time.sleep(self.latency)
+            if error:
+                self._raise(error, params)
+
+            text, stop_reason = self._reply(key, params)
+            message = _message(text, params['model'], stop_reason, self._usage(params, len(text.split(' '))))
+        except BaseException:
+            self.end()
+            raise
+
+        return message, {'request-id': message.id}
+
+    def end(self):
+        with self.lock:
+            self.in_flight -= 1
+
+class ReplayClient(_LocalClient):
+    """Answers only requests saved by RecordingClient, instantly."""
+
+    def __init__(self, directory=LLM_FIXTURES_DIR):
+        super().__init__()
+        self.directory = directory
+
+    def begin(self, params):
+        request = _request_description(params)
+        fixture = fixtures.load(self.directory, fixtures.request_key(request), f"{params['model']} request")
+        return Message.model_validate(fixture['message']), {}
+
+class _RecordingStream:
+    def __init__(self, client, params):
+        self.client = client
+        self.params = params
+        self.stream = None
+
+    def __enter__(self):
+        self.stream = self.client.real.messages.stream(**self.params).__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self.stream.__exit__(*exc)
+
+    @property
+    def text_stream(self):
+        return self.stream.text_stream
+
+    @property
+    def response(self):
+        return self.stream.response
+
+    def get_final_message(self):
+        message = self.stream.get_final_message()
+        self.client.save(self.params, message)
+        return message
+
+class _RecordingRawMessages:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, **params):
+        response = self.client.real.messages.with_raw_response.create(**params)
+        self.client.save(params, response.parse())
+        return response
+
+class _RecordingMessages:
+    def __init__(self, client):
+        self.client = client
+        self.with_raw_response = _RecordingRawMessages(client)
+
+    def stream(self, **params):
+        return _RecordingStream(self.client, params)
+
+class RecordingClient:
+    """Wraps a real client, saving each successful reply as a fixture for ReplayClient."""
+
+    def __init__(self, real, directory=LLM_FIXTURES_DIR):
+        self.real = real
+        self.directory = directory
+        self.messages = _RecordingMessages(self)
+
+    @property
+    def beta(self):
+        return self.real.beta
+
+    def save(self, params, message):
+        request = _request_description(params)
+        fixtures.save(self.directory, fixtures.request_key(request), {
+            'request': request,
+            'message': message.model_dump(mode='json'),
+            'recorded_date': datetime.utcnow().isoformat()
+        })
@@ -0,0 +1,19 @@
+from pypdf import PdfReader
+
+def extract_pages(path):
+    """
+    Extract the text of each page of a PDF.
+
+    Runs in a spawned worker process (see app/deep_summary.py). Importing
+    this module there also runs app/__init__.py, which imports Flask and
+    app.config, so module-level code in those must stay cheap and free of
+    side effects.
+
+    Args:
+        path: Path to the PDF file
+
+    Returns:
+        list: Text of each page, in order
+    """
+    reader = PdfReader(path)
+    return [page.extract_text() or '' for page in reader.pages]
@@ -106,16 +106,13 @@ def recalculate_paper_ranks():
     Recalculate rank scores for all papers based on current user preferences.
     Called after preference updates.
     """
-    from app.database import get_session, Paper
+    from app.database import session_scope, Paper
     import json
 
-    session = get_session()
-    papers = session.query(Paper).all()
-
-    for paper in papers:
-        authors_list = json.loads(paper.authors)
-        new_rank = calculate_rank_score(authors_list, paper.affiliations, use_user_prefs=True)
-        paper.rank_score = new_rank
+    with session_scope() as session:
+        papers = session.query(Paper).all()
 
-    session.commit()
-    session.close()
+        for paper in papers:
+            authors_list = json.loads(paper.authors)
+            new_rank = calculate_rank_score(authors_list, paper.affiliations, use_user_prefs=True)
+            paper.rank_score = new_rank
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+import anthropic
+from app.database import SummaryAttempt
+from app.config import SUMMARY_MAX_ATTEMPTS, SUMMARY_RETRY_BASE_MINUTES
+from app.fixtures import FixtureMissingError
+
+# Failures that will recur no matter how often the same request is sent
+PERMANENT_ERRORS = (anthropic.BadRequestError, anthropic.UnprocessableEntityError, FixtureMissingError)
+
+MAX_BACKOFF = timedelta(days=1)
+
+def is_permanent(error):
+    """Whether a failed Claude call should not be retried."""
+    return isinstance(error, PERMANENT_ERRORS)
+
+def backoff_delay(attempts):
+    """Delay before the next try after the given number of failed attempts."""
+    return min(MAX_BACKOFF, timedelta(minutes=SUMMARY_RETRY_BASE_MINUTES * 2 ** (attempts - 1)))
+
+def record_failure(session, paper_id, error_class, message, permanent=False, summary_type='general'):
+    """
+    Record a failed summary attempt and schedule the next one.
+
+    Papers with a permanent error, or that have used up SUMMARY_MAX_ATTEMPTS,
+    are marked 'failed' and not retried automatically. The caller commits.
+
+    Args:
+        session: Database session
+        paper_id: arXiv ID
+        error_class: Name of the error, e.g. the exception class
+        message: Error message
+        permanent: Whether retrying cannot help
+        summary_type: Type of summary that failed
+
+    Returns:
+        SummaryAttempt: The updated attempt record
+    """
+    attempt = session.get(SummaryAttempt, (paper_id, summary_type))
+    if attempt is None:
+        attempt = SummaryAttempt(paper_id=paper_id, summary_type=summary_type, attempts=0)
+        session.add(attempt)
+
+    attempt.attempts += 1
+    attempt.error_class = error_class
+    attempt.last_error = message[:2000]
+
+    if permanent or attempt.attempts >= SUMMARY_MAX_ATTEMPTS:
+        attempt.status = 'failed'
+        attempt.next_retry_date = None
+    else:
+        attempt.status = 'retrying'
+        attempt.next_retry_date = datetime.utcnow() + backoff_delay(attempt.attempts)
+
+    return attempt
+
+def clear_failure(session, paper_id, summary_type='general'):
+    """Forget earlier failures once a paper has a summary of this type. The caller commits."""
+    session.query(SummaryAttempt).filter_by(paper_id=paper_id, summary_type=summary_type).delete(
+        synchronize_session=False
+    )
+
+def attempted_paper_ids(session, summary_type='general'):
+    """
+    Subquery of papers with failed attempts at a summary type, for excluding
+    them from the regular queues: retries happen on their own schedule.
+    """
+    return session.query(SummaryAttempt.paper_id).filter(SummaryAttempt.summary_type == summary_type)
+
+def due_retry_types(session):
+    """Summary types with at least one retry due."""
+    return [
+        summary_type for (summary_type,) in session.query(SummaryAttempt.summary_type).filter(
+            SummaryAttempt.status == 'retrying',
+            SummaryAttempt.next_retry_date <= datetime.utcnow()
+        ).distinct()
+    ]
+
+def due_retry_ids(session, limit, summary_type='general'):
+    """IDs of papers whose next retry at a summary type is due, longest-waiting first."""
+    return [
+        paper_id for (paper_id,) in session.query(SummaryAttempt.paper_id).filter(
+            SummaryAttempt.summary_type == summary_type,
+            SummaryAttempt.status == 'retrying',
+            SummaryAttempt.next_retry_date <= datetime.utcnow()
+        ).order_by(SummaryAttempt.next_retry_date).limit(limit)
+    ]
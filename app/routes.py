@@ -1,17 +1,25 @@
-from flask import Blueprint, render_template, jsonify, request
-from app.database import get_session, Paper, AffiliationPreference, UserFeedback, FavoritePaper, PaperHighlight
+from flask import Blueprint, Response, render_template, jsonify, request, stream_with_context
+from app.database import get_request_session, session_scope, Paper, AffiliationPreference, UserFeedback, FavoritePaper, PaperHighlight
 from app.fetcher import fetch_recent_papers, fetch_paper_by_id, extract_arxiv_id
-from app.summarizer import summarize_papers
+from app.summarizer import summarize_papers, summarize_packed, SUMMARY_TYPES
 from app.ranker import rank_papers, recalculate_paper_ranks, get_user_preferences
-from app.learning import get_learning_report
+from app.learning import get_learning_report, bump_feedback_version
+from app.stats import get_paper_stats
+from app.search import search_papers
+from app.embeddings import find_similar_papers, semantic_search
+from app.jobs import enqueue_job, get_job, start_job
+from app.config import USE_WORKER_PROCESS
+from app import llm
+from app.work_queue import summary_queue
 import json
+from sqlalchemy.exc import OperationalError
 
 main = Blueprint('main', __name__)
 
 @main.route('/')
 def index():
     """Main page showing ranked papers."""
-    session = get_session()
+    session = get_request_session()
 
     # Get filter parameters
     min_rank = request.args.get('min_rank', 0, type=float)
@@ -49,8 +57,6 @@ def index():
             'summary_rating': paper.summary_rating
         })
 
-    session.close()
-
     return render_template('index.html', papers=papers_data, min_rank=min_rank)
 
 @main.route('/api/fetch', methods=['POST'])
@@ -59,6 +65,14 @@ def fetch_papers():
     days_back = request.json.get('days_back', 7)
     max_results = request.json.get('max_results', 100)
 
+    if USE_WORKER_PROCESS:
+        job_id = enqueue_job('fetch', days_back=days_back, max_results=max_results)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': 'Fetch queued; new papers will appear shortly'
+        }), 202
+
     new_papers = fetch_recent_papers(days_back=days_back, max_results=max_results)
 
     return jsonify({
@@ -69,9 +83,42 @@ def fetch_papers():
 
 @main.route('/api/summarize', methods=['POST'])
 def generate_summaries():
-    """API endpoint to generate summaries for papers."""
+    """
+    API endpoint to generate summaries for papers.
+
+    With a "summary_type" other than general, stores summaries of that type
+    for papers lacking one, several papers per Claude request.
+    """
     paper_ids = request.json.get('paper_ids', None)
     limit = request.json.get('limit', 10)
+    summary_type = request.json.get('summary_type', 'general')
+
+    if summary_type not in SUMMARY_TYPES:
+        return jsonify({'success': False, 'message': 'Invalid summary type'}), 400
+
+    if summary_type != 'general':
+        if USE_WORKER_PROCESS:
+            job_id = enqueue_job('summarize_packed', summary_type=summary_type, paper_ids=paper_ids, limit=limit)
+            return jsonify({
+                'success': True,
+                'job_id': job_id,
+                'message': 'Summarization queued; summaries will appear shortly'
+            }), 202
+
+        summarized = summarize_packed(summary_type, paper_ids=paper_ids, limit=limit)
+        return jsonify({
+            'success': True,
+            'summarized': summarized,
+            'message': f'Generated {summarized} summaries'
+        })
+
+    if USE_WORKER_PROCESS:
+        job_id = enqueue_job('summarize', paper_ids=paper_ids, limit=limit)
+        return jsonify({
+            'success': True,
+            'job_id': job_id,
+            'message': 'Summarization queued; summaries will appear shortly'
+        }), 202
 
     summarized = summarize_papers(paper_ids=paper_ids, limit=limit)
 
@@ -81,23 +128,70 @@ def generate_summaries():
         'message': f'Generated {summarized} summaries'
     })
 
+@main.route('/api/jobs/<int:job_id>')
+def job_status(job_id):
+    """Get the status of a job queued for the worker process."""
+    job = get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+
+    return jsonify({'success': True, 'job': job})
+
+@main.route('/api/llm-metrics')
+def llm_metrics():
+    """Get latency and token usage of Claude calls made by this process, and its summary queue."""
+    return jsonify({**llm.get_llm_metrics(), 'summary_queue': summary_queue.stats()})
+
 @main.route('/api/stats')
 def get_stats():
     """Get statistics about papers in database."""
-    session = get_session()
+    stats = get_paper_stats()
 
-    total_papers = session.query(Paper).count()
-    papers_with_summaries = session.query(Paper).filter(Paper.summary.isnot(None)).count()
-    high_rank_papers = session.query(Paper).filter(Paper.rank_score >= 7).count()
+    response = jsonify({key: value for key, value in stats.items() if key != 'version'})
+    response.set_etag(f"stats-{stats['version']}")
+    response.cache_control.no_cache = True  # always revalidate, usually a 304
+    return response.make_conditional(request)
 
-    session.close()
+@main.route('/api/search')
+def search():
+    """Full-text search over papers, summaries and highlights."""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    rank_weight = request.args.get('rank_weight', 0.0, type=float)
 
-    return jsonify({
-        'total_papers': total_papers,
-        'papers_with_summaries': papers_with_summaries,
-        'papers_without_summaries': total_papers - papers_with_summaries,
-        'high_rank_papers': high_rank_papers
-    })
+    if not query:
+        return jsonify({'success': False, 'message': 'Query parameter q is required'}), 400
+
+    try:
+        results = search_papers(query, limit=limit, rank_weight=rank_weight)
+    except OperationalError as e:
+        # SQLite built without FTS5, or the index table is missing
+        print(f"Search unavailable: {e}")
+        return jsonify({'success': False, 'message': 'Full-text search is unavailable on this server'}), 503
+
+    return jsonify({'success': True, 'query': query, 'results': results})
+
+@main.route('/api/semantic-search')
+def semantic_search_papers():
+    """Find papers closest in meaning to a free-text query."""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+
+    if not query:
+        return jsonify({'success': False, 'message': 'Query parameter q is required'}), 400
+
+    return jsonify({'success': True, 'query': query, 'results': semantic_search(query, limit=limit)})
+
+@main.route('/api/paper/<string:paper_id>/similar')
+def similar_papers(paper_id):
+    """Get papers similar to the given paper."""
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+
+    results = find_similar_papers(paper_id, limit=limit)
+    if results is None:
+        return jsonify({'success': False, 'message': 'Paper not found in similarity index'}), 404
+
+    return jsonify({'success': True, 'paper_id': paper_id, 'results': results})
 
 @main.route('/preferences')
 def preferences_page():
@@ -108,11 +202,10 @@ def preferences_page():
 def get_preferences():
     """Get all affiliation preferences."""
     prefs = get_user_preferences()
-    session = get_session()
+    session = get_request_session()
 
     # Get custom preferences with metadata
     custom_prefs = session.query(AffiliationPreference).all()
-    session.close()
 
     result = []
     for name, score in prefs.items():
@@ -139,7 +232,7 @@ def add_or_update_preference():
     if not affiliation_name:
         return jsonify({'success': False, 'message': 'Affiliation name is required'}), 400
 
-    session = get_session()
+    session = get_request_session()
 
     # Check if preference exists
     pref = session.query(AffiliationPreference).filter_by(
@@ -161,32 +254,36 @@ def add_or_update_preference():
         message = f'Added {affiliation_name} with score {rank_score}'
 
     session.commit()
-    session.close()
 
     # Recalculate all paper ranks
-    recalculate_paper_ranks()
+    refresh_paper_ranks()
 
     return jsonify({'success': True, 'message': message})
 
+def refresh_paper_ranks():
+    """Re-rank all papers, in the worker process if there is one."""
+    if USE_WORKER_PROCESS:
+        enqueue_job('rerank')
+    else:
+        recalculate_paper_ranks()
+
 @main.route('/api/preferences/<string:affiliation_name>', methods=['DELETE'])
 def delete_preference(affiliation_name):
     """Delete a custom affiliation preference."""
-    session = get_session()
+    session = get_request_session()
 
     pref = session.query(AffiliationPreference).filter_by(
         affiliation_name=affiliation_name.lower()
     ).first()
 
     if not pref:
-        session.close()
         return jsonify({'success': False, 'message': 'Preference not found'}), 404
 
     session.delete(pref)
     session.commit()
-    session.close()
 
     # Recalculate all paper ranks
-    recalculate_paper_ranks()
+    refresh_paper_ranks()
 
     return jsonify({'success': True, 'message': f'Deleted {affiliation_name}'})
 
@@ -199,11 +296,10 @@ def rate_summary(paper_id):
     if rating < 1 or rating > 5:
         return jsonify({'success': False, 'message': 'Rating must be between 1 and 5'}), 400
 
-    session = get_session()
+    session = get_request_session()
 
     paper = session.query(Paper).filter_by(id=paper_id).first()
     if not paper:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
     paper.summary_rating = rating
@@ -215,9 +311,9 @@ def rate_summary(paper_id):
         feedback_value=json.dumps({'rating': rating})
     )
     session.add(feedback)
+    bump_feedback_version(session)
 
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': f'Rated summary {rating} stars'})
 
@@ -227,11 +323,10 @@ def set_paper_rank(paper_id):
     data = request.json
     rank = data.get('rank', None)
 
-    session = get_session()
+    session = get_request_session()
 
     paper = session.query(Paper).filter_by(id=paper_id).first()
     if not paper:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
     if rank is None:
@@ -249,9 +344,9 @@ def set_paper_rank(paper_id):
         feedback_value=json.dumps({'old_rank': paper.rank_score, 'new_rank': rank})
     )
     session.add(feedback)
+    bump_feedback_version(session)
 
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': message})
 
@@ -272,7 +367,7 @@ def favorites_page():
 @main.route('/api/favorites', methods=['GET'])
 def get_favorites():
     """Get all favorite papers with their details."""
-    session = get_session()
+    session = get_request_session()
 
     favorites = session.query(FavoritePaper).order_by(FavoritePaper.personal_rank.desc()).all()
 
@@ -305,7 +400,6 @@ def get_favorites():
                 }
             })
 
-    session.close()
     return jsonify({'success': True, 'favorites': result})
 
 @main.route('/api/favorites/<string:paper_id>', methods=['POST'])
@@ -316,18 +410,16 @@ def add_favorite(paper_id):
     notes = data.get('notes', '')
     tags = data.get('tags', [])
 
-    session = get_session()
+    session = get_request_session()
 
     # Check if paper exists
     paper = session.query(Paper).filter_by(id=paper_id).first()
     if not paper:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
     # Check if already favorited
     existing = session.query(FavoritePaper).filter_by(paper_id=paper_id).first()
     if existing:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper already in favorites'}), 400
 
     # Create favorite
@@ -339,7 +431,6 @@ def add_favorite(paper_id):
     )
     session.add(favorite)
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': 'Added to favorites'})
 
@@ -348,11 +439,10 @@ def update_favorite(paper_id):
     """Update a favorite paper's details."""
     data = request.json
 
-    session = get_session()
+    session = get_request_session()
 
     favorite = session.query(FavoritePaper).filter_by(paper_id=paper_id).first()
     if not favorite:
-        session.close()
         return jsonify({'success': False, 'message': 'Favorite not found'}), 404
 
     # Update fields
@@ -364,32 +454,28 @@ def update_favorite(paper_id):
         favorite.tags = json.dumps(data['tags'])
 
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': 'Favorite updated'})
 
 @main.route('/api/favorites/<string:paper_id>', methods=['DELETE'])
 def remove_favorite(paper_id):
     """Remove a paper from favorites."""
-    session = get_session()
+    session = get_request_session()
 
     favorite = session.query(FavoritePaper).filter_by(paper_id=paper_id).first()
     if not favorite:
-        session.close()
         return jsonify({'success': False, 'message': 'Favorite not found'}), 404
 
     session.delete(favorite)
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': 'Removed from favorites'})
 
 @main.route('/api/favorites/<string:paper_id>/check', methods=['GET'])
 def check_favorite(paper_id):
     """Check if a paper is favorited."""
-    session = get_session()
+    session = get_request_session()
     favorite = session.query(FavoritePaper).filter_by(paper_id=paper_id).first()
-    session.close()
 
     return jsonify({
         'is_favorite': favorite is not None,
@@ -425,8 +511,15 @@ def add_paper_manually():
 
 @main.route('/api/paper/<string:paper_id>/summary', methods=['POST'])
 def generate_paper_summary(paper_id):
-    """Generate summary for a specific paper."""
-    from app.summarizer import generate_summary, SUMMARY_TYPES
+    """
+    Get a summary of a specific type for a paper.
+
+    Summaries already generated for the current prompt and paper text are
+    served from the store; pass "force": true to regenerate. Pass "deep": true
+    to summarize the full text of the PDF instead of the abstract; that runs
+    as a job (202 with a job_id to poll) once the PDF has been fetched.
+    """
+    from app.summarizer import get_or_generate_summary, SUMMARY_TYPES
 
     data = request.json
     summary_type = data.get('summary_type', 'general')
@@ -434,31 +527,106 @@ def generate_paper_summary(paper_id):
     if summary_type not in SUMMARY_TYPES:
         return jsonify({'success': False, 'message': 'Invalid summary type'}), 400
 
-    session = get_session()
-    paper = session.query(Paper).filter_by(id=paper_id).first()
-
-    if not paper:
-        session.close()
-        return jsonify({'success': False, 'message': 'Paper not found'}), 404
+    if data.get('deep'):
+        return _queue_deep_summary(paper_id, summary_type, bool(data.get('force')))
 
     try:
-        authors_list = json.loads(paper.authors)
-        summary = generate_summary(paper.title, paper.abstract, authors_list, summary_type=summary_type)
-
-        # Update paper with new summary
-        paper.summary = summary
-        session.commit()
-        session.close()
+        summary, cached = get_or_generate_summary(paper_id, summary_type, force=bool(data.get('force')))
+        if summary is None:
+            return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
         return jsonify({
             'success': True,
             'summary': summary,
-            'summary_type': SUMMARY_TYPES[summary_type]['name']
+            'summary_type': SUMMARY_TYPES[summary_type]['name'],
+            'cached': cached
         })
     except Exception as e:
-        session.close()
         return jsonify({'success': False, 'message': str(e)}), 500
 
+def _queue_deep_summary(paper_id, summary_type, force):
+    """
+    Check that a paper's full text is available, then queue its deep summary.
+
+    Download and extraction happen here so their failures get a proper
+    status: 422 if there is no usable PDF, 502 if arXiv can't be reached.
+    The chunk and final Claude calls run in the job.
+    """
+    from app.deep_summary import check_full_text, PdfUnavailableError
+
+    with session_scope() as session:
+        paper = session.get(Paper, paper_id)
+        if not paper:
+            return jsonify({'success': False, 'message': 'Paper not found'}), 404
+        pdf_url = paper.pdf_url
+
+    try:
+        check_full_text(paper_id, pdf_url)
+    except PdfUnavailableError as e:
+        return jsonify({'success': False, 'message': str(e)}), 502
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 422
+
+    job_id = enqueue_job('deep_summary', paper_id=paper_id, summary_type=summary_type, force=force)
+    if not USE_WORKER_PROCESS:
+        start_job(job_id)
+
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'message': 'Deep summary queued'
+    }), 202
+
+def _sse(event, data):
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _sse_response(events):
+    """Stream server-sent events, keeping proxies from buffering them."""
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@main.route('/api/paper/<string:paper_id>/summary/stream', methods=['POST'])
+def stream_paper_summary(paper_id):
+    """
+    Streaming variant of generate_paper_summary.
+
+    Sends server-sent events: 'text' events with chunks of the summary as
+    Claude generates them, then 'done' (or 'error'). The full summary is saved
+    when generation finishes.
+    """
+    from app.summarizer import stream_summary, SUMMARY_TYPES
+
+    data = request.json or {}
+    summary_type = data.get('summary_type', 'general')
+
+    if summary_type not in SUMMARY_TYPES:
+        return jsonify({'success': False, 'message': 'Invalid summary type'}), 400
+
+    chunks, cached = stream_summary(paper_id, summary_type, force=bool(data.get('force')))
+    if chunks is None:
+        return jsonify({'success': False, 'message': 'Paper not found'}), 404
+
+    def events():
+        try:
+            for text in chunks:
+                yield _sse('text', {'text': text})
+            yield _sse('done', {'summary_type': SUMMARY_TYPES[summary_type]['name'], 'cached': cached})
+        except Exception as e:
+            yield _sse('error', {'message': str(e)})
+
+    return _sse_response(events())
+
+@main.route('/api/paper/<string:paper_id>/summaries', methods=['GET'])
+def get_stored_summary_types(paper_id):
+    """List the summary types already stored for a paper."""
+    from app.summarizer import list_stored_summaries
+
+    return jsonify({'summaries': list_stored_summaries(paper_id)})
+
 @main.route('/api/summary-types', methods=['GET'])
 def get_summary_types():
     """Get available summary types."""
@@ -474,11 +642,10 @@ def get_summary_types():
 @main.route('/paper/<string:paper_id>/viewer')
 def paper_viewer(paper_id):
     """Interactive paper viewer with highlighting."""
-    session = get_session()
+    session = get_request_session()
     paper = session.query(Paper).filter_by(id=paper_id).first()
 
     if not paper:
-        session.close()
         return "Paper not found", 404
 
     authors_list = json.loads(paper.authors)
@@ -492,7 +659,6 @@ def paper_viewer(paper_id):
         'pdf_url': paper.pdf_url
     }
 
-    session.close()
     return render_template('paper_viewer.html', paper=paper_data)
 
 @main.route('/api/paper/<string:paper_id>/highlight', methods=['POST'])
@@ -505,12 +671,11 @@ def save_highlight(paper_id):
     if not text:
         return jsonify({'success': False, 'message': 'No text provided'}), 400
 
-    session = get_session()
+    session = get_request_session()
 
     # Verify paper exists
     paper = session.query(Paper).filter_by(id=paper_id).first()
     if not paper:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
     # Create highlight
@@ -524,7 +689,6 @@ def save_highlight(paper_id):
     session.commit()
 
     highlight_id = highlight.id
-    session.close()
 
     return jsonify({
         'success': True,
@@ -535,7 +699,7 @@ def save_highlight(paper_id):
 @main.route('/api/paper/<string:paper_id>/highlights', methods=['GET'])
 def get_highlights(paper_id):
     """Get all highlights for a paper."""
-    session = get_session()
+    session = get_request_session()
 
     highlights = session.query(PaperHighlight).filter_by(paper_id=paper_id).order_by(PaperHighlight.page_number).all()
 
@@ -546,101 +710,122 @@ def get_highlights(paper_id):
         'note': h.note
     } for h in highlights]
 
-    session.close()
     return jsonify({'success': True, 'highlights': result})
 
 @main.route('/api/paper/<string:paper_id>/highlight/<int:highlight_id>', methods=['DELETE'])
 def delete_highlight(paper_id, highlight_id):
     """Delete a highlight."""
-    session = get_session()
+    session = get_request_session()
 
     highlight = session.query(PaperHighlight).filter_by(id=highlight_id, paper_id=paper_id).first()
 
     if not highlight:
-        session.close()
         return jsonify({'success': False, 'message': 'Highlight not found'}), 404
 
     session.delete(highlight)
     session.commit()
-    session.close()
 
     return jsonify({'success': True, 'message': 'Highlight deleted'})
 
-@main.route('/api/paper/<string:paper_id>/summary-from-highlights', methods=['POST'])
-def generate_summary_from_highlights(paper_id):
-    """Generate a summary based on user highlights."""
-    from app.summarizer import generate_summary
+def _highlights_request(session, paper_id):
+    """
+    Load a paper and its highlights for a highlights summary.
 
-    session = get_session()
+    Returns:
+        tuple: (paper, plan from plan_highlights_summary, number of highlights),
+               or an error response if the request can't proceed
+    """
+    from app.summarizer import plan_highlights_summary
 
     paper = session.query(Paper).filter_by(id=paper_id).first()
     if not paper:
-        session.close()
         return jsonify({'success': False, 'message': 'Paper not found'}), 404
 
-    highlights = session.query(PaperHighlight).filter_by(paper_id=paper_id).order_by(PaperHighlight.page_number).all()
+    highlights = session.query(PaperHighlight).filter_by(paper_id=paper_id).all()
 
     if not highlights:
-        session.close()
         return jsonify({'success': False, 'message': 'No highlights found. Please highlight some text first.'}), 400
 
-    # Combine highlights into context
-    highlighted_text = "\n\n".join([
-        f"[Page {h.page_number}] {h.highlight_text}"
-        for h in highlights
-    ])
+    plan = plan_highlights_summary(session, paper, highlights)
 
-    authors_list = json.loads(paper.authors)
-
-    # Generate summary with highlighted text as additional context
-    try:
-        import anthropic
-        from app.config import ANTHROPIC_API_KEY
-
-        if not ANTHROPIC_API_KEY:
-            session.close()
-            return jsonify({'success': False, 'message': 'No API key configured'}), 500
-
-        client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-
-        prompt = f"""Generate a comprehensive summary of this AI alignment research paper based on the user's highlighted passages.
+    if plan['mode'] != 'cached' and not llm.is_configured():
+        return jsonify({'success': False, 'message': 'No API key configured'}), 500
 
-Paper Title: {paper.title}
-Authors: {', '.join(authors_list)}
+    return paper, plan, len(highlights)
 
-Abstract: {paper.abstract}
-
-User's Highlighted Passages:
-{highlighted_text}
-
-Please provide a detailed summary that:
-1. Focuses on the concepts and findings from the highlighted passages
-2. Maintains the technical depth appropriate for researchers
-3. Uses LaTeX notation for mathematical expressions (inline: $...$, display: $$...$$)
-4. Explains how the highlighted sections relate to the overall contribution
-5. Provides context for why these passages are significant
+@main.route('/api/paper/<string:paper_id>/summary-from-highlights', methods=['POST'])
+def generate_summary_from_highlights(paper_id):
+    """
+    Generate a summary based on user highlights.
 
-Write the summary in a clear, well-structured format."""
+    The result is cached per highlight set; when highlights were only added
+    since the last summary, just the new passages are merged into it.
+    """
+    from app.summarizer import generate_highlights_summary
 
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=2048,
-            messages=[{"role": "user", "content": prompt}]
-        )
+    session = get_request_session()
 
-        summary = message.content[0].text
+    result = _highlights_request(session, paper_id)
+    if isinstance(result[0], Response):
+        return result
+    paper, plan, highlight_count = result
 
-        # Update paper with new summary
-        paper.summary = summary
-        session.commit()
-        session.close()
+    try:
+        if plan['mode'] == 'cached':
+            summary = plan['summary']
+            paper.summary = summary
+            session.commit()
+        else:
+            # Don't hold the read transaction open during the Claude call
+            session.rollback()
+            summary = generate_highlights_summary(paper_id, plan)
 
         return jsonify({
             'success': True,
             'summary': summary,
-            'highlights_used': len(highlights)
+            'highlights_used': highlight_count,
+            'mode': plan['mode'],
+            'new_highlights': plan['new_highlights']
         })
 
     except Exception as e:
-        session.close()
         return jsonify({'success': False, 'message': str(e)}), 500
+
+@main.route('/api/paper/<string:paper_id>/summary-from-highlights/stream', methods=['POST'])
+def stream_summary_from_highlights(paper_id):
+    """Streaming variant of generate_summary_from_highlights (server-sent events)."""
+    from app.summarizer import stream_highlights_summary
+
+    session = get_request_session()
+
+    result = _highlights_request(session, paper_id)
+    if isinstance(result[0], Response):
+        return result
+    paper, plan, highlight_count = result
+
+    if plan['mode'] == 'cached':
+        paper.summary = plan['summary']
+        session.commit()
+    else:
+        # Don't hold the read transaction open for the length of the stream
+        session.rollback()
+
+    def events():
+        try:
+            if plan['mode'] == 'cached':
+                texts = [plan['summary']]
+            else:
+                texts = stream_highlights_summary(paper_id, plan)
+
+            for text in texts:
+                yield _sse('text', {'text': text})
+
+            yield _sse('done', {
+                'highlights_used': highlight_count,
+                'mode': plan['mode'],
+                'new_highlights': plan['new_highlights']
+            })
+        except Exception as e:
+            yield _sse('error', {'message': str(e)})
+
+    return _sse_response(events())
@@ -0,0 +1,110 @@
+import re
+from sqlalchemy import text
+from app.database import engine, SEARCH_INDEX_SQL
+
+# Per-column BM25 weights: paper_id, title, abstract, summary, authors, highlights
+BM25_WEIGHTS = (0.0, 10.0, 4.0, 2.0, 3.0, 5.0)
+
+def build_match_query(user_query):
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression.
+
+    Every word is quoted so FTS5 operators and punctuation in the input can't
+    cause syntax errors, and the last word is treated as a prefix so results
+    appear while the user is still typing.
+
+    Args:
+        user_query: Raw search text
+
+    Returns:
+        str: FTS5 query, or None if the input has no searchable words
+    """
+    terms = re.findall(r'\w+', user_query.lower())
+    if not terms:
+        return None
+
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def search_papers(user_query, limit=20, rank_weight=0.0):
+    """
+    Full-text search over paper titles, abstracts, summaries, authors and highlights.
+
+    Args:
+        user_query: Raw search text
+        limit: Maximum number of results
+        rank_weight: How much to blend in the paper rank_score (0.0 = pure BM25, 1.0 = pure rank)
+
+    Returns:
+        List of result dicts, best match first
+    """
+    match = build_match_query(user_query)
+    if not match:
+        return []
+
+    rank_weight = min(max(rank_weight, 0.0), 1.0)
+
+    # When blending, pull a wider BM25 candidate set so highly ranked papers
+    # slightly further down the text ranking can still surface.
+    candidates = limit * 5 if rank_weight > 0 else limit
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"""
+            SELECT p.id, p.title, p.published_date, p.rank_score, p.user_rank_override,
+                   bm25(papers_fts, {weights}) AS bm25_score,
+                   snippet(papers_fts, -1, '<mark>', '</mark>', '…', 24) AS snippet
+            FROM papers_fts
+            JOIN papers p ON p.id = papers_fts.paper_id
+            WHERE papers_fts MATCH :match
+            ORDER BY bm25_score
+            LIMIT :candidates
+        """), {'match': match, 'candidates': candidates}).mappings().all()
+
+    if not rows:
+        return []
+
+    # bm25() is lower-is-better; flip and normalize against the best hit
+    best = max(-row['bm25_score'] for row in rows) or 1.0
+
+    results = []
+    for row in rows:
+        text_score = -row['bm25_score'] / best
+        rank = row['user_rank_override'] if row['user_rank_override'] is not None else row['rank_score']
+        score = (1 - rank_weight) * text_score + rank_weight * min((rank or 0.0) / 10.0, 1.0)
+
+        results.append({
+            'id': row['id'],
+            'title': row['title'],
+            'snippet': row['snippet'],
+            'published_date': str(row['published_date'])[:10],
+            'rank_score': row['rank_score'],
+            'text_score': round(text_score, 4),
+            'score': round(score, 4)
+        })
+
+    results.sort(key=lambda r: r['score'], reverse=True)
+    return results[:limit]
+
+def rebuild_search_index():
+    """
+    Rebuild the full-text index from scratch.
+
+    Triggers keep the index current for new writes; this is for databases
+    that existed before search was added, or after bulk edits made outside
+    the application.
+
+    Returns:
+        int: Number of papers indexed
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM papers_fts"))
+        conn.execute(text("INSERT OR IGNORE INTO papers_fts_docs (paper_id) SELECT id FROM papers"))
+        conn.execute(text("DELETE FROM papers_fts_docs WHERE paper_id NOT IN (SELECT id FROM papers)"))
+        conn.execute(text(SEARCH_INDEX_SQL))
+        conn.execute(text("INSERT INTO papers_fts (papers_fts) VALUES ('optimize')"))
+        count = conn.execute(text("SELECT COUNT(*) FROM papers_fts")).scalar()
+
+    print(f"Indexed {count} papers for full-text search.")
+    return count
@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from sqlalchemy import insert
+from app.config import SUMMARY_LEASE_SECONDS
+from app.database import session_scope, SummaryLease
+
+# Coalesces concurrent generation of the same summary, keyed by
+# (paper ID, summary type, prompt hash). Within a process later callers wait
+# on the first caller's future; across processes the first caller holds a
+# lease row and the others poll until it is released, then read the store.
+# A heartbeat thread keeps the leases this process holds from expiring, so
+# only a process that died leaves a lease to run out.
+
+LEASE_POLL_SECONDS = 0.5
+LEASE_RENEW_SECONDS = SUMMARY_LEASE_SECONDS / 3
+
+_flights = {}
+_flights_lock = threading.Lock()
+_process_token = uuid.uuid4().hex[:8]
+
+_held = set()
+_held_lock = threading.Lock()
+_heartbeat = {'pid': None}
+
+class SummaryAbandonedError(Exception):
+    """Raised to callers waiting on a generation that stopped without a result."""
+
+class _NotLed(Exception):
+    """Set on a flight whose caller lost the lease to another process; joiners start over."""
+
+def _owner():
+    # The pid is read at call time so processes forked after import differ
+    return f"{os.getpid()}-{_process_token}"
+
+def _lease_filter(query, key):
+    paper_id, summary_type, prompt_hash = key
+    return query.filter(
+        SummaryLease.paper_id == paper_id,
+        SummaryLease.summary_type == summary_type,
+        SummaryLease.prompt_hash == prompt_hash
+    )
+
+def _acquire_lease(key):
+    paper_id, summary_type, prompt_hash = key
+    now = datetime.utcnow()
+
+    with session_scope() as session:
+        # A lease past its expiry belongs to a caller that died mid-generation
+        _lease_filter(session.query(SummaryLease), key).filter(
+            SummaryLease.expires_date < now
+        ).delete(synchronize_session=False)
+
+        inserted = session.execute(insert(SummaryLease).prefix_with('OR IGNORE').values(
+            paper_id=paper_id,
+            summary_type=summary_type,
+            prompt_hash=prompt_hash,
+            owner=_owner(),
+            expires_date=now + timedelta(seconds=SUMMARY_LEASE_SECONDS)
+        )).rowcount
+
+    if inserted != 1:
+        return False
+
+    with _held_lock:
+        _held.add(key)
+        # Threads don't survive a fork, so each process starts its own
+        if _heartbeat['pid'] != os.getpid():
+            _heartbeat['pid'] = os.getpid()
+            threading.Thread(target=_renew_leases, name='summary-lease-heartbeat', daemon=True).start()
+    return True
+
+def _release_lease(key):
+    with _held_lock:
+        _held.discard(key)
+
+    with session_scope() as session:
+        _lease_filter(session.query(SummaryLease), key).filter(
+            SummaryLease.owner == _owner()
+        ).delete(synchronize_session=False)
+
+def _renew_leases():
+    """Push back the expiry of every lease this process holds, for as long as it runs."""
+    while True:
+        time.sleep(LEASE_RENEW_SECONDS)
+        with _held_lock:
+            keys = list(_held)
+        if not keys:
+            continue
+
+        try:
+            expires = datetime.utcnow() + timedelta(seconds=SUMMARY_LEASE_SECONDS)
+            with session_scope() as session:
+                for key in keys:
+                    _lease_filter(session.query(SummaryLease), key).filter(
+                        SummaryLease.owner == _owner()
+                    ).update({SummaryLease.expires_date: expires}, synchronize_session=False)
+        except Exception as e:
+            # Try again next beat; a lease has several beats before it expires
+            print(f"Error renewing summary leases: {e}")
+
+def _lease_held(key):
+    with session_scope() as session:
+        return _lease_filter(session.query(SummaryLease.owner), key).filter(
+            SummaryLease.expires_date >= datetime.utcnow()
+        ).first() is not None
+
+def _join(key):
+    """Return (future, True) for the first caller of a key, (existing future, False) for the rest."""
+    with _flights_lock:
+        future = _flights.get(key)
+        if future is not None:
+            return future, False
+
+        future = _flights[key] = Future()
+        return future, True
+
+def _wait_for_other_process(key, lookup):
+    """Wait for another process's lease to go away; returns what it stored, or None."""
+    while _lease_held(key):
+        time.sleep(LEASE_POLL_SECONDS)
+    return lookup()
+
+def finish(key, future, result=None, error=None):
+    """
+    Release a key taken with try_lead and hand the outcome to waiting callers.
+
+    Args:
+        key: (paper ID, summary type, prompt hash)
+        future: Future returned by try_lead
+        result: Generated summary, if it succeeded
+        error: Exception, if it failed
+    """
+    try:
+        _release_lease(key)
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            elif result is not None:
+                future.set_result(result)
+            else:
+                future.set_exception(SummaryAbandonedError(f"Generation of {key} stopped without a result"))
+
+def try_lead(key):
+    """
+    Claim a key without waiting, for work that can simply skip it.
+
+    Returns:
+        Future: To be passed to finish() once the summary is generated, or
+                None if another caller is already generating it
+    """
+    future, leader = _join(key)
+    if not leader:
+        return None
+
+    # The database round trip happens outside _flights_lock, so callers of
+    # other keys aren't held up behind it
+    try:
+        leased = _acquire_lease(key)
+    except Exception as e:
+        _abandon(key, future, e)
+        raise
+
+    if not leased:
+        _abandon(key, future, _NotLed())
+        return None
+    return future
+
+def _abandon(key, future, error):
+    with _flights_lock:
+        _flights.pop(key, None)
+    future.set_exception(error)
+
+def run(key, compute, lookup):
+    """
+    Generate a summary once, however many callers ask for it at the same time.
+
+    Args:
+        key: (paper ID, summary type, prompt hash)
+        compute: Generates and saves the summary, returning it
+        lookup: Returns the stored summary for the key, or None
+
+    Returns:
+        tuple: (summary, True if another caller generated it)
+    """
+    while True:
+        future, leader = _join(key)
+        if leader:
+            break
+        try:
+            return future.result(), True
+        except _NotLed:
+            continue
+
+    result, error = None, None
+    try:
+        while True:
+            if _acquire_lease(key):
+                result = compute()
+                return result, False
+
+            result = _wait_for_other_process(key, lookup)
+            if result is not None:
+                return result, True
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        finish(key, future, result, error)
+
+def stream(key, generate, lookup):
+    """
+    Streaming version of run.
+
+    The first caller yields generate()'s text chunks as they arrive, and runs
+    it to the end even if its reader stops early; callers that joined it
+    receive the whole summary as a single chunk when it is done.
+
+    Args:
+        key: (paper ID, summary type, prompt hash)
+        generate: Generator of text chunks that saves the summary at the end
+        lookup: Returns the stored summary for the key, or None
+
+    Yields:
+        str: Summary text
+    """
+    while True:
+        future, leader = _join(key)
+        if leader:
+            break
+        try:
+            result = future.result()
+        except _NotLed:
+            continue
+        yield result
+        return
+
+    result, error = None, None
+    try:
+        while True:
+            if _acquire_lease(key):
+                parts = []
+                chunks = generate()
+                try:
+                    for chunk in chunks:
+                        parts.append(chunk)
+                        yield chunk
+                except GeneratorExit:
+                    # The reader went away; finish anyway so callers waiting on this key still get it
+                    parts.extend(chunks)
+                    result = ''.join(parts)
+                    raise
+                result = ''.join(parts)
+                return
+
+            result = _wait_for_other_process(key, lookup)
+            if result is not None:
+                yield result
+                return
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        finish(key, future, result, error)
@@ -0,0 +1,93 @@
+from sqlalchemy import func, case
+from app.database import get_session, session_scope, Paper, PaperStat, DailyIngestStat
+from app.config import HIGH_RANK_THRESHOLD
+
+def get_paper_stats(days=30):
+    """
+    Read the materialized paper counters.
+
+    The counters are kept up to date by triggers on the papers table, so this
+    is a handful of primary-key lookups regardless of how many papers exist.
+
+    Args:
+        days: Number of most recent ingest days to include
+
+    Returns:
+        dict: Paper statistics, including a 'version' usable as an ETag
+    """
+    session = get_session()
+
+    counters = {stat.name: stat.value for stat in session.query(PaperStat).all()}
+    daily = session.query(DailyIngestStat).filter(DailyIngestStat.count > 0) \
+        .order_by(DailyIngestStat.day.desc()).limit(days).all()
+
+    session.close()
+
+    total_papers = counters.get('total', 0)
+    papers_with_summaries = counters.get('summarized', 0)
+
+    return {
+        'total_papers': total_papers,
+        'papers_with_summaries': papers_with_summaries,
+        'papers_without_summaries': total_papers - papers_with_summaries,
+        'high_rank_papers': counters.get('high_rank', 0),
+        'daily_ingest': {row.day: row.count for row in daily},
+        'version': counters.get('version', 0)
+    }
+
+def reconcile_stats():
+    """
+    Recount all paper statistics from the papers table and overwrite the counters.
+
+    Triggers keep the counters exact, but this corrects any drift from writes
+    that bypassed them (manual edits, restored backups, older databases).
+
+    Returns:
+        dict: The corrected counters
+    """
+    with session_scope() as session:
+        total, summarized, high_rank = session.query(
+            func.count(Paper.id),
+            func.count(Paper.summary),
+            func.coalesce(func.sum(case((Paper.rank_score >= HIGH_RANK_THRESHOLD, 1), else_=0)), 0)
+        ).one()
+
+        counts = {'total': total, 'summarized': summarized, 'high_rank': high_rank}
+        changed = False
+
+        for name, value in counts.items():
+            stat = session.get(PaperStat, name)
+            if stat is None:
+                stat = PaperStat(name=name, value=0)
+                session.add(stat)
+            if stat.value != value:
+                stat.value = value
+                changed = True
+
+        day = func.date(Paper.fetched_date)
+        daily_counts = dict(session.query(day, func.count(Paper.id)).group_by(day).all())
+
+        for row in session.query(DailyIngestStat).all():
+            expected = daily_counts.pop(row.day, 0)
+            if row.count != expected:
+                row.count = expected
+                changed = True
+
+        for missing_day, count in daily_counts.items():
+            if missing_day is None:
+                continue
+            session.add(DailyIngestStat(day=missing_day, count=count))
+            changed = True
+
+        # Only invalidate cached responses if something actually drifted
+        if changed:
+            version = session.get(PaperStat, 'version')
+            if version is None:
+                session.add(PaperStat(name='version', value=1))
+            else:
+                version.value += 1
+
+    if changed:
+        print(f"Reconciled paper stats: {counts}")
+
+    return counts
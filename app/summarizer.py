@@ -1,6 +1,25 @@
+import hashlib
+import json
+import re
+from datetime import datetime, timedelta
+from concurrent.futures import wait, as_completed, FIRST_COMPLETED
 import anthropic
-from app.config import ANTHROPIC_API_KEY
-from app.database import get_session, Paper
+from app.config import (
+    SUMMARY_CONCURRENCY, BATCH_SUMMARY_LIMIT,
+    SUMMARY_RETRY_LIMIT, SUMMARY_RETRY_CONCURRENCY, SUMMARY_RUN_STALE_MINUTES, HIGH_RANK_THRESHOLD,
+    HIGHLIGHTS_MAX_MERGES, HIGHLIGHTS_HISTORY, SUMMARY_PACK_SIZE, SUMMARY_BATCH_LIMIT
+)
+from sqlalchemy import or_
+from app.database import (
+    session_scope, Paper, PaperSummary, SummaryBatch, SummaryRun, FavoritePaper, HighlightSummary
+)
+from app.dedup import duplicate_paper_ids
+from app import journal, singleflight, deep_summary
+from app.retries import (
+    record_failure, clear_failure, is_permanent, attempted_paper_ids, due_retry_types, due_retry_ids
+)
+from app import llm
+from app.work_queue import summary_queue, PRIORITY_INTERACTIVE, PRIORITY_IMPORTANT, PRIORITY_BACKLOG
 
 SUMMARY_TYPES = {
     'general': {
@@ -77,10 +96,14 @@ Use LaTeX notation for any mathematical expressions or technical formulas."""
     }
 }
 
-def generate_summary(title, abstract, authors_list, summary_type='general', use_learning=True):
+def build_summary_prompt(title, abstract, authors_list, summary_type='general', use_learning=True):
     """
-    Generate a summary of a paper using Claude API.
-    Optionally incorporates user feedback to improve summaries.
+    Build the Claude prompt for a paper summary.
+
+    The prompt is split in two: a system prefix holding everything that is
+    the same for every paper of a summary type (instructions and learned
+    preferences), which is sent as a prompt-cache prefix, and the
+    paper-specific user message.
 
     Args:
         title: Paper title
@@ -90,26 +113,15 @@ def generate_summary(title, abstract, authors_list, summary_type='general', use_
         use_learning: Whether to use learned preferences from user feedback
 
     Returns:
-        str: Generated summary
+        tuple: (system prefix, user prompt)
     """
-    if not ANTHROPIC_API_KEY:
-        return "Summary generation unavailable: No API key configured."
-
-    client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
-
     # Get summary type prompt
     type_config = SUMMARY_TYPES.get(summary_type, SUMMARY_TYPES['general'])
 
-    # Base prompt
-    prompt = f"""Please provide a summary of this AI alignment research paper.
+    # Shared prefix
+    system = f"""You will be given an AI alignment research paper. Please provide a summary of it.
 
-{type_config['prompt']}
-
-Paper Title: {title}
-
-Authors: {', '.join(authors_list)}
-
-Abstract: {abstract}"""
+{type_config['prompt']}"""
 
     # Add learned preferences if enabled
     if use_learning:
@@ -117,64 +129,1221 @@ Abstract: {abstract}"""
             from app.learning import generate_summary_prompt_enhancements
             enhancements = generate_summary_prompt_enhancements()
             if enhancements:
-                prompt += f"\n\n{enhancements}"
+                system += f"\n\n{enhancements}"
         except Exception as e:
             print(f"Could not apply learning enhancements: {e}")
 
-    try:
-        message = client.messages.create(
-            model="claude-3-5-sonnet-20241022",
-            max_tokens=1024,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
+    # Per-paper content
+    prompt = f"""Paper Title: {title}
+
+Authors: {', '.join(authors_list)}
+
+Abstract: {abstract}"""
+
+    return system, prompt
+
+def build_deep_summary_prompt(title, abstract, authors_list, section_summaries, summary_type='general'):
+    """
+    Build the reduce prompt of a deep summary from summaries of the full text.
+
+    The system prefix is the same as build_summary_prompt's, so the summary
+    type's instructions and its prompt cache are shared.
+
+    Args:
+        title: Paper title
+        abstract: Paper abstract
+        authors_list: List of author names
+        section_summaries: Summaries of the paper's text chunks, in order
+        summary_type: Type of summary to generate
+
+    Returns:
+        tuple: (system prefix, user prompt)
+    """
+    system, prompt = build_summary_prompt(title, abstract, authors_list, summary_type)
+
+    sections = "\n\n".join(
+        f"[Section {i}] {section}" for i, section in enumerate(section_summaries, 1)
+    )
+    prompt += f"""
+
+Full text, summarized section by section:
+
+{sections}"""
+
+    return system, prompt
+
+def deep_summary_type(summary_type):
+    """Store key for deep summaries, kept apart from the abstract-based summary of the same type."""
+    return f'deep:{summary_type}'
+
+def summary_label(summary_type, deep=False):
+    """Route and metrics label of the call that writes a summary of this type."""
+    return f'deep:summary:{summary_type}' if deep else f'summary:{summary_type}'
+
+def summary_cache_key(system, prompt, summary_type='general', model=None, deep=False):
+    """
+    Content-addressed key for a stored summary.
+
+    Args:
+        system: Instruction prefix from build_summary_prompt
+        prompt: Paper-specific prompt from build_summary_prompt
+        summary_type: Type of summary, whose route sets the model and token limit
+        model: Model that generated the summary, if not the route's (i.e.
+               after a fallback)
+        deep: Whether it is a deep summary, which has its own route
+
+    Returns:
+        tuple: (prompt hash covering model, token limit and instructions,
+                content hash covering the paper text)
+    """
+    route = llm.route_settings(summary_label(summary_type, deep))
+    model = model or route['model']
+    prompt_hash = hashlib.sha256(f"{model}\n{route['max_tokens']}\n{system}".encode('utf-8')).hexdigest()[:16]
+    content_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    return prompt_hash, content_hash
+
+def get_stored_summary(session, paper_id, summary_type, key):
+    """Return the stored summary for this exact prompt and paper version, or None."""
+    prompt_hash, content_hash = key
+    stored = session.get(PaperSummary, (paper_id, summary_type, prompt_hash, content_hash))
+    return stored.summary if stored else None
+
+def store_summary(session, paper_id, summary_type, key, summary):
+    """
+    Save a summary under its key, dropping entries of the same type made from
+    an older prompt, model or paper version. The caller commits.
+    """
+    prompt_hash, content_hash = key
+
+    session.query(PaperSummary).filter(
+        PaperSummary.paper_id == paper_id,
+        PaperSummary.summary_type == summary_type,
+        or_(PaperSummary.prompt_hash != prompt_hash, PaperSummary.content_hash != content_hash)
+    ).delete(synchronize_session=False)
+
+    session.merge(PaperSummary(
+        paper_id=paper_id,
+        summary_type=summary_type,
+        prompt_hash=prompt_hash,
+        content_hash=content_hash,
+        summary=summary
+    ))
+
+def _prepare_summary(paper_id, summary_type, force, deep=False):
+    """
+    Build the prompt and key for a paper's summary, serving it from the store if present.
+
+    For a deep summary this runs the map phase over the PDF's text first.
+
+    Returns:
+        tuple: (system, prompt, key, stored summary or None, store type), or
+               None if the paper doesn't exist
+    """
+    with session_scope() as session:
+        paper = session.get(Paper, paper_id)
+        if not paper:
+            return None
+
+        title, abstract, authors, pdf_url = paper.title, paper.abstract, json.loads(paper.authors), paper.pdf_url
+
+    if deep:
+        section_summaries = deep_summary.summarize_full_text(paper_id, pdf_url, title)
+        system, prompt = build_deep_summary_prompt(title, abstract, authors, section_summaries, summary_type)
+        store_type = deep_summary_type(summary_type)
+    else:
+        system, prompt = build_summary_prompt(title, abstract, authors, summary_type)
+        store_type = summary_type
+
+    key = summary_cache_key(system, prompt, summary_type, deep=deep)
+
+    with session_scope() as session:
+        stored = None if force else get_stored_summary(session, paper_id, store_type, key)
+        if stored:
+            session.get(Paper, paper_id).summary = stored
+
+    return system, prompt, key, stored, store_type
+
+def _lookup_summary(paper_id, summary_type, key):
+    with session_scope() as session:
+        return get_stored_summary(session, paper_id, summary_type, key)
+
+def _journal_entry(paper_id, summary_type, key, summary):
+    return {'paper_id': paper_id, 'summary_type': summary_type, 'key': list(key), 'summary': summary}
+
+def _apply_journal_entries(entries):
+    """Write journaled summaries that may not have reached the database."""
+    with session_scope() as session:
+        for entry in entries:
+            paper = session.get(Paper, entry['paper_id'])
+            if not paper:
+                continue
+
+            if entry.get('kind') == 'highlights':
+                save_highlights_summary(session, entry['paper_id'], entry['plan'], entry['summary'], entry['model'], display=False)
+                continue
+
+            store_summary(session, entry['paper_id'], entry['summary_type'], tuple(entry['key']), entry['summary'])
+            # Never overwrite a summary written since
+            if not paper.summary:
+                paper.summary = entry['summary']
+            clear_failure(session, entry['paper_id'], entry['summary_type'])
+
+def replay_summary_journal():
+    """
+    Recover summaries that were generated but not saved before a crash.
+
+    Returns:
+        int: Number of journal entries replayed
+    """
+    replayed = journal.replay(_apply_journal_entries)
+    if replayed:
+        print(f"Replayed {replayed} journaled summaries.")
+    return replayed
+
+def _generated_key(key, system, prompt, summary_type, model, deep=False):
+    """
+    The key to store a generated summary under. A call that fell back to
+    another model is keyed on that model, so requests for the route's own
+    model don't get served the fallback's output.
+    """
+    if model == llm.route_settings(summary_label(summary_type, deep))['model']:
+        return key
+    return summary_cache_key(system, prompt, summary_type, model, deep)
+
+def _save_generated_summary(paper_id, summary_type, key, summary):
+    journal.append(_journal_entry(paper_id, summary_type, key, summary))
+
+    with session_scope() as session:
+        store_summary(session, paper_id, summary_type, key, summary)
+        session.get(Paper, paper_id).summary = summary
+
+def get_or_generate_summary(paper_id, summary_type='general', force=False, deep=False):
+    """
+    Get a paper's summary of the given type, calling Claude only if no summary
+    exists for the current prompt, model and paper text.
+
+    The result also becomes the paper's displayed summary. Generation runs on
+    the shared summary queue at interactive priority, ahead of bulk work.
+    Callers asking for the same summary while it is being generated, in this
+    or another process, wait for that call instead of making their own.
+
+    Args:
+        paper_id: arXiv ID
+        summary_type: Type of summary (key of SUMMARY_TYPES)
+        force: Regenerate even if a stored summary exists
+        deep: Summarize the full text of the PDF (map-reduce over chunks)
+              rather than the abstract
+
+    Returns:
+        tuple: (summary, True if served from the store or generated by another
+               caller), or (None, False) if the paper doesn't exist
+
+    Raises:
+        llm.LLMUnavailableError: If generation is needed and no API key is configured
+        anthropic.APIError: If the Claude call fails
+        ValueError: If a deep summary is requested and the PDF has no usable text
+        deep_summary.PdfUnavailableError: If a deep summary is requested and
+                                          the PDF can't be downloaded
+    """
+    prepared = _prepare_summary(paper_id, summary_type, force, deep)
+    if not prepared:
+        return None, False
+
+    system, prompt, key, stored, store_type = prepared
+    if stored:
+        return stored, True
+
+    def generate():
+        # Another caller may have finished it since _prepare_summary looked
+        stored = None if force else _lookup_summary(paper_id, store_type, key)
+        if stored:
+            return stored
+
+        summary, model = summary_queue.submit(
+            llm.complete, prompt, label=summary_label(summary_type, deep), system=system, with_model=True,
+            priority=PRIORITY_INTERACTIVE
+        ).result()
+        _save_generated_summary(paper_id, store_type, _generated_key(key, system, prompt, summary_type, model, deep), summary)
+        return summary
+
+    return singleflight.run(
+        (paper_id, store_type, key[0]), generate, lambda: _lookup_summary(paper_id, store_type, key)
+    )
+
+def generate_deep_summary(paper_id, summary_type='general', force=False):
+    """
+    Job handler for deep summaries, which take too long to run inside a request.
+
+    Returns:
+        dict: 'summary' and 'cached', as from get_or_generate_summary
+
+    Raises:
+        ValueError: If the paper doesn't exist or its PDF has no usable text
+    """
+    summary, cached = get_or_generate_summary(paper_id, summary_type, force=force, deep=True)
+    if summary is None:
+        raise ValueError(f"Paper not found: {paper_id}")
+    return {'summary': summary, 'cached': cached}
+
+def stream_summary(paper_id, summary_type='general', force=False):
+    """
+    Streaming version of get_or_generate_summary.
+
+    Generation runs on the shared summary queue at interactive priority and
+    the summary is saved once the last chunk has been generated, even if the
+    consumer stops reading early (e.g. the browser disconnects). Callers that
+    join a generation already in progress get the whole summary as one chunk.
+
+    Returns:
+        tuple: (iterator of text chunks, True if served from the store), or
+               (None, False) if the paper doesn't exist
+    """
+    prepared = _prepare_summary(paper_id, summary_type, force)
+    if not prepared:
+        return None, False
+
+    system, prompt, key, stored, _ = prepared
+    if stored:
+        return iter([stored]), True
+
+    def chunks():
+        parts = []
+        model = yield from llm.collect(llm.stream(prompt, label=f'summary:{summary_type}', system=system), parts)
+        _save_generated_summary(paper_id, summary_type, _generated_key(key, system, prompt, summary_type, model), ''.join(parts))
+
+    return singleflight.stream(
+        (paper_id, summary_type, key[0]),
+        lambda: summary_queue.stream(chunks, priority=PRIORITY_INTERACTIVE),
+        lambda: _lookup_summary(paper_id, summary_type, key)
+    ), False
+
+def build_highlights_prompt(title, abstract, authors_list, highlights):
+    """
+    Build the Claude prompt for a summary focused on a user's highlights.
+
+    Args:
+        title: Paper title
+        abstract: Paper abstract
+        authors_list: List of author names
+        highlights: List of (page number, highlighted text) tuples
+
+    Returns:
+        tuple: (system prefix, user prompt)
+    """
+    system = """Generate a comprehensive summary of an AI alignment research paper based on the user's highlighted passages.
+
+Please provide a detailed summary that:
+1. Focuses on the concepts and findings from the highlighted passages
+2. Maintains the technical depth appropriate for researchers
+3. Uses LaTeX notation for mathematical expressions (inline: $...$, display: $$...$$)
+4. Explains how the highlighted sections relate to the overall contribution
+5. Provides context for why these passages are significant
+
+Write the summary in a clear, well-structured format."""
+
+    # Combine highlights into context
+    highlighted_text = "\n\n".join([
+        f"[Page {page_number}] {text}"
+        for page_number, text in highlights
+    ])
+
+    prompt = f"""Paper Title: {title}
+Authors: {', '.join(authors_list)}
+
+Abstract: {abstract}
+
+User's Highlighted Passages:
+{highlighted_text}"""
+
+    return system, prompt
+
+def build_highlights_merge_prompt(title, previous_summary, new_highlights):
+    """
+    Build the Claude prompt that folds newly highlighted passages into an
+    existing highlights summary.
+
+    Args:
+        title: Paper title
+        previous_summary: Summary of the earlier highlights
+        new_highlights: List of (page number, highlighted text) tuples added since
+
+    Returns:
+        tuple: (system prefix, user prompt)
+    """
+    system = """You will be given a summary of an AI alignment research paper that was written from the user's highlighted passages, followed by passages the user has highlighted since.
+
+Rewrite the summary so that it also covers the new passages:
+1. Keep everything in the existing summary that is still accurate, along with its structure
+2. Work the concepts and findings of the new passages into the relevant parts, adding sections if needed
+3. Explain how the new passages relate to the rest of the paper's contribution
+4. Use LaTeX notation for mathematical expressions (inline: $...$, display: $$...$$)
+
+Reply with the complete updated summary only."""
+
+    passages = "\n\n".join(f"[Page {page_number}] {text}" for page_number, text in new_highlights)
+
+    prompt = f"""Paper Title: {title}
+
+Current Summary:
+{previous_summary}
+
+New Highlighted Passages:
+{passages}"""
+
+    return system, prompt
+
+def _highlights_hash(highlights):
+    return hashlib.sha256(json.dumps(
+        [(h.id, h.page_number, h.highlight_text) for h in highlights]
+    ).encode('utf-8')).hexdigest()[:16]
+
+def plan_highlights_summary(session, paper, highlights):
+    """
+    Work out the cheapest way to produce a paper's highlights summary.
+
+    Highlights are taken in the order they were made. If a summary of exactly
+    this set is cached it is reused. If a cached summary covers an earlier
+    state of the set, and highlights were only added since, just the new
+    passages are sent and merged into it. Otherwise the summary is generated
+    from all highlights. After HIGHLIGHTS_MAX_MERGES merges in a row the next
+    summary is generated in full, so repeated merges can't drift.
+
+    Args:
+        session: Database session
+        paper: Paper row
+        highlights: The paper's PaperHighlight rows
+
+    Returns:
+        dict: 'mode' ('cached', 'merge' or 'full'), 'summary' (when cached),
+              'system', 'prompt' and 'label' of the call to make, 'new_highlights'
+              (number of passages sent), and the cache fields save_highlights_summary needs
+    """
+    highlights = sorted(highlights, key=lambda h: h.id)
+    system, prompt = build_highlights_prompt(
+        paper.title, paper.abstract, json.loads(paper.authors),
+        sorted((h.page_number, h.highlight_text) for h in highlights)
+    )
+
+    route = llm.route_settings('highlights')
+    prompt_hash = hashlib.sha256(f"{route['model']}\n{route['max_tokens']}\n{system}".encode('utf-8')).hexdigest()[:16]
+    highlights_hash = _highlights_hash(highlights)
+
+    plan = {
+        'mode': 'full',
+        'system': system,
+        'prompt': prompt,
+        'label': 'highlights',
+        'new_highlights': len(highlights),
+        'prompt_hash': prompt_hash,
+        'highlights_hash': highlights_hash,
+        'highlight_count': len(highlights),
+        'merges': 0
+    }
+
+    cached = session.query(HighlightSummary).filter_by(
+        paper_id=paper.id, prompt_hash=prompt_hash
+    ).order_by(HighlightSummary.highlight_count.desc()).all()
+
+    for entry in cached:
+        if entry.highlights_hash == highlights_hash:
+            plan.update(mode='cached', summary=entry.summary, new_highlights=0)
+            return plan
+
+    # Only the most complete earlier state is merged into; once it has used
+    # up its merges, the summary is regenerated in full
+    for entry in cached:
+        if (entry.highlight_count < len(highlights)
+                and _highlights_hash(highlights[:entry.highlight_count]) == entry.highlights_hash):
+            if entry.merges >= HIGHLIGHTS_MAX_MERGES:
+                break
+
+            added = highlights[entry.highlight_count:]
+            merge_system, merge_prompt = build_highlights_merge_prompt(
+                paper.title, entry.summary,
+                sorted((h.page_number, h.highlight_text) for h in added)
+            )
+            plan.update(
+                mode='merge', system=merge_system, prompt=merge_prompt, label='highlights:merge',
+                new_highlights=len(added), merges=entry.merges + 1
+            )
+            break
+
+    return plan
+
+def save_highlights_summary(session, paper_id, plan, summary, model=None, display=True):
+    """
+    Cache a generated highlights summary and make it the paper's displayed
+    summary, keeping the HIGHLIGHTS_HISTORY most recent entries. The caller commits.
+
+    A summary from a fallback model (model differs from the plan's route) is
+    only displayed: the cache is keyed on the route's model, and the next
+    request should get that model's summary. With display=False the paper's
+    summary is only set if it has none.
+    """
+    paper = session.get(Paper, paper_id)
+    if display or not paper.summary:
+        paper.summary = summary
+
+    if model and model != llm.route_settings(plan['label'])['model']:
+        return
+
+    session.merge(HighlightSummary(
+        paper_id=paper_id,
+        highlights_hash=plan['highlights_hash'],
+        prompt_hash=plan['prompt_hash'],
+        highlight_count=plan['highlight_count'],
+        merges=plan['merges'],
+        summary=summary,
+        created_date=datetime.utcnow()
+    ))
+    session.flush()
+
+    keep = [
+        highlights_hash for (highlights_hash,) in session.query(HighlightSummary.highlights_hash).filter(
+            HighlightSummary.paper_id == paper_id,
+            HighlightSummary.prompt_hash == plan['prompt_hash']
+        ).order_by(HighlightSummary.created_date.desc()).limit(HIGHLIGHTS_HISTORY)
+    ]
+    session.query(HighlightSummary).filter(
+        HighlightSummary.paper_id == paper_id,
+        HighlightSummary.highlights_hash.notin_(keep)
+    ).delete(synchronize_session=False)
+
+# Fields of a highlights plan that save_highlights_summary needs, as journaled
+HIGHLIGHTS_PLAN_FIELDS = ('label', 'prompt_hash', 'highlights_hash', 'highlight_count', 'merges')
+
+def _highlights_flight_key(paper_id, plan):
+    return paper_id, 'highlights', f"{plan['prompt_hash']}:{plan['highlights_hash']}"
+
+def _lookup_highlights_summary(paper_id, plan):
+    with session_scope() as session:
+        stored = session.get(HighlightSummary, (paper_id, plan['highlights_hash']))
+        return stored.summary if stored and stored.prompt_hash == plan['prompt_hash'] else None
+
+def _save_highlights_result(paper_id, plan, summary, model):
+    journal.append({
+        'kind': 'highlights',
+        'paper_id': paper_id,
+        'plan': {field: plan[field] for field in HIGHLIGHTS_PLAN_FIELDS},
+        'summary': summary,
+        'model': model
+    })
+
+    with session_scope() as session:
+        save_highlights_summary(session, paper_id, plan, summary, model)
+
+def generate_highlights_summary(paper_id, plan):
+    """
+    Make the Claude call a plan from plan_highlights_summary asks for, and save the result.
+
+    Like get_or_generate_summary, the call runs at interactive priority,
+    concurrent requests for the same highlight set share it, and the result
+    is journaled before it is saved.
+
+    Returns:
+        str: Summary
+    """
+    def generate():
+        summary, model = summary_queue.submit(
+            llm.complete, plan['prompt'], label=plan['label'], system=plan['system'], with_model=True,
+            priority=PRIORITY_INTERACTIVE
+        ).result()
+        _save_highlights_result(paper_id, plan, summary, model)
+        return summary
+
+    summary, _ = singleflight.run(
+        _highlights_flight_key(paper_id, plan), generate, lambda: _lookup_highlights_summary(paper_id, plan)
+    )
+    return summary
+
+def stream_highlights_summary(paper_id, plan):
+    """
+    Streaming version of generate_highlights_summary.
+
+    Yields:
+        str: Summary text
+    """
+    def chunks():
+        parts = []
+        model = yield from llm.collect(llm.stream(plan['prompt'], label=plan['label'], system=plan['system']), parts)
+        _save_highlights_result(paper_id, plan, ''.join(parts), model)
+
+    return singleflight.stream(
+        _highlights_flight_key(paper_id, plan),
+        lambda: summary_queue.stream(chunks, priority=PRIORITY_INTERACTIVE),
+        lambda: _lookup_highlights_summary(paper_id, plan)
+    )
+
+def _resume_interrupted_runs(session):
+    """
+    Take over runs whose process stopped reporting progress.
+
+    Returns:
+        list: IDs of their papers that are still unsummarized, in planned order
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=SUMMARY_RUN_STALE_MINUTES)
+    paper_ids = []
+
+    for run in session.query(SummaryRun).filter(SummaryRun.status == 'running', SummaryRun.updated_date < cutoff):
+        paper_ids.extend(json.loads(run.paper_ids))
+        run.status = 'resumed'
+
+    if not paper_ids:
+        return []
+
+    remaining = {
+        paper_id for (paper_id,) in session.query(Paper.id).filter(
+            Paper.id.in_(paper_ids),
+            Paper.summary.is_(None),
+            Paper.id.notin_(attempted_paper_ids(session))
         )
+    }
+    resumed = [paper_id for paper_id in dict.fromkeys(paper_ids) if paper_id in remaining]
+
+    if resumed:
+        print(f"Resuming {len(resumed)} papers from interrupted summarization runs.")
+    return resumed
 
-        return message.content[0].text
+def _record_result(run_id, paper_id, key, summary=None, error=None):
+    """Persist one paper's outcome and the run's progress in a short transaction."""
+    with session_scope() as session:
+        if error is None:
+            paper = session.get(Paper, paper_id)
+            paper.summary = summary
+            store_summary(session, paper_id, 'general', key, summary)
+            clear_failure(session, paper_id)
+        else:
+            attempt = record_failure(session, paper_id, type(error).__name__, str(error), is_permanent(error))
+            print(f"  Error summarizing {paper_id} (attempt {attempt.attempts}, {attempt.status}): {error}")
 
-    except Exception as e:
-        print(f"Error generating summary: {e}")
-        return f"Error generating summary: {str(e)}"
+        run = session.get(SummaryRun, run_id)
+        if error is None:
+            run.completed += 1
+        else:
+            run.failed += 1
+        run.updated_date = datetime.utcnow()
 
-def summarize_papers(paper_ids=None, limit=10):
+def summarize_papers(paper_ids=None, limit=10, concurrency=SUMMARY_CONCURRENCY):
     """
     Generate summaries for papers that don't have them yet.
 
+    Claude calls run on the shared summary queue (further limited by the
+    rate-limit-aware limiter): favorites and papers ranked at or above
+    HIGH_RANK_THRESHOLD ahead of the rest of the backlog, and all of it behind
+    on-demand requests. Each summary is fsynced to the
+    summary journal as soon as it arrives and then committed in its own short
+    transaction, so an interrupted run loses none of the summaries it already
+    received; they are replayed from the journal at the start of the next run.
+    Progress is checkpointed in summary_runs, and papers planned by a run that
+    stopped reporting progress are picked up first.
+
+    Summaries are also saved to the per-type store as 'general' summaries.
+    Failed calls are recorded in summary_attempts and retried on a backoff
+    schedule by retry_failed_summaries; such papers are left out of the
+    regular backlog.
+
     Args:
         paper_ids: Optional list of specific paper IDs to summarize
         limit: Maximum number of papers to summarize (if paper_ids not provided)
+        concurrency: Maximum number of this run's summaries queued or running at once
 
     Returns:
         int: Number of papers summarized
     """
-    session = get_session()
+    replay_summary_journal()
 
-    if paper_ids:
-        papers = session.query(Paper).filter(Paper.id.in_(paper_ids)).all()
-    else:
-        # Get papers without summaries, prioritize by rank
-        papers = session.query(Paper).filter(Paper.summary.is_(None)).order_by(Paper.rank_score.desc()).limit(limit).all()
+    if not llm.is_configured():
+        print("Summary generation unavailable: No API key configured.")
+        return 0
+
+    with session_scope() as session:
+        if paper_ids:
+            selected = session.query(Paper).filter(Paper.id.in_(paper_ids)).all()
+        else:
+            resumed = _resume_interrupted_runs(session)[:limit]
+            selected = session.query(Paper).filter(Paper.id.in_(resumed)).all() if resumed else []
+            selected.sort(key=lambda paper: resumed.index(paper.id))
+
+            # Fill up with papers without summaries, prioritized by rank.
+            # Suspected duplicates are skipped; their canonical paper gets the summary.
+            if len(selected) < limit:
+                selected += session.query(Paper).filter(
+                    Paper.summary.is_(None),
+                    Paper.id.notin_(duplicate_paper_ids(session)),
+                    Paper.id.notin_(attempted_paper_ids(session)),
+                    Paper.id.notin_(resumed)
+                ).order_by(Paper.rank_score.desc()).limit(limit - len(selected)).all()
+
+        favorite_ids = {
+            paper_id for (paper_id,) in session.query(FavoritePaper.paper_id).filter(
+                FavoritePaper.paper_id.in_([paper.id for paper in selected])
+            )
+        }
+
+        papers = [
+            (
+                paper.id, paper.title,
+                PRIORITY_IMPORTANT if paper.id in favorite_ids or (paper.rank_score or 0) >= HIGH_RANK_THRESHOLD
+                else PRIORITY_BACKLOG,
+                *build_summary_prompt(paper.title, paper.abstract, json.loads(paper.authors))
+            )
+            for paper in selected
+            if not paper.summary
+        ]
+
+        if papers:
+            run = SummaryRun(paper_ids=json.dumps([paper[0] for paper in papers]))
+            session.add(run)
+            session.flush()
+            run_id = run.id
 
     summarized_count = 0
 
-    for paper in papers:
-        if paper.summary:
-            continue
+    if not papers:
+        print("Generated 0 summaries.")
+        return 0
 
-        print(f"Generating summary for: {paper.title[:60]}...")
+    # A sliding window of the run's papers, most important first, is kept on
+    # the shared queue; requests from other callers with a better priority
+    # take the next free worker ahead of it.
+    pending = sorted(papers, key=lambda paper: paper[2])
+    futures = {}
 
-        import json
-        authors_list = json.loads(paper.authors)
+    def submit_next():
+        while pending:
+            paper_id, title, priority, system, prompt = pending.pop(0)
+            key = summary_cache_key(system, prompt)
 
-        summary = generate_summary(paper.title, paper.abstract, authors_list)
+            # Papers someone is already summarizing are left to them
+            flight_key = (paper_id, 'general', key[0])
+            flight = singleflight.try_lead(flight_key)
+            if flight is None:
+                print(f"Skipping {paper_id}: already being summarized")
+                continue
 
-        paper.summary = summary
-        summarized_count += 1
+            print(f"Generating summary for: {title[:60]}...")
+            future = summary_queue.submit(
+                llm.complete, prompt, label='summary:general', system=system, with_model=True,
+                priority=priority
+            )
+            futures[future] = (paper_id, system, prompt, key, flight_key, flight)
+            return
 
-        print(f"  Summary generated ({len(summary)} chars)")
+    while pending and len(futures) < max(1, concurrency):
+        submit_next()
 
-    session.commit()
-    session.close()
+    while futures:
+        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            paper_id, system, prompt, key, flight_key, flight = futures.pop(future)
+            submit_next()
+
+            try:
+                (summary, model), error = future.result(), None
+                key = _generated_key(key, system, prompt, 'general', model)
+            except Exception as e:
+                summary, error = None, e
+
+            try:
+                if error is None:
+                    # Durable before anything else can go wrong
+                    journal.append(_journal_entry(paper_id, 'general', key, summary))
+
+                _record_result(run_id, paper_id, key, summary=summary, error=error)
+            except Exception as e:
+                print(f"  Could not save result for {paper_id}{' (kept in journal)' if error is None else ''}: {e}")
+                continue
+            finally:
+                singleflight.finish(flight_key, flight, summary, error)
+
+            if error is None:
+                summarized_count += 1
+                print(f"  Summary generated for {paper_id} ({len(summary)} chars)")
+
+    # Compact the journal, re-applying any summary whose save failed above
+    journal.replay(_apply_journal_entries)
+
+    with session_scope() as session:
+        session.get(SummaryRun, run_id).status = 'done'
 
     print(f"Generated {summarized_count} summaries.")
     return summarized_count
+
+def retry_failed_summaries(limit=SUMMARY_RETRY_LIMIT, concurrency=SUMMARY_RETRY_CONCURRENCY):
+    """
+    Retry summaries whose backoff has expired.
+
+    Runs with its own small concurrency budget so a recovering API isn't hit
+    with the whole failed backlog at once. Papers marked 'failed' (permanent
+    errors or out of attempts) are never picked up. General summaries are
+    retried through summarize_papers, other types through summarize_packed.
+
+    Args:
+        limit: Maximum number of papers to retry
+        concurrency: Maximum number of general retries running at once
+
+    Returns:
+        int: Number of summaries generated
+    """
+    retries = {}
+    with session_scope() as session:
+        for summary_type in due_retry_types(session):
+            if limit <= 0:
+                break
+            paper_ids = due_retry_ids(session, limit, summary_type)
+
+            # Papers summarized some other way in the meantime need no retry
+            if summary_type == 'general':
+                done = session.query(Paper.id).filter(Paper.id.in_(paper_ids), Paper.summary.isnot(None))
+            else:
+                done = session.query(PaperSummary.paper_id).filter(
+                    PaperSummary.paper_id.in_(paper_ids), PaperSummary.summary_type == summary_type
+                ).distinct()
+            for (paper_id,) in done:
+                clear_failure(session, paper_id, summary_type)
+                paper_ids.remove(paper_id)
+
+            if paper_ids:
+                retries[summary_type] = paper_ids
+                limit -= len(paper_ids)
+
+    summarized = 0
+    for summary_type, paper_ids in retries.items():
+        print(f"Retrying {len(paper_ids)} failed '{summary_type}' summaries...")
+        if summary_type == 'general':
+            summarized += summarize_papers(paper_ids=paper_ids, concurrency=concurrency)
+        else:
+            summarized += summarize_packed(summary_type, paper_ids=paper_ids)
+    return summarized
+
+PACKED_OUTPUT_INSTRUCTIONS = """You will be given several papers, each introduced by a line of the form `=== PAPER P<n> ===`. Summarize every paper separately, in the order given, following the instructions above for each one.
+
+Start each summary with the line `=== SUMMARY P<n> ===` and end it with the line `=== END P<n> ===`, using that paper's tag exactly. Write nothing outside these blocks."""
+
+# Upper bound on the output budget of one packed request
+PACKED_MAX_TOKENS = 8192
+
+def build_packed_summary_prompt(papers, summary_type='takeaway'):
+    """
+    Build one prompt asking for summaries of several papers.
+
+    Args:
+        papers: List of (title, abstract, authors list) tuples
+        summary_type: Type of summary to generate
+
+    Returns:
+        tuple: (system prefix, user prompt, list of tags in paper order)
+    """
+    system, _ = build_summary_prompt('', '', [], summary_type)
+    system += f"\n\n{PACKED_OUTPUT_INSTRUCTIONS}"
+
+    tags = [f"P{i}" for i in range(1, len(papers) + 1)]
+    prompt = "\n\n".join(
+        f"""=== PAPER {tag} ===
+Paper Title: {title}
+
+Authors: {', '.join(authors)}
+
+Abstract: {abstract}"""
+        for tag, (title, abstract, authors) in zip(tags, papers)
+    )
+
+    return system, prompt, tags
+
+def parse_packed_summaries(text, tags):
+    """
+    Split the reply to a packed prompt into per-paper summaries.
+
+    Only complete, non-empty blocks with an expected tag that appears exactly
+    once are kept, so a reply cut off by the token limit loses just its last
+    block.
+
+    Returns:
+        dict: {tag: summary}
+    """
+    blocks = re.findall(r'^=== SUMMARY (P\d+) ===[ \t]*\n(.*?)\n=== END \1 ===[ \t]*$', text, re.DOTALL | re.MULTILINE)
+
+    counts = {}
+    for tag, _ in blocks:
+        counts[tag] = counts.get(tag, 0) + 1
+
+    return {
+        tag: summary.strip()
+        for tag, summary in blocks
+        if tag in tags and counts[tag] == 1 and summary.strip()
+    }
+
+def _store_packed_result(paper_id, summary_type, key, summary=None, error=None):
+    """
+    Persist one paper's packed-run outcome, stored like an individually
+    generated summary without touching the displayed one.
+    """
+    if error is None:
+        journal.append(_journal_entry(paper_id, summary_type, key, summary))
+
+    with session_scope() as session:
+        if error is None:
+            store_summary(session, paper_id, summary_type, key, summary)
+            clear_failure(session, paper_id, summary_type)
+        else:
+            attempt = record_failure(
+                session, paper_id, type(error).__name__, str(error), is_permanent(error), summary_type
+            )
+            print(f"  Error summarizing {paper_id} (attempt {attempt.attempts}, {attempt.status}): {error}")
+
+def summarize_packed(summary_type='takeaway', paper_ids=None, limit=SUMMARY_BATCH_LIMIT, pack_size=SUMMARY_PACK_SIZE):
+    """
+    Generate summaries of a short type for many papers, several per request.
+
+    Papers are packed pack_size at a time into one prompt with tagged output
+    blocks, and the reply is split back into per-paper summaries. Papers whose
+    block is missing, duplicated or cut off are summarized with a
+    single-paper call instead. Results go to the per-type store under the
+    same key as an individually generated summary, so they are served to the
+    web interface without another call; the displayed summary is unchanged.
+
+    As in summarize_papers, papers someone is already summarizing are
+    skipped, and papers whose single-paper call fails are recorded in
+    summary_attempts for retry_failed_summaries.
+
+    Args:
+        summary_type: Type of summary (key of SUMMARY_TYPES), best a short one
+        paper_ids: Optional list of specific paper IDs
+        limit: Maximum number of papers (if paper_ids not provided)
+        pack_size: Papers per request
+
+    Returns:
+        int: Number of summaries stored
+    """
+    if not llm.is_configured():
+        print("Summary generation unavailable: No API key configured.")
+        return 0
+
+    route = llm.route_settings(f'summary:{summary_type}')
+    prompt_hash = summary_cache_key(build_summary_prompt('', '', [], summary_type)[0], '', summary_type)[0]
+
+    with session_scope() as session:
+        done = session.query(PaperSummary.paper_id).filter(
+            PaperSummary.summary_type == summary_type,
+            PaperSummary.prompt_hash == prompt_hash
+        )
+        query = session.query(Paper).filter(Paper.id.notin_(done))
+        if paper_ids:
+            query = query.filter(Paper.id.in_(paper_ids))
+        else:
+            query = query.filter(
+                Paper.id.notin_(duplicate_paper_ids(session)),
+                Paper.id.notin_(attempted_paper_ids(session, summary_type))
+            ).order_by(Paper.rank_score.desc()).limit(limit)
+
+        papers = [(paper.id, paper.title, paper.abstract, json.loads(paper.authors)) for paper in query]
+
+    # Papers someone is already summarizing are left to them
+    flights = {}
+    prepared = []
+    for paper_id, title, abstract, authors in papers:
+        system, prompt = build_summary_prompt(title, abstract, authors, summary_type)
+        key = summary_cache_key(system, prompt, summary_type)
+        flight_key = (paper_id, summary_type, key[0])
+        flight = singleflight.try_lead(flight_key)
+        if flight is None:
+            print(f"Skipping {paper_id}: already being summarized")
+            continue
+
+        flights[paper_id] = (flight_key, flight)
+        prepared.append((paper_id, title, abstract, authors, system, prompt, key))
+
+    if not prepared:
+        print(f"No papers need a '{summary_type}' summary.")
+        return 0
+
+    def settle(paper_id, key, summary=None, error=None):
+        flight_key, flight = flights.pop(paper_id)
+        try:
+            _store_packed_result(paper_id, summary_type, key, summary, error)
+        except Exception as e:
+            print(f"  Could not save result for {paper_id}{' (kept in journal)' if error is None else ''}: {e}")
+            return False
+        finally:
+            singleflight.finish(flight_key, flight, summary, error)
+        return error is None
+
+    packs = [prepared[i:i + pack_size] for i in range(0, len(prepared), pack_size)]
+    print(f"Generating '{summary_type}' summaries for {len(prepared)} papers in {len(packs)} packed requests...")
+
+    stored = 0
+    fallback = []
+    try:
+        futures = {}
+        for pack in packs:
+            system, prompt, tags = build_packed_summary_prompt(
+                [(title, abstract, authors) for _, title, abstract, authors, _, _, _ in pack], summary_type
+            )
+            future = summary_queue.submit(
+                llm.complete, prompt, system=system, label=f'summary:{summary_type}:packed',
+                model=route['model'], timeout=route['timeout'],
+                max_tokens=min(PACKED_MAX_TOKENS, route['max_tokens'] * len(pack)),
+                priority=PRIORITY_BACKLOG
+            )
+            futures[future] = (pack, tags)
+
+        for future in as_completed(futures):
+            pack, tags = futures[future]
+            try:
+                results = parse_packed_summaries(future.result(), tags)
+            except Exception as e:
+                print(f"  Packed request failed ({e}); summarizing its {len(pack)} papers one by one")
+                results = {}
+
+            for tag, (paper_id, _, _, _, system, prompt, key) in zip(tags, pack):
+                if tag in results:
+                    stored += settle(paper_id, key, results[tag])
+                else:
+                    fallback.append((paper_id, system, prompt, key, summary_queue.submit(
+                        llm.complete, prompt, label=f'summary:{summary_type}', system=system, with_model=True,
+                        priority=PRIORITY_BACKLOG
+                    )))
+
+        for paper_id, system, prompt, key, future in fallback:
+            try:
+                summary, model = future.result()
+            except Exception as e:
+                settle(paper_id, key, error=e)
+                continue
+            stored += settle(paper_id, _generated_key(key, system, prompt, summary_type, model), summary)
+    finally:
+        # Anything left was interrupted; callers waiting on it stop waiting
+        for flight_key, flight in flights.values():
+            singleflight.finish(flight_key, flight)
+
+    print(f"Stored {stored} '{summary_type}' summaries from {len(packs) + len(fallback)} requests "
+          f"({len(fallback)} single-paper fallbacks).")
+    return stored
+
+def list_stored_summaries(paper_id):
+    """
+    List the summary types stored for a paper.
+
+    Returns:
+        List of dicts with summary_type and created_date
+    """
+    with session_scope() as session:
+        rows = session.query(PaperSummary.summary_type, PaperSummary.created_date).filter(
+            PaperSummary.paper_id == paper_id
+        ).all()
+
+        return [
+            {'summary_type': summary_type, 'created_date': created.isoformat() if created else None}
+            for summary_type, created in rows
+        ]
+
+# How long a batch may sit in 'submitting' before its papers are released
+BATCH_SUBMIT_TIMEOUT = timedelta(hours=1)
+
+def _batch_request(value):
+    """
+    Split a request_map value into the paper ID and the key its summary is
+    stored under. Batches submitted before keys were recorded map to the
+    paper ID alone and get no key.
+    """
+    if isinstance(value, str):
+        return value, None
+    paper_id, prompt_hash, content_hash = value
+    return paper_id, (prompt_hash, content_hash)
+
+def _papers_in_open_batches(session, summary_type):
+    """IDs of papers in a batch of this type that is being submitted or whose results aren't applied yet."""
+    paper_ids = set()
+    for batch in session.query(SummaryBatch).filter(
+        SummaryBatch.summary_type == summary_type,
+        SummaryBatch.status.in_(('submitting', 'in_progress'))
+    ):
+        paper_ids.update(_batch_request(value)[0] for value in json.loads(batch.request_map).values())
+    return paper_ids
+
+def submit_summary_batch(limit=BATCH_SUMMARY_LIMIT, summary_type='general'):
+    """
+    Submit unsummarized papers to the Message Batches API.
+
+    Batches cost less and aren't subject to per-request latency, which suits
+    backlogs (e.g. after a backfill). The papers are recorded in a
+    'submitting' summary_batches row before the batch is created, so a
+    concurrent submit can't pick them up again, and the batch ID is filled
+    in before returning, so poll_summary_batches can collect the results
+    after any restart.
+
+    Args:
+        limit: Maximum number of papers to include
+        summary_type: Type of summary to generate
+
+    Returns:
+        str: Batch ID, or None if there was nothing to submit
+    """
+    if not llm.is_configured():
+        print("Batch summarization unavailable: No API key configured.")
+        return None
+
+    with session_scope() as session:
+        if summary_type == 'general':
+            unsummarized = Paper.summary.is_(None)
+        else:
+            unsummarized = Paper.id.notin_(session.query(PaperSummary.paper_id).filter_by(summary_type=summary_type))
+
+        papers = session.query(Paper).filter(
+            unsummarized,
+            Paper.id.notin_(duplicate_paper_ids(session)),
+            Paper.id.notin_(attempted_paper_ids(session, summary_type)),
+            Paper.id.notin_(_papers_in_open_batches(session, summary_type))
+        ).order_by(Paper.rank_score.desc()).limit(limit).all()
+
+        if not papers:
+            print("No papers need batch summarization.")
+            return None
+
+        # custom_id must be short and URL-safe; arXiv IDs are URLs, so map
+        # them, along with the key of the prompt actually sent
+        request_map = {}
+        requests = []
+        route = llm.route_settings(f'summary:{summary_type}')
+        for i, paper in enumerate(papers):
+            custom_id = f"paper-{i}"
+            system, prompt = build_summary_prompt(paper.title, paper.abstract, json.loads(paper.authors), summary_type)
+            request_map[custom_id] = [paper.id, *summary_cache_key(system, prompt, summary_type)]
+            requests.append({
+                'custom_id': custom_id,
+                'params': {
+                    'model': route['model'],
+                    'max_tokens': route['max_tokens'],
+                    'system': llm.cached_system(system),
+                    'messages': [{'role': 'user', 'content': prompt}]
+                }
+            })
+
+        batch_row = SummaryBatch(summary_type=summary_type, request_map=json.dumps(request_map), status='submitting')
+        session.add(batch_row)
+        session.flush()
+        row_id = batch_row.id
+
+    try:
+        batch = llm.get_client().beta.messages.batches.create(requests=requests)
+    except Exception:
+        # Release the papers for the next submit or the regular queue
+        with session_scope() as session:
+            session.get(SummaryBatch, row_id).status = 'failed'
+        raise
+
+    with session_scope() as session:
+        batch_row = session.get(SummaryBatch, row_id)
+        batch_row.batch_id = batch.id
+        batch_row.status = 'in_progress'
+
+    print(f"Submitted summary batch {batch.id} with {len(requests)} papers.")
+    return batch.id
+
+def _apply_batch_results(client, batch_row):
+    """
+    Store the results of an ended batch, in one transaction.
+
+    Summaries are journaled and stored under the batch's summary type like
+    ones generated a call at a time, keyed by the prompt sent at submit;
+    general summaries also become the paper's displayed summary unless it
+    got one some other way meanwhile.
+    """
+    request_map = {custom_id: _batch_request(value) for custom_id, value in json.loads(batch_row.request_map).items()}
+    summaries = {}
+    failures = {}
+
+    for entry in client.beta.messages.batches.results(batch_row.batch_id):
+        if entry.custom_id not in request_map:
+            continue
+        paper_id, key = request_map[entry.custom_id]
+
+        if entry.result.type == 'succeeded':
+            summaries[paper_id] = (key, entry.result.message.content[0].text)
+        elif entry.result.type == 'errored':
+            error = entry.result.error.error
+            failures[paper_id] = (error.type, error.message, error.type == 'invalid_request_error')
+        else:
+            # Expired or canceled before it ran; worth trying again
+            failures[paper_id] = (entry.result.type, f"Batch request {entry.result.type}", False)
+
+    summary_type = batch_row.summary_type
+    with session_scope() as session:
+        papers = session.query(Paper).filter(Paper.id.in_(summaries)).all()
+
+        entries = []
+        for paper in papers:
+            key, summary = summaries[paper.id]
+            if key is None:
+                key = summary_cache_key(
+                    *build_summary_prompt(paper.title, paper.abstract, json.loads(paper.authors), summary_type),
+                    summary_type
+                )
+            entries.append(_journal_entry(paper.id, summary_type, key, summary))
+        if entries:
+            journal.extend(entries)
+
+        for paper, entry in zip(papers, entries):
+            store_summary(session, paper.id, summary_type, tuple(entry['key']), entry['summary'])
+            if summary_type == 'general' and not paper.summary:
+                paper.summary = entry['summary']
+            clear_failure(session, paper.id, summary_type)
+
+        for paper_id, (error_class, message, permanent) in failures.items():
+            record_failure(session, paper_id, error_class, message, permanent, summary_type)
+
+        batch = session.get(SummaryBatch, batch_row.id)
+        batch.status = 'applied'
+        batch.summarized_count = len(entries)
+        batch.applied_date = datetime.utcnow()
+
+    print(f"Applied batch {batch_row.batch_id}: {len(entries)} summaries, {len(failures)} failed.")
+    return len(entries)
+
+def poll_summary_batches():
+    """
+    Check open summary batches and apply the results of any that have ended.
+
+    Safe to run repeatedly and after restarts: state lives in summary_batches,
+    and results only fill papers that still have no summary.
+
+    Returns:
+        int: Number of summaries applied
+    """
+    if not llm.is_configured():
+        return 0
+
+    with session_scope() as session:
+        # A submit that died between recording its papers and creating the
+        # batch would otherwise hold them back forever
+        stale = session.query(SummaryBatch).filter(
+            SummaryBatch.status == 'submitting',
+            SummaryBatch.created_date < datetime.utcnow() - BATCH_SUBMIT_TIMEOUT
+        ).update({SummaryBatch.status: 'failed'}, synchronize_session=False)
+        if stale:
+            print(f"Released papers from {stale} batch submissions that never completed.")
+
+        open_batches = session.query(SummaryBatch).filter(SummaryBatch.status == 'in_progress').all()
+        session.expunge_all()
+
+    if not open_batches:
+        return 0
+
+    client = llm.get_client()
+    applied = 0
+
+    for batch_row in open_batches:
+        try:
+            batch = client.beta.messages.batches.retrieve(batch_row.batch_id)
+        except anthropic.NotFoundError:
+            with session_scope() as session:
+                session.get(SummaryBatch, batch_row.id).status = 'failed'
+            continue
+
+        if batch.processing_status != 'ended':
+            continue
+
+        applied += _apply_batch_results(client, batch_row)
+
+    return applied
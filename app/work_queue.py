@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from app.config import SUMMARY_CONCURRENCY, SUMMARY_QUEUE_AGING_SECONDS
+
+# Lower runs first
+PRIORITY_INTERACTIVE = 0  # A user is waiting on the result
+PRIORITY_IMPORTANT = 1    # Favorites and high-rank papers
+PRIORITY_BACKLOG = 2      # Everything else
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_IMPORTANT: 'important',
+    PRIORITY_BACKLOG: 'backlog',
+}
+
+_DONE = object()
+
+class PriorityWorkQueue:
+    """
+    A fixed pool of worker threads draining a priority queue.
+
+    Waiting work ages: its effective priority improves by one level for every
+    aging_seconds it has been queued, so a steady stream of interactive
+    requests cannot starve the backlog. Every item ages at the same rate, so
+    ordering by (priority * aging_seconds + enqueue time) gives the same order
+    as the effective priority at any moment, and heap keys never change.
+    """
+
+    def __init__(self, workers, aging_seconds):
+        self.workers = max(1, workers)
+        self.aging_seconds = aging_seconds
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads = []
+        self._busy = 0
+
+    def _start_workers(self):
+        # Started on first use, so processes forked after import get their own
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f'summary-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                _, _, priority, future, fn, args, kwargs = heapq.heappop(self._heap)
+                self._busy += 1
+
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._condition:
+                    self._busy -= 1
+
+    def submit(self, fn, *args, priority=PRIORITY_BACKLOG, **kwargs):
+        """
+        Queue fn(*args, **kwargs) to run on the pool.
+
+        Returns:
+            concurrent.futures.Future: Resolves to fn's result
+
+        Raises:
+            ValueError: If priority is not one of the PRIORITY_* levels
+        """
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority: {priority!r}")
+
+        future = Future()
+        key = priority * self.aging_seconds + time.monotonic()
+
+        with self._condition:
+            if not self._threads:
+                self._start_workers()
+            heapq.heappush(self._heap, (key, next(self._sequence), priority, future, fn, args, kwargs))
+            self._condition.notify()
+
+        return future
+
+    def stream(self, generator_fn, *args, priority=PRIORITY_INTERACTIVE, **kwargs):
+        """
+        Run a generator on the pool and yield its items in the calling thread.
+
+        The generator runs to completion even if the caller stops reading,
+        so work it does at the end (such as saving the result) still happens.
+
+        Yields:
+            Items produced by generator_fn(*args, **kwargs)
+        """
+        items = queue.Queue()
+
+        def run():
+            try:
+                for item in generator_fn(*args, **kwargs):
+                    items.put((item, None))
+            except Exception as e:
+                items.put((_DONE, e))
+            else:
+                items.put((_DONE, None))
+
+        self.submit(run, priority=priority)
+
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error:
+                    raise error
+                return
+            yield item
+
+    def stats(self):
+        """
+        Returns:
+            dict: Workers, busy workers and queued items per priority
+        """
+        with self._condition:
+            pending = {name: 0 for name in PRIORITY_NAMES.values()}
+            for entry in self._heap:
+                pending[PRIORITY_NAMES[entry[2]]] += 1
+
+            return {'workers': self.workers, 'busy': self._busy, 'pending': pending}
+
+# Shared by bulk and on-demand summarization in this process
+summary_queue = PriorityWorkQueue(SUMMARY_CONCURRENCY, SUMMARY_QUEUE_AGING_SECONDS)
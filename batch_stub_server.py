@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Anthropic Message Batches endpoints, for exercising
+bulk summarization offline.
+
+Usage:
+    python batch_stub_server.py [port]
+
+Then point the app at it:
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=stub python summarize_backlog.py
+
+Batches end BATCH_STUB_SECONDS (default 5) after submission. Every request
+succeeds with a deterministic summary, except prompts containing
+BATCH_STUB_FAIL_MARKER, which come back errored.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BATCH_SECONDS = float(os.environ.get('BATCH_STUB_SECONDS', 5))
+FAIL_MARKER = os.environ.get('BATCH_STUB_FAIL_MARKER', '[[fail]]')
+
+batches = {}
+lock = threading.Lock()
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace('+00:00', 'Z')
+
+def _batch_body(batch, base_url):
+    ended = time.time() >= batch['ends_at']
+    count = len(batch['requests'])
+    failed = sum(1 for r in batch['requests'] if FAIL_MARKER in json.dumps(r['params']))
+
+    return {
+        'id': batch['id'],
+        'type': 'message_batch',
+        'processing_status': 'ended' if ended else 'in_progress',
+        'request_counts': {
+            'processing': 0 if ended else count,
+            'succeeded': count - failed if ended else 0,
+            'errored': failed if ended else 0,
+            'canceled': 0,
+            'expired': 0
+        },
+        'created_at': _iso(batch['created_at']),
+        'expires_at': _iso(batch['created_at'] + timedelta(days=1).total_seconds()),
+        'ended_at': _iso(batch['ends_at']) if ended else None,
+        'cancel_initiated_at': None,
+        'archived_at': None,
+        'results_url': f"{base_url}/v1/messages/batches/{batch['id']}/results" if ended else None
+    }
+
+def _result_line(request):
+    params = request['params']
+    prompt = json.dumps(params.get('messages', []))
+
+    if FAIL_MARKER in prompt:
+        result = {'type': 'errored', 'error': {'type': 'error', 'error': {'type': 'invalid_request_error', 'message': 'stub failure'}}}
+    else:
+        text = f"Stub summary for {request['custom_id']} ({len(prompt)} prompt chars)."
+        result = {
+            'type': 'succeeded',
+            'message': {
+                'id': f"msg_{uuid.uuid4().hex[:24]}",
+                'type': 'message',
+                'role': 'assistant',
+                'model': params.get('model', 'stub'),
+                'content': [{'type': 'text', 'text': text}],
+                'stop_reason': 'end_turn',
+                'stop_sequence': None,
+                'usage': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}
+            }
+        }
+
+    return json.dumps({'custom_id': request['custom_id'], 'result': result})
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _base_url(self):
+        return f"http://{self.headers.get('Host', '127.0.0.1')}"
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_found(self):
+        self._send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+
+    def do_POST(self):
+        if self.path.split('?')[0] != '/v1/messages/batches':
+            return self._not_found()
+
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        now = time.time()
+        batch = {
+            'id': f"msgbatch_{uuid.uuid4().hex[:24]}",
+            'requests': payload.get('requests', []),
+            'created_at': now,
+            'ends_at': now + BATCH_SECONDS
+        }
+        with lock:
+            batches[batch['id']] = batch
+
+        self._send_json(200, _batch_body(batch, self._base_url()))
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts[:3] != ['v1', 'messages', 'batches'] or len(parts) < 4:
+            return self._not_found()
+
+        with lock:
+            batch = batches.get(parts[3])
+        if not batch:
+            return self._not_found()
+
+        if len(parts) == 4:
+            return self._send_json(200, _batch_body(batch, self._base_url()))
+
+        if len(parts) == 5 and parts[4] == 'results' and time.time() >= batch['ends_at']:
+            data = '\n'.join(_result_line(r) for r in batch['requests']).encode('utf-8') + b'\n'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/binary')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self._not_found()
+
+    def log_message(self, format, *args):
+        print(f"[batch stub] {format % args}")
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    print(f"Message Batches stub listening on http://127.0.0.1:{port} (batches end after {BATCH_SECONDS}s)")
+    ThreadingHTTPServer(('127.0.0.1', port), StubHandler).serve_forever()
@@ -0,0 +1,39 @@
+"""
+Benchmarks against synthetic databases.
+
+    python -m benchmarks.corpus --papers 100k          # generate a database only
+    python -m benchmarks.run --papers 100k             # generate if needed, then time scenarios
+
+The app binds its database engine when app.database is first imported, so
+both entry points call use_database() before importing anything from app.
+"""
+
+import os
+import sys
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def parse_count(value):
+    """Parse a paper count such as 10000, 10k or 1m."""
+    value = value.strip().lower()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+def default_database_path(papers, seed):
+    return os.path.join(DATA_DIR, f"papers-{papers}-seed{seed}.db")
+
+def use_database(path):
+    """
+    Point the app at the given database file.
+
+    Raises:
+        RuntimeError: If app.database was already imported with another path
+    """
+    path = os.path.abspath(path)
+    database = sys.modules.get('app.database')
+    if database is not None and os.path.abspath(database.DATABASE_PATH) != path:
+        raise RuntimeError(f"app.database is already bound to {database.DATABASE_PATH}")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.environ['DATABASE_PATH'] = path
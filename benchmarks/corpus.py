@@ -0,0 +1,250 @@
+"""
+Generate a synthetic papers database.
+
+Usage:
+    python -m benchmarks.corpus --papers 100k [--seed 0] [--db path] [--force]
+
+Papers get titles, abstracts, summaries, authors and affiliations drawn from
+the same vocabulary as the fake arXiv backend, publication dates spread over
+--days, and rank scores from the real ranker. A share of them are rated,
+re-ranked, favorited and highlighted, with the matching user_feedback rows.
+Embeddings and duplicate signatures are not built.
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from benchmarks import parse_count, default_database_path, use_database
+
+CHUNK_SIZE = 10_000
+
+CUSTOM_PREFERENCES = {
+    'university of edinburgh': 6,
+    'kaist': 5,
+    'tu munich': 5,
+    'anthropic': 9,
+    'redwood research': 9,
+}
+
+HIGHLIGHT_COLORS = ['yellow', 'green', 'blue', 'pink']
+TAGS = ['to-read', 'reading-group', 'interpretability', 'evals', 'theory', 'cite']
+
+def _paper_row(rng, number, start_date, days, alignment_rate, summary_rate):
+    from app.arxiv_backends import (
+        OTHER_TOPICS, TITLE_OPENERS, TITLE_SUFFIXES, ABSTRACT_SENTENCES, FIRST_NAMES, LAST_NAMES, AFFILIATIONS
+    )
+    from app.config import ALIGNMENT_KEYWORDS
+    from app.llm_backends import FAKE_WORDS
+    from app.ranker import calculate_rank_score
+
+    published = start_date + timedelta(seconds=rng.randrange(days * 86400))
+    arxiv_id = f"{published:%y%m}.{number:05d}v1"
+    topic = rng.choice(ALIGNMENT_KEYWORDS if rng.random() < alignment_rate else OTHER_TOPICS)
+
+    authors = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in range(rng.randint(1, 10))]
+    affiliations = sorted({rng.choice(AFFILIATIONS) for _ in authors if rng.random() < 0.4})
+
+    return {
+        'id': f"http://arxiv.org/abs/{arxiv_id}",
+        'title': f"{rng.choice(TITLE_OPENERS)} {topic.title()} {rng.choice(TITLE_SUFFIXES)}",
+        'authors': json.dumps(authors),
+        'affiliations': json.dumps(affiliations) if affiliations else None,
+        'abstract': ' '.join(
+            sentence.format(topic=topic, count=rng.randint(3, 12))
+            for sentence in rng.sample(ABSTRACT_SENTENCES, rng.randint(3, len(ABSTRACT_SENTENCES)))
+        ),
+        'summary': ' '.join(rng.choices(FAKE_WORDS, k=rng.randint(60, 160))) if rng.random() < summary_rate else None,
+        'published_date': published,
+        'fetched_date': published + timedelta(hours=rng.randint(1, 72)),
+        'arxiv_url': f"http://arxiv.org/abs/{arxiv_id}",
+        'pdf_url': f"https://arxiv.org/pdf/{arxiv_id}",
+        'rank_score': calculate_rank_score(authors, affiliations, use_user_prefs=False),
+        'summary_rating': None,
+        'user_rank_override': None
+    }
+
+def _drop_triggers(conn):
+    from sqlalchemy import text
+
+    for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).all():
+        conn.execute(text(f"DROP TRIGGER {name}"))
+
+def _restore_derived_data():
+    # Triggers are dropped for the bulk load and recreated here, then the
+    # counters and search index they maintain are rebuilt in one pass each
+    from sqlalchemy import text
+    from app.database import engine, STATS_TRIGGERS, SEARCH_DDL
+    from app.stats import reconcile_stats
+    from app.search import rebuild_search_index
+
+    with engine.begin() as conn:
+        for ddl in STATS_TRIGGERS + SEARCH_DDL:
+            conn.execute(text(ddl))
+
+    reconcile_stats()
+    rebuild_search_index()
+
+def generate_corpus(papers, seed=0, days=3 * 365, alignment_rate=0.7, summary_rate=0.8, rating_rate=0.05,
+                    override_rate=0.02, favorite_rate=0.01, highlights_per_favorite=4):
+    """
+    Fill the (empty) database the app is bound to with a synthetic corpus.
+
+    Args:
+        papers: Number of papers
+        seed: Random seed; the same seed and settings give the same database
+        days: Publication dates are spread over this many days up to today
+        alignment_rate: Share of papers on an alignment topic
+        summary_rate: Share of papers with a summary
+        rating_rate: Share of summarized papers with a summary rating
+        override_rate: Share of papers with a manual rank override
+        favorite_rate: Share of papers in favorites
+        highlights_per_favorite: Average highlights per favorite
+
+    Returns:
+        dict: Row counts per table
+    """
+    from sqlalchemy import insert, text
+    from app.database import (
+        engine, Paper, UserFeedback, FavoritePaper, PaperHighlight, AffiliationPreference, PaperStat
+    )
+    from app.llm_backends import FAKE_WORDS
+
+    rng = random.Random(seed)
+    start_date = datetime.utcnow().replace(microsecond=0) - timedelta(days=days)
+    counts = {'papers': 0, 'user_feedback': 0, 'favorites': 0, 'highlights': 0}
+
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT COUNT(*) FROM papers")).scalar():
+            raise ValueError("The database already has papers")
+
+        _drop_triggers(conn)
+        conn.execute(insert(AffiliationPreference), [
+            {'affiliation_name': name, 'rank_score': score, 'is_custom': True} for name, score in CUSTOM_PREFERENCES.items()
+        ])
+
+    for chunk_start in range(0, papers, CHUNK_SIZE):
+        rows, feedback, favorites, highlights = [], [], [], []
+
+        for number in range(chunk_start, min(papers, chunk_start + CHUNK_SIZE)):
+            row = _paper_row(rng, number, start_date, days, alignment_rate, summary_rate)
+            rows.append(row)
+            when = row['fetched_date'] + timedelta(days=rng.randint(0, 30))
+
+            if row['summary'] and rng.random() < rating_rate:
+                row['summary_rating'] = rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 3, 5, 4])[0]
+                feedback.append({
+                    'paper_id': row['id'], 'feedback_type': 'summary_rating',
+                    'feedback_value': json.dumps({'rating': row['summary_rating']}), 'created_date': when
+                })
+
+            if rng.random() < override_rate:
+                row['user_rank_override'] = round(min(10.0, max(0.0, row['rank_score'] + rng.uniform(-4, 4))), 1)
+                feedback.append({
+                    'paper_id': row['id'], 'feedback_type': 'rank_adjustment',
+                    'feedback_value': json.dumps({'old_rank': row['rank_score'], 'new_rank': row['user_rank_override']}),
+                    'created_date': when
+                })
+
+            if rng.random() < favorite_rate:
+                favorites.append({
+                    'paper_id': row['id'],
+                    'personal_rank': round(rng.uniform(0, 10), 1),
+                    'notes': ' '.join(rng.choices(FAKE_WORDS, k=rng.randint(0, 30))),
+                    'tags': json.dumps(rng.sample(TAGS, rng.randint(0, 3))),
+                    'favorited_date': when,
+                    'last_updated': when
+                })
+                for _ in range(rng.randint(0, 2 * highlights_per_favorite)):
+                    highlights.append({
+                        'paper_id': row['id'],
+                        'highlight_text': ' '.join(rng.choices(FAKE_WORDS, k=rng.randint(8, 60))),
+                        'page_number': rng.randint(1, 30),
+                        'color': rng.choice(HIGHLIGHT_COLORS),
+                        'created_date': when
+                    })
+
+        with engine.begin() as conn:
+            conn.execute(insert(Paper), rows)
+            for model, batch in ((UserFeedback, feedback), (FavoritePaper, favorites), (PaperHighlight, highlights)):
+                if batch:
+                    conn.execute(insert(model), batch)
+
+        counts['papers'] += len(rows)
+        counts['user_feedback'] += len(feedback)
+        counts['favorites'] += len(favorites)
+        counts['highlights'] += len(highlights)
+        print(f"  {counts['papers']}/{papers} papers")
+
+    _restore_derived_data()
+
+    with engine.begin() as conn:
+        conn.execute(insert(PaperStat).prefix_with('OR REPLACE'), [
+            {'name': 'feedback_version', 'value': counts['user_feedback']}
+        ])
+        conn.execute(text("ANALYZE"))
+
+    return counts
+
+def ensure_corpus(path, papers, seed=0, force=False, **options):
+    """
+    Generate a corpus at path unless one is already there.
+
+    Must be called before anything from app is imported.
+
+    Returns:
+        dict: Generation details (path, size, seconds and row counts), with
+              'reused' True if the file already existed
+    """
+    def remove():
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    if force:
+        remove()
+
+    reused = os.path.exists(path)
+    use_database(path)
+
+    started = time.perf_counter()
+    counts = None
+    if not reused:
+        print(f"Generating {papers} papers into {path}...")
+        try:
+            counts = generate_corpus(papers, seed=seed, **options)
+        except BaseException:
+            # A partial corpus would otherwise be reused by the next run
+            from app.database import engine
+            engine.dispose()
+            remove()
+            raise
+
+    return {
+        'path': path,
+        'papers': papers,
+        'seed': seed,
+        'reused': reused,
+        'generate_seconds': None if reused else round(time.perf_counter() - started, 2),
+        'rows': counts,
+        'bytes': os.path.getsize(path)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic papers database")
+    parser.add_argument('--papers', type=parse_count, default=10_000, help="e.g. 10000, 100k, 1m")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="Output file (default: benchmarks/data/papers-<n>-seed<seed>.db)")
+    parser.add_argument('--force', action='store_true', help="Replace an existing file")
+    args = parser.parse_args()
+
+    details = ensure_corpus(args.db or default_database_path(args.papers, args.seed), args.papers, args.seed, args.force)
+    if details['reused']:
+        print(f"{details['path']} already exists; use --force to regenerate")
+    else:
+        print(f"\nGenerated {details['path']} ({details['bytes'] // 1024} KB) in {details['generate_seconds']}s: {details['rows']}")
+
+if __name__ == '__main__':
+    main()
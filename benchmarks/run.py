@@ -0,0 +1,191 @@
+"""
+Time the main pages and core functions against a synthetic database.
+
+Usage:
+    python -m benchmarks.run --papers 100k [--repeat N] [--scenarios index,stats]
+                             [--output results.json] [--baseline earlier.json]
+
+The corpus is generated on first use (see benchmarks/corpus.py) and reused
+afterwards. Each scenario runs once untimed, then --repeat times for latency
+and query counts, then once more under tracemalloc for peak memory. Results
+are written as JSON (by default to benchmarks/results/<commit>-<papers>.json)
+so runs from different commits can be compared with --baseline.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from benchmarks import RESULTS_DIR, parse_count, default_database_path
+from benchmarks.corpus import ensure_corpus
+
+try:
+    import resource
+except ImportError:  # Windows: no max RSS in the results
+    resource = None
+
+# (name, kind, target, default repeat). Scenarios that load every paper get
+# fewer repeats so a 1M-paper run finishes in reasonable time.
+SCENARIOS = [
+    ('index', 'get', '/', 5),
+    ('index_min_rank', 'get', '/?min_rank=7', 5),
+    ('favorites', 'get', '/api/favorites', 20),
+    ('stats', 'get', '/api/stats', 50),
+    ('search', 'get', '/api/search?q=interpretability', 20),
+    ('learning_report', 'call', 'app.learning:get_learning_report', 20),
+    ('recalculate_paper_ranks', 'call', 'app.ranker:recalculate_paper_ranks', 3),
+]
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _scenario_callable(kind, target, client):
+    if kind == 'get':
+        def run():
+            response = client.get(target)
+            response.close()
+            if response.status_code >= 400:
+                raise RuntimeError(f"GET {target} returned {response.status_code}")
+        return run
+
+    module_name, function_name = target.split(':')
+    __import__(module_name)
+    return getattr(sys.modules[module_name], function_name)
+
+def run_scenario(name, run, repeat, warmup=1):
+    """
+    Time one scenario.
+
+    Returns:
+        dict: Latency percentiles in milliseconds, statements issued per run
+              and peak traced memory in KB
+    """
+    from sqlalchemy import event
+    from app.database import engine
+
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        for _ in range(warmup):
+            run()
+
+        latencies, queries = [], []
+        for _ in range(repeat):
+            statements[0] = 0
+            started = time.perf_counter()
+            run()
+            latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(statements[0])
+
+        # Memory is measured separately since tracing slows everything down
+        tracemalloc.start()
+        try:
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+
+    result = {
+        'repeat': repeat,
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'mean_ms': round(sum(latencies) / len(latencies), 2),
+        'min_ms': round(min(latencies), 2),
+        'max_ms': round(max(latencies), 2),
+        'queries': percentile(queries, 0.50),
+        'peak_memory_kb': peak // 1024
+    }
+    print(f"  {name:<26} p50 {result['p50_ms']:>10.2f} ms   p95 {result['p95_ms']:>10.2f} ms   "
+          f"{result['queries']:>7} queries   {result['peak_memory_kb']:>9} KB")
+    return result
+
+def compare(results, baseline):
+    """Print each scenario's change against an earlier results file."""
+    print(f"\nAgainst {baseline.get('commit')} ({baseline['corpus']['papers']} papers):")
+    for name, result in results['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        ratio = result['p50_ms'] / before['p50_ms'] if before['p50_ms'] else float('inf')
+        print(f"  {name:<26} p50 x{ratio:.2f}   queries {before['queries']} -> {result['queries']}   "
+              f"memory {before['peak_memory_kb']} -> {result['peak_memory_kb']} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the app against a synthetic database")
+    parser.add_argument('--papers', type=parse_count, default=10_000, help="e.g. 10000, 100k, 1m")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db', help="Database to use or generate (default: benchmarks/data/papers-<n>-seed<seed>.db)")
+    parser.add_argument('--regenerate', action='store_true', help="Generate the database even if it exists")
+    parser.add_argument('--repeat', type=int, help="Timed runs per scenario (default: per scenario)")
+    parser.add_argument('--warmup', type=int, default=1, help="Untimed runs before timing")
+    parser.add_argument('--scenarios', help="Comma-separated subset of: " + ', '.join(s[0] for s in SCENARIOS))
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<commit>-<papers>.json)")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    args = parser.parse_args()
+
+    selected = set(args.scenarios.split(',')) if args.scenarios else None
+    unknown = (selected or set()) - {s[0] for s in SCENARIOS}
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    corpus = ensure_corpus(args.db or default_database_path(args.papers, args.seed), args.papers, args.seed, args.regenerate)
+
+    from app import create_app
+    client = create_app().test_client()
+
+    commit = _git_commit()
+    results = {
+        'commit': commit,
+        'created_date': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': corpus,
+        'scenarios': {}
+    }
+
+    print(f"\nRunning scenarios against {corpus['path']}:")
+    for name, kind, target, default_repeat in SCENARIOS:
+        if selected and name not in selected:
+            continue
+        results['scenarios'][name] = run_scenario(
+            name, _scenario_callable(kind, target, client), args.repeat or default_repeat, args.warmup
+        )
+
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    if resource:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        results['max_rss_kb'] = max_rss // 1024 if sys.platform == 'darwin' else max_rss
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}-{args.papers}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
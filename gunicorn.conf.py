@@ -0,0 +1,23 @@
+"""
+Gunicorn configuration for production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Requests are served by several worker processes, each with a thread pool.
+Every worker takes part in the scheduler leader election, so exactly one of
+them runs the background fetch/summarize jobs and another takes over if it dies.
+"""
+
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+timeout = int(os.environ.get('WEB_TIMEOUT', 120))  # on-demand summaries can take a while
+accesslog = '-'
+
+def post_worker_init(worker):
+    from scheduler import start_elected_scheduler
+    worker.election = start_elected_scheduler()
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Compute near-duplicate signatures for papers already in the database.
+New papers are checked automatically as they are fetched; run this once on an
+existing database. The oldest copy of each paper becomes the canonical one.
+"""
+
+from app.dedup import build_duplicate_index
+
+if __name__ == '__main__':
+    duplicates = build_duplicate_index()
+    print(f"\nMigration complete: {duplicates} suspected duplicates linked")
@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Build the similarity (embedding) index for papers already in the database.
+New papers are indexed automatically as they are fetched; run this once on an
+existing database.
+"""
+
+from app.embeddings import build_embedding_index
+
+if __name__ == '__main__':
+    count = build_embedding_index()
+    print(f"\nMigration complete: {count} papers added to the similarity index")
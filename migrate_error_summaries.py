@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Clear error messages that older versions stored as paper summaries.
+
+Summaries used to be saved as "Error generating summary: ..." (or "Summary
+generation unavailable: ...") when the Claude call failed, which kept those
+papers out of the summarization queue for good. This resets them to no
+summary so the scheduler picks them up again.
+"""
+
+from sqlalchemy import or_
+from app.database import session_scope, Paper, PaperSummary
+
+ERROR_PREFIXES = ('Error generating summary:', 'Summary generation unavailable:')
+
+def is_error(column):
+    """SQL condition matching values that start with one of ERROR_PREFIXES."""
+    return or_(*[column.startswith(prefix) for prefix in ERROR_PREFIXES])
+
+def reset_error_summaries():
+    """
+    Returns:
+        int: Number of papers reset
+    """
+    with session_scope() as session:
+        reset = session.query(Paper).filter(is_error(Paper.summary)).update(
+            {Paper.summary: None}, synchronize_session=False
+        )
+        session.query(PaperSummary).filter(is_error(PaperSummary.summary)).delete(synchronize_session=False)
+
+    return reset
+
+if __name__ == '__main__':
+    count = reset_error_summaries()
+    print(f"\nMigration complete: {count} error summaries cleared")
@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Build (or rebuild) the full-text search index.
+Run this once on an existing database, or any time the index looks out of date.
+"""
+
+from app.search import rebuild_search_index
+
+if __name__ == '__main__':
+    count = rebuild_search_index()
+    print(f"\nMigration complete: {count} papers searchable at /api/search")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Key summary_attempts by paper and summary type.
+
+Failures of packed and batched summaries of other types are now recorded
+and retried separately from the general summary. Databases created before
+that key the table by paper_id alone; SQLite can't change a primary key in
+place, so the table is copied, with existing rows becoming 'general' ones.
+"""
+
+import sqlite3
+from app.config import DATABASE_PATH
+
+def migrate():
+    """
+    Returns:
+        bool: Whether the table needed rebuilding
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(summary_attempts)")}
+        if not columns or 'summary_type' in columns:
+            return False
+
+        with conn:
+            conn.execute("ALTER TABLE summary_attempts RENAME TO summary_attempts_old")
+            conn.execute("""
+                CREATE TABLE summary_attempts (
+                    paper_id VARCHAR NOT NULL,
+                    summary_type VARCHAR NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    error_class VARCHAR,
+                    last_error TEXT,
+                    status VARCHAR NOT NULL,
+                    next_retry_date DATETIME,
+                    updated_date DATETIME,
+                    PRIMARY KEY (paper_id, summary_type)
+                )
+            """)
+            conn.execute("""
+                INSERT INTO summary_attempts
+                SELECT paper_id, 'general', attempts, error_class, last_error, status, next_retry_date, updated_date
+                FROM summary_attempts_old
+            """)
+            conn.execute("DROP TABLE summary_attempts_old")
+        return True
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    if migrate():
+        print("\nMigration complete: summary_attempts is now keyed by paper and summary type")
+    else:
+        print("\nNothing to migrate")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Allow summary_batches rows without a batch ID.
+
+Batches are now recorded as 'submitting' before the Message Batches API
+returns their ID. Databases created before that have batch_id NOT NULL;
+SQLite can't drop a constraint in place, so the table is copied.
+"""
+
+import sqlite3
+from app.config import DATABASE_PATH
+
+def migrate():
+    """
+    Returns:
+        bool: Whether the table needed rebuilding
+    """
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        columns = {row[1]: row for row in conn.execute("PRAGMA table_info(summary_batches)")}
+        if not columns or not columns['batch_id'][3]:
+            return False
+
+        with conn:
+            conn.execute("ALTER TABLE summary_batches RENAME TO summary_batches_old")
+            conn.execute("""
+                CREATE TABLE summary_batches (
+                    id INTEGER NOT NULL,
+                    batch_id VARCHAR,
+                    summary_type VARCHAR NOT NULL,
+                    request_map TEXT NOT NULL,
+                    status VARCHAR NOT NULL,
+                    summarized_count INTEGER,
+                    created_date DATETIME,
+                    applied_date DATETIME,
+                    PRIMARY KEY (id),
+                    UNIQUE (batch_id)
+                )
+            """)
+            conn.execute("""
+                INSERT INTO summary_batches
+                SELECT id, batch_id, summary_type, request_map, status, summarized_count, created_date, applied_date
+                FROM summary_batches_old
+            """)
+            conn.execute("DROP TABLE summary_batches_old")
+        return True
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    if migrate():
+        print("\nMigration complete: summary_batches.batch_id is now nullable")
+    else:
+        print("\nNothing to migrate")
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 from app import create_app
-from scheduler import start_scheduler
+from scheduler import start_elected_scheduler
 import os
 
 app = create_app()
 
-# Start the background scheduler
-scheduler = start_scheduler()
+# Start the background scheduler (unless another process already runs it)
+election = start_elected_scheduler()
 
 if __name__ == '__main__':
     # Run Flask app
@@ -1,8 +1,17 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.fetcher import fetch_recent_papers
-from app.summarizer import summarize_papers
-from app.config import CHECK_INTERVAL_HOURS
+from app.summarizer import (
+    summarize_papers, submit_summary_batch, poll_summary_batches, retry_failed_summaries, summarize_packed,
+    SUMMARY_TYPES
+)
+from app.stats import reconcile_stats
+from app.config import (
+    CHECK_INTERVAL_HOURS, USE_WORKER_PROCESS, SUMMARY_BATCH_LIMIT, USE_BATCH_SUMMARIES, BATCH_POLL_MINUTES,
+    SUMMARY_RETRY_POLL_MINUTES, PRECOMPUTE_SUMMARY_TYPES
+)
+from app.leader import LeaderElection
 import logging
+import multiprocessing
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,19 +27,72 @@ def scheduled_fetch_and_summarize():
         new_papers = fetch_recent_papers(days_back=CHECK_INTERVAL_HOURS // 24 + 1, max_results=100)
         logger.info(f"Fetched {new_papers} new papers")
 
-        # Generate summaries for papers without them
-        if new_papers > 0:
-            summarized = summarize_papers(limit=20)
+        # Generate summaries for papers without them, including any backlog
+        # left by earlier runs (this is a no-op when everything is summarized)
+        if USE_BATCH_SUMMARIES:
+            batch_id = submit_summary_batch()
+            logger.info(f"Submitted summary batch {batch_id}")
+        else:
+            summarized = summarize_papers(limit=SUMMARY_BATCH_LIMIT)
             logger.info(f"Generated {summarized} summaries")
 
+        for summary_type in PRECOMPUTE_SUMMARY_TYPES:
+            stored = summarize_packed(summary_type, limit=SUMMARY_BATCH_LIMIT)
+            logger.info(f"Generated {stored} '{summary_type}' summaries")
+
     except Exception as e:
         logger.error(f"Error in scheduled job: {e}")
 
-def start_scheduler():
+def scheduled_reconcile_stats():
     """
-    Start the background scheduler for periodic paper fetching.
+    Scheduled job to correct any drift in the materialized paper stats.
     """
-    scheduler = BackgroundScheduler()
+    try:
+        reconcile_stats()
+    except Exception as e:
+        logger.error(f"Error reconciling stats: {e}")
+
+def scheduled_poll_summary_batches():
+    """
+    Scheduled job to collect results of finished summary batches.
+    """
+    try:
+        applied = poll_summary_batches()
+        if applied:
+            logger.info(f"Applied {applied} batch summaries")
+    except Exception as e:
+        logger.error(f"Error polling summary batches: {e}")
+
+def scheduled_retry_failed_summaries():
+    """
+    Scheduled job to retry failed summaries whose backoff has expired.
+    """
+    try:
+        summarized = retry_failed_summaries()
+        if summarized:
+            logger.info(f"Recovered {summarized} failed summaries")
+    except Exception as e:
+        logger.error(f"Error retrying failed summaries: {e}")
+
+def check_precompute_types():
+    """
+    Raises:
+        ValueError: If PRECOMPUTE_SUMMARY_TYPES names a type not in SUMMARY_TYPES
+    """
+    unknown = [t for t in PRECOMPUTE_SUMMARY_TYPES if t not in SUMMARY_TYPES]
+    if unknown:
+        raise ValueError(
+            f"Unknown PRECOMPUTE_SUMMARY_TYPES: {', '.join(unknown)} (choose from {', '.join(SUMMARY_TYPES)})"
+        )
+
+def register_jobs(scheduler):
+    """
+    Add the periodic fetch/summarize and maintenance jobs to a scheduler.
+
+    Raises:
+        ValueError: If PRECOMPUTE_SUMMARY_TYPES is invalid
+    """
+    check_precompute_types()
 
     # Schedule the job to run every CHECK_INTERVAL_HOURS
     scheduler.add_job(
@@ -42,7 +104,72 @@ def start_scheduler():
         replace_existing=True
     )
 
+    scheduler.add_job(
+        func=scheduled_reconcile_stats,
+        trigger='interval',
+        hours=24,
+        id='reconcile_stats',
+        name='Reconcile materialized paper stats',
+        replace_existing=True
+    )
+
+    # Always poll, so batches submitted before a restart or by hand still land
+    scheduler.add_job(
+        func=scheduled_poll_summary_batches,
+        trigger='interval',
+        minutes=BATCH_POLL_MINUTES,
+        id='poll_summary_batches',
+        name='Collect Message Batches summary results',
+        max_instances=1,
+        replace_existing=True
+    )
+
+    scheduler.add_job(
+        func=scheduled_retry_failed_summaries,
+        trigger='interval',
+        minutes=SUMMARY_RETRY_POLL_MINUTES,
+        id='retry_failed_summaries',
+        name='Retry failed summaries',
+        max_instances=1,
+        replace_existing=True
+    )
+
+def start_scheduler():
+    """
+    Start the background scheduler for periodic paper fetching.
+    """
+    scheduler = BackgroundScheduler()
+    register_jobs(scheduler)
+
     scheduler.start()
     logger.info(f"Scheduler started. Will check for new papers every {CHECK_INTERVAL_HOURS} hours.")
 
     return scheduler
+
+def start_elected_scheduler():
+    """
+    Start the scheduler in exactly one process.
+
+    Safe to call from every web worker: the first to take the leader lock
+    starts the scheduler, the rest wait and take over if the leader dies.
+
+    Returns:
+        LeaderElection: The election handle for this process, or None when
+        a dedicated worker process runs the jobs instead (or this is a
+        helper process)
+    """
+    if USE_WORKER_PROCESS:
+        logger.info("USE_WORKER_PROCESS is set; background jobs run in worker.py")
+        return None
+
+    # Spawned helper processes (e.g. PDF text extraction) re-import the main
+    # script; they must never run the scheduler
+    if multiprocessing.current_process().name != 'MainProcess':
+        return None
+
+    # Fail at startup rather than in the elected process's thread
+    check_precompute_types()
+
+    election = LeaderElection(on_elected=start_scheduler)
+    election.start()
+    return election
@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+Submit the summarization backlog through the Message Batches API.
+
+Usage:
+    python summarize_backlog.py [limit]
+
+The batch ID is stored in the database; the scheduler (or worker) collects
+the results when the batch ends. Run with --poll to collect them right away.
+"""
+
+import sys
+from app.summarizer import submit_summary_batch, poll_summary_batches
+from app.config import BATCH_SUMMARY_LIMIT
+
+if __name__ == '__main__':
+    if '--poll' in sys.argv:
+        applied = poll_summary_batches()
+        print(f"\nApplied {applied} summaries from finished batches")
+    else:
+        args = [a for a in sys.argv[1:] if not a.startswith('--')]
+        limit = int(args[0]) if args else BATCH_SUMMARY_LIMIT
+        batch_id = submit_summary_batch(limit=limit)
+        if batch_id:
+            print(f"\nBatch {batch_id} submitted; results will be applied when it ends")
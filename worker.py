@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Dedicated background worker.
+
+Runs the periodic fetch/summarize jobs and any work queued by the web
+process (fetches, summaries, re-ranks) outside the web server, so harvesting
+and ranking never compete with request handling. The worker and the web
+process communicate only through the database.
+
+Run it alongside the web server with USE_WORKER_PROCESS=true set for both:
+    python worker.py
+"""
+
+import logging
+import time
+from apscheduler.schedulers.blocking import BlockingScheduler
+from app.config import WORKER_POLL_SECONDS, LEADER_RETRY_SECONDS
+from app.jobs import process_pending_jobs, requeue_stale_jobs
+from app.leader import LeaderElection
+from scheduler import register_jobs
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def run_worker():
+    """
+    Wait for the scheduler leader lock, then run jobs until stopped.
+    """
+    # Shares the lock with web-hosted schedulers, so a second worker (or a
+    # web process without USE_WORKER_PROCESS) can never run jobs concurrently.
+    election = LeaderElection(on_elected=lambda: None)
+    while not election.try_acquire():
+        logger.info(f"Another process holds the scheduler lock; retrying in {LEADER_RETRY_SECONDS}s")
+        time.sleep(LEADER_RETRY_SECONDS)
+
+    requeued = requeue_stale_jobs(older_than_hours=0)
+    if requeued:
+        logger.info(f"Requeued {requeued} jobs interrupted by a previous worker")
+
+    scheduler = BlockingScheduler()
+    register_jobs(scheduler)
+    scheduler.add_job(
+        func=process_pending_jobs,
+        trigger='interval',
+        seconds=WORKER_POLL_SECONDS,
+        id='process_jobs',
+        name='Run jobs queued by the web process',
+        max_instances=1,
+        coalesce=True,
+        replace_existing=True
+    )
+
+    logger.info("Worker started.")
+    scheduler.start()
+
+if __name__ == '__main__':
+    run_worker()
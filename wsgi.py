@@ -0,0 +1,10 @@
+"""
+WSGI entry point for production servers (see gunicorn.conf.py).
+
+Unlike run.py, importing this module does not start the scheduler; the
+server starts it through leader election once each worker is up.
+"""
+
+from app import create_app
+
+app = create_app()